@@ -1,6 +1,8 @@
 #!/bin/bash
 
 HTML_FILE="design-system-poster.html" # Default file to fix
+# Any arguments (files or directories) replace the default and run in batch mode,
+# e.g. ./fix_html_json.sh dist/ --workers 8
 PYTHON_SCRIPT="fix_json_attributes.py"
 PYTHON_CMD="python3" # Or just "python" if python3 is default
 
@@ -11,7 +13,7 @@ if [ ! -f "$PYTHON_SCRIPT" ]; then
 fi
 
 # Check if target HTML file exists
-if [ ! -f "$HTML_FILE" ]; then
+if [ $# -eq 0 ] && [ ! -f "$HTML_FILE" ]; then
     echo "Error: HTML file '$HTML_FILE' not found in the current directory."
     echo "You may need to edit the HTML_FILE variable in this script."
     exit 1
@@ -29,7 +31,11 @@ fi
 
 
 echo "Running JSON attribute fixer..."
-"$PYTHON_CMD" "$PYTHON_SCRIPT" "$HTML_FILE"
+if [ $# -gt 0 ]; then
+    "$PYTHON_CMD" "$PYTHON_SCRIPT" "$@"
+else
+    "$PYTHON_CMD" "$PYTHON_SCRIPT" "$HTML_FILE"
+fi
 
 exit_code=$?
 
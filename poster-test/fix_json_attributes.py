@@ -1,9 +1,20 @@
 #!/usr/bin/env python3
+import argparse
+import hashlib
+import os
 import sys
 import json
 import re
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from bs4 import BeautifulSoup
 
+# Shared with the data scripts: spans and counters for METRICS_LOG / METRICS_TEXTFILE_DIR.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'data', 'scripts'))
+import instrumentation  # noqa: E402
+
 # --- Configuration ---
 # Define which tags and attributes might contain JSON
 TARGET_ATTRIBUTES = {
@@ -14,127 +25,562 @@ TARGET_ATTRIBUTES = {
     # Add more tag: [attribute_list] pairs if needed
 }
 
-# Regex to remove JavaScript style block comments (/* ... */)
-# Handles multi-line comments with re.DOTALL
-BLOCK_COMMENT_REGEX = re.compile(r'/\*.*?\*/', re.DOTALL)
+# Cheap pre-scan: a file without any opening target tag is skipped before parsing.
+TARGET_TAG_REGEX = re.compile(
+    r'<(?:' + '|'.join(re.escape(tag) for tag in TARGET_ATTRIBUTES) + r')[\s/>]',
+    re.IGNORECASE)
+
+# Attribute syntax as the HTML tokenizer reads it: quotes only delimit values,
+# so a quote inside an attribute *name* does not open a string. The negative
+# lookaheads force names, unquoted values and whitespace runs to their longest
+# form, so an unterminated tag fails in linear time instead of backtracking.
+ATTRIBUTE_REGEX = re.compile(r'''
+    ([^\s/>=][^\s/>=]*)(?![^\s/>=])
+    (?:\s*=\s*(?:"([^"]*)"|'([^']*)'|(?!["'])([^\s>]+)(?![^\s>])))?
+''', re.VERBOSE)
+
+# Start tags of target elements, in source order. Comments and raw-text
+# elements are matched (and ignored) as whole regions, so tags written inside
+# them are skipped just as an HTML parser skips them.
+START_TAG_REGEX = re.compile(r'''
+    <!--.*?-->
+  | <(script|style|textarea|title)\b.*?</\1\s*>
+  | <(''' + '|'.join(re.escape(tag) for tag in TARGET_ATTRIBUTES) + r''')(?=[\s/>])
+      ((?:[\s/]+(?![\s/])
+        | [^\s/>=][^\s/>=]*(?![^\s/>=])
+          (?:\s*=\s*(?:"[^"]*"|'[^']*'|(?!["'])[^\s>]+(?![^\s>])))?
+      )*)>
+''', re.DOTALL | re.IGNORECASE | re.VERBOSE)
 
-# Regex to remove JavaScript style line comments (// ...)
-# Requires processing line by line if attribute value contains newlines,
-# or a more complex regex. Let's focus on block comments first as
-# they were the primary issue identified.
-# LINE_COMMENT_REGEX = re.compile(r'//.*')
+# Comments and trailing commas are removed in one left-to-right scan that
+# steps over string literals, so "/*" or "//" inside a string (a URL, a
+# path) is kept. Each match is a run of kept text (group 1) followed by one
+# thing to drop, or by an unterminated block comment that is kept as is
+# (group 2). The alternatives never overlap (a line comment in a gap takes
+# its newline along) and one of the endings always matches where the run
+# stops, so the scan never backtracks and is linear in the length of the
+# value without possessive quantifiers, which need Python 3.11.
+_BLOCK_COMMENT = r'/\*[^*]*\*+(?:[^*/][^*]*\*+)*/'
+# Whitespace and comments between a trailing comma and its closing bracket.
+_GAP = r'(?:\s|//[^\n]*(?:\n|\Z)|' + _BLOCK_COMMENT + r')*'
+JS_NOISE_REGEX = re.compile(r'''
+    (   (?: [^"/,]+
+          | "[^"\\]*(?:\\[\s\S][^"\\]*)*"?       # string literal, even unterminated
+          | ,(?!''' + _GAP + r'''[\]}])            # a comma that is not trailing
+          | /(?![/*])
+        )*
+    )
+    (?: //[^\n]*                              # line comment
+      | ''' + _BLOCK_COMMENT + r'''             # block comment
+      | ,                                     # trailing comma
+      | (/\*[\s\S]*)                          # unterminated block comment
+      | \Z
+    )
+''', re.VERBOSE)
+
+# Values without any of these are returned as they are, without a scan.
+JS_NOISE_HINT_REGEX = re.compile(r'//|/\*|,\s*[\]}]')
 
 def clean_json_string(raw_string):
-    """Removes common invalid patterns like JS comments from a string."""
+    """Removes JS comments and trailing commas outside of string literals."""
     if not raw_string:
         return raw_string
-    # Remove block comments
-    cleaned = BLOCK_COMMENT_REGEX.sub('', raw_string)
-    # Add other cleaning steps here if needed (e.g., line comments)
-    # cleaned = '\n'.join([LINE_COMMENT_REGEX.sub('', line) for line in cleaned.splitlines()])
-    return cleaned.strip() # Remove leading/trailing whitespace
+    if JS_NOISE_HINT_REGEX.search(raw_string) is not None:
+        raw_string = JS_NOISE_REGEX.sub(r'\1\2', raw_string)
+    return raw_string.strip() # Remove leading/trailing whitespace
 
-def fix_html_file(filepath):
-    """Parses HTML, finds target attributes, cleans & validates JSON, updates file."""
+def normalize_json_value(raw_string):
+    """Cleans and compacts one attribute value. Returns (outcome, payload).
+
+    outcome is 'empty' (nothing left after cleaning), 'same' (already
+    compact), 'fixed' (payload is the compact JSON) or 'invalid' (payload is
+    the JSONDecodeError message).
+    """
+    cleaned_value = clean_json_string(raw_string)
+    if not cleaned_value:
+        return 'empty', None
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-    except FileNotFoundError:
-        print(f"Error: File not found at '{filepath}'")
-        sys.exit(1)
-    except Exception as e:
-        print(f"Error reading file '{filepath}': {e}")
-        sys.exit(1)
+        # Use ensure_ascii=False if you have non-ASCII chars,
+        # but be mindful of HTML encoding then.
+        valid_json_string = json.dumps(json.loads(cleaned_value), separators=(',', ':'))
+    except json.JSONDecodeError as e:
+        return 'invalid', str(e)
+    # Comparing against the cleaned value avoids rewrites for values whose
+    # only issue was comments that are already gone after cleaning.
+    if valid_json_string == cleaned_value:
+        return 'same', None
+    return 'fixed', valid_json_string
+
+
+# --- Normalization cache ---
+# Bump when clean_json_string or normalize_json_value changes its output; the
+# version is part of every key, so older results are never served again.
+NORMALIZE_VERSION = 2
+DEFAULT_CACHE_PATH = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'smart-campus-posters', 'json-attributes.sqlite')
+DEFAULT_CACHE_ENTRIES = 100_000
+# Keys per SELECT ... IN (...); well below SQLite's bound-parameter limit.
+CACHE_QUERY_BATCH = 500
+# A hit only rewrites last_used when it is at least this old (seconds), so
+# warm runs are read-only; eviction order is exact to this resolution.
+CACHE_TOUCH_AFTER = 3600
+
+CACHE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS normalized (
+    key BLOB PRIMARY KEY,
+    outcome TEXT NOT NULL,
+    payload TEXT,
+    last_used REAL NOT NULL
+)
+'''
+
+
+class NormalizationCache:
+    """Persistent memo of normalize_json_value across runs.
+
+    Results live in a SQLite file (FIX_JSON_CACHE, else DEFAULT_CACHE_PATH)
+    keyed by a BLAKE2b hash of NORMALIZE_VERSION and the raw value.
+    prefetch() loads a document's values with a few batched queries; new
+    results and stale last-used times (CACHE_TOUCH_AFTER) are buffered and
+    written by flush(), once per file; evict() keeps the max_entries most
+    recently used rows. hits and misses count lookups since the cache was
+    opened.
+    """
+
+    def __init__(self, path=None, max_entries=DEFAULT_CACHE_ENTRIES):
+        self.path = path or os.environ.get('FIX_JSON_CACHE') or DEFAULT_CACHE_PATH
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._keys = {}
+        self._loaded = {}
+        self._stale = set()
+        self._fresh = {}
+        self._touched = set()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, timeout=30)
+        self._db.execute(CACHE_SCHEMA)
+
+    @staticmethod
+    def key(raw_string):
+        data = f'{NORMALIZE_VERSION}\0{raw_string}'.encode('utf-8', 'surrogatepass')
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def _load(self, keys):
+        keys = [key for key in dict.fromkeys(keys) if key not in self._loaded]
+        for start in range(0, len(keys), CACHE_QUERY_BATCH):
+            batch = keys[start:start + CACHE_QUERY_BATCH]
+            self._loaded.update(dict.fromkeys(batch))
+            rows = self._db.execute(
+                'SELECT key, outcome, payload, last_used FROM normalized WHERE key IN '
+                f'({",".join("?" * len(batch))})', batch)
+            touch_before = time.time() - CACHE_TOUCH_AFTER
+            for key, outcome, payload, last_used in rows:
+                self._loaded[key] = (outcome, payload)
+                if last_used <= touch_before:
+                    self._stale.add(key)
+
+    def prefetch(self, raw_strings):
+        """Load the cached results for many values at once."""
+        keys = self._keys
+        for raw_string in raw_strings:
+            if raw_string not in keys:
+                keys[raw_string] = self.key(raw_string)
+        self._load(keys.values())
+
+    def normalize(self, raw_string):
+        """normalize_json_value(raw_string), from the cache when possible."""
+        key = self._keys.get(raw_string) or self.key(raw_string)
+        if key not in self._loaded:
+            self._load((key,))
+        result = self._loaded[key]
+        if result is not None:
+            self.hits += 1
+            if key in self._stale:
+                self._touched.add(key)
+            return result
+        self.misses += 1
+        result = self._loaded[key] = self._fresh[key] = normalize_json_value(raw_string)
+        return result
 
+    def flush(self):
+        """Write buffered results and last-used times in one transaction."""
+        if self._fresh or self._touched:
+            now = time.time()
+            with self._db:
+                self._db.executemany('INSERT OR REPLACE INTO normalized VALUES (?, ?, ?, ?)',
+                                     [(key, outcome, payload, now)
+                                      for key, (outcome, payload) in self._fresh.items()])
+                self._db.executemany('UPDATE normalized SET last_used = ? WHERE key = ?',
+                                     [(now, key) for key in self._touched])
+        # Other processes may have written meanwhile, so start over per file.
+        self._keys.clear()
+        self._loaded.clear()
+        self._stale.clear()
+        self._fresh.clear()
+        self._touched.clear()
+
+    def evict(self):
+        """Drop all but the max_entries most recently used results."""
+        with self._db:
+            self._db.execute('DELETE FROM normalized WHERE key IN (SELECT key FROM normalized '
+                             'ORDER BY last_used DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+    def close(self):
+        self.flush()
+        self.evict()
+        self._db.close()
+
+
+def cache_summary(hits, misses):
+    lookups = hits + misses
+    rate = 100 * hits / lookups if lookups else 0
+    return f"JSON cache: {hits} hits, {misses} misses ({rate:.0f}% hit rate)."
+
+
+def html_parser_name():
+    """Prefer the C-based lxml parser; fall back to the stdlib html.parser."""
+    try:
+        import lxml  # noqa: F401
+    except ImportError:
+        return 'html.parser'
+    return 'lxml'
+
+
+def has_target_tags(html_content):
+    """True if the document contains at least one tag from TARGET_ATTRIBUTES."""
+    return TARGET_TAG_REGEX.search(html_content) is not None
+
+
+def locate_target_attributes(html_content):
+    """Source spans of the target attributes, one dict per target start tag.
+
+    Returns [(tag_name, {attr_name: (start, end, quote)})] in document order,
+    where html_content[start:end] is the raw attribute value (without quotes)
+    and quote is '"', "'" or '' for unquoted values. A duplicated attribute
+    maps to None: parsers disagree on which copy wins (html.parser keeps the
+    last, lxml the first), so its span cannot be trusted.
+    """
+    located = []
+    for m in START_TAG_REGEX.finditer(html_content):
+        if m.group(2) is None:
+            continue
+        tag_name = m.group(2).lower()
+        wanted = TARGET_ATTRIBUTES[tag_name]
+        spans = {}
+        for a in ATTRIBUTE_REGEX.finditer(html_content, m.start(3), m.end(3)):
+            attr_name = a.group(1).lower()
+            if attr_name not in wanted:
+                continue
+            if attr_name in spans:
+                spans[attr_name] = None
+                continue
+            spans[attr_name] = None
+            for group, quote in ((2, '"'), (3, "'"), (4, '')):
+                if a.group(group) is not None:
+                    spans[attr_name] = (a.start(group), a.end(group), quote)
+        located.append((tag_name, spans))
+    return located
+
+
+def quote_attribute_value(value, preferred_quote):
+    """The value escaped and quoted for HTML, keeping the original quote style if possible."""
+    value = value.replace('&', '&amp;')
+    for quote in (preferred_quote or '"', "'", '"'):
+        if quote not in value:
+            return f'{quote}{value}{quote}'
+    return '"' + value.replace('"', '&quot;') + '"'
+
+
+def splice_attribute_values(html_content, edits):
+    """Replace each (start, end, quote, new_value) span; everything else is kept byte for byte."""
+    pieces = []
+    position = 0
+    for start, end, quote, new_value in sorted(edits):
+        if quote:
+            # Replace the quotes too: the new value may need the other quote style.
+            start, end = start - 1, end + 1
+        pieces.append(html_content[position:start])
+        pieces.append(quote_attribute_value(new_value, quote))
+        position = end
+    pieces.append(html_content[position:])
+    return ''.join(pieces)
+
+
+def serialize_fixed(html_content, normalize):
+    """The document re-parsed with html.parser, its fixed values applied, serialized.
+
+    lxml would wrap fragments in <html><body> and move comments and
+    whitespace around, so only html.parser output is ever written back.
+    ``normalize`` is normalize_json_value or a stand-in; values it fails on
+    (already reported by fix_html_content) are kept.
+    """
     soup = BeautifulSoup(html_content, 'html.parser')
-    modified = False
+    for element in soup.find_all(list(TARGET_ATTRIBUTES)):
+        for attr_name in TARGET_ATTRIBUTES[element.name]:
+            if element.has_attr(attr_name):
+                try:
+                    outcome, payload = normalize(element[attr_name])
+                except Exception:
+                    continue
+                if outcome == 'fixed':
+                    element[attr_name] = payload
+    return str(soup)
+
+
+def fix_html_content(html_content, log, parser=None, cache=None):
+    """Cleans & validates the JSON attributes of one document.
 
-    print(f"Processing '{filepath}'...")
+    Returns the updated HTML, or None if nothing needed fixing. Progress and
+    warnings go to ``log`` (a callable taking one line).
 
+    Only the changed attribute values are rewritten; the rest of the
+    document is left exactly as it was. The parser decides which elements
+    are targets; ``locate_target_attributes`` supplies their source spans.
+    If a fixed value has no span (the two disagree, or the attribute is
+    duplicated), the whole document is re-parsed with html.parser and
+    re-serialized as before.
+    With a NormalizationCache, values seen before are not parsed again.
+    """
+    normalize = normalize_json_value if cache is None else cache.normalize
+    soup = BeautifulSoup(html_content, parser or html_parser_name())
+    edits = []
+    results = {}
+    reserialize = False
+
+    # One traversal collects every target element; group them by tag so the
+    # report below still reads tag by tag.
+    elements = soup.find_all(list(TARGET_ATTRIBUTES))
+    located = locate_target_attributes(html_content)
+    instrumentation.count('target_elements_located', len(located))
+    if [tag_name for tag_name, _ in located] != [element.name for element in elements]:
+        located = None
+    elements_by_tag = {tag_name: [] for tag_name in TARGET_ATTRIBUTES}
+    for index, element in enumerate(elements):
+        elements_by_tag[element.name].append((element, located[index][1] if located else None))
+    if cache is not None:
+        cache.prefetch(element[attr_name] for element in elements
+                       for attr_name in TARGET_ATTRIBUTES[element.name]
+                       if element.has_attr(attr_name))
+
+    checked = fixed = invalid = 0
     for tag_name, attributes in TARGET_ATTRIBUTES.items():
-        elements = soup.find_all(tag_name)
-        print(f"  Found {len(elements)} <{tag_name}> elements.")
-        for element in elements:
+        elements = elements_by_tag[tag_name]
+        log(f"  Found {len(elements)} <{tag_name}> elements.")
+        for element, spans in elements:
             for attr_name in attributes:
                 if element.has_attr(attr_name):
                     original_value = element[attr_name]
-                    cleaned_value = clean_json_string(original_value)
+                    checked += 1
 
-                    if not cleaned_value:
-                        # Skip empty attributes
+                    try:
+                        outcome, payload = results[original_value] = normalize(original_value)
+                    except Exception as e:
+                        log(f"    ERROR: Unexpected error processing '{attr_name}' in <{tag_name}>: {e}")
                         continue
 
-                    try:
-                        # Attempt to parse the cleaned JSON
-                        parsed_json = json.loads(cleaned_value)
-                        # Re-serialize to ensure validity and consistent formatting
-                        # Use ensure_ascii=False if you have non-ASCII chars,
-                        # but be mindful of HTML encoding then.
-                        valid_json_string = json.dumps(parsed_json, separators=(',', ':')) # Compact
-
-                        # Only update if the re-serialized string is different
-                        # from the *original* (after basic cleaning) to avoid
-                        # unnecessary changes just due to formatting differences.
-                        # We compare against cleaned_value to handle cases where
-                        # only comments were the issue.
-                        if valid_json_string != cleaned_value:
-                             print(f"    Updating attribute '{attr_name}' in <{tag_name}>...")
-                             # print(f"      Original: {original_value[:50]}...") # Debug
-                             # print(f"      Cleaned:  {cleaned_value[:50]}...") # Debug
-                             # print(f"      New JSON: {valid_json_string[:50]}...") # Debug
-                             element[attr_name] = valid_json_string
-                             modified = True
-
-                    except json.JSONDecodeError as e:
+                    if outcome == 'fixed':
+                        # Only values whose compact form differs are updated.
+                        log(f"    Updating attribute '{attr_name}' in <{tag_name}>...")
+                        fixed += 1
+                        if spans is not None and spans.get(attr_name) is not None:
+                            edits.append((*spans[attr_name], payload))
+                        else:
+                            reserialize = True
+                    elif outcome == 'invalid':
+                        invalid += 1
                         # Check if the original value might have had HTML entity issues
                         # This part is heuristic - might not catch all cases
+                        cleaned_value = clean_json_string(original_value)
                         if '&apos;' in original_value or '&quot;' in original_value:
-                             print(f"    WARNING: JSONDecodeError for '{attr_name}' in <{tag_name}>. "
-                                   f"Original value contained HTML entities ('&apos;' or '&quot;'). "
-                                   f"Parsing requires these to be decoded *before* JSON parsing, "
-                                   f"which BeautifulSoup usually handles. Error: {e}")
+                            log(f"    WARNING: JSONDecodeError for '{attr_name}' in <{tag_name}>. "
+                                f"Original value contained HTML entities ('&apos;' or '&quot;'). "
+                                f"Parsing requires these to be decoded *before* JSON parsing, "
+                                f"which BeautifulSoup usually handles. Error: {payload}")
                         elif cleaned_value != original_value:
-                            print(f"    WARNING: JSONDecodeError for '{attr_name}' in <{tag_name}> after cleaning comments. "
-                                  f"Check syntax. Error: {e}. Value: {cleaned_value[:100]}...")
+                            log(f"    WARNING: JSONDecodeError for '{attr_name}' in <{tag_name}> after cleaning comments. "
+                                f"Check syntax. Error: {payload}. Value: {cleaned_value[:100]}...")
                         else:
-                            print(f"    WARNING: Invalid JSON found for '{attr_name}' in <{tag_name}>. "
-                                  f"Could not fix automatically. Error: {e}. Value: {original_value[:100]}...")
-                    except Exception as e:
-                         print(f"    ERROR: Unexpected error processing '{attr_name}' in <{tag_name}>: {e}")
-
-
-    if modified:
-        try:
-            # Use str(soup) which often preserves formatting better than prettify()
-            # for attribute values containing JSON.
-            # Ensure output uses double quotes for attributes for better compatibility
-            # with JSON containing single quotes.
-            output_html = str(soup)
-
-            # Optional: A regex fallback to try and force double quotes on our target attributes
-            # This is a bit hacky but might help ensure the output is more consistent
-            # for attr_value in re.findall(r"(visuals|items|key-elements|rooms|nodes|connections)='(\[.*?\])'", output_html, re.DOTALL):
-            #     attr_name = attr_value[0]
-            #     json_str_single_quoted = attr_value[1]
-            #     # Only replace if it hasn't already been double-quoted
-            #     if f'{attr_name}="{json_str_single_quoted}"' not in output_html:
-            #          output_html = output_html.replace(f"{attr_name}='{json_str_single_quoted}'", f'{attr_name}="{json_str_single_quoted}"')
-
-
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(output_html)
-            print(f"Successfully updated JSON in '{filepath}'.")
-        except Exception as e:
-            print(f"Error writing updated file '{filepath}': {e}")
-            sys.exit(1)
-    else:
-        print(f"No JSON attributes needed fixing in '{filepath}'.")
+                            log(f"    WARNING: Invalid JSON found for '{attr_name}' in <{tag_name}>. "
+                                f"Could not fix automatically. Error: {payload}. Value: {original_value[:100]}...")
 
+    instrumentation.count('json_attributes_checked', checked)
+    instrumentation.count('json_fixes', fixed)
+    instrumentation.count('json_invalid', invalid)
+    if not fixed:
+        return None
+    if reserialize:
+        log("  Could not map elements to source offsets; re-serializing the document.")
+        return serialize_fixed(html_content,
+                               lambda value: results.get(value) or normalize(value))
+    return splice_attribute_values(html_content, edits)
 
-if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python fix_json_attributes.py <path_to_html_file>")
+
+def write_atomically(filepath, content):
+    """Write via a temp file in the same directory and rename it over filepath."""
+    directory = os.path.dirname(os.path.abspath(filepath))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(filepath),
+                                    suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            f.write(content)
+        os.chmod(tmp_path, os.stat(filepath).st_mode & 0o7777)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+@instrumentation.span('fix_file')
+def process_html_file(filepath, parser=None, check=False, cache=None):
+    """Fixes one file. Returns (filepath, status, log lines); never exits.
+
+    status is 'skipped' (no target tags), 'unchanged', 'updated' or 'error'.
+    With check=True nothing is written; 'updated' then means "would change".
+    cache is an optional NormalizationCache; it is flushed before returning.
+    """
+    lines = []
+    try:
+        # newline='' keeps CRLF files byte-identical outside the spliced values.
+        with open(filepath, 'r', encoding='utf-8', newline='') as f:
+            html_content = f.read()
+    except FileNotFoundError:
+        return filepath, 'error', [f"Error: File not found at '{filepath}'"]
+    except Exception as e:
+        return filepath, 'error', [f"Error reading file '{filepath}': {e}"]
+
+    if not has_target_tags(html_content):
+        return filepath, 'skipped', [f"Skipping '{filepath}': no target tags."]
+
+    lines.append(f"Processing '{filepath}'...")
+    try:
+        output_html = fix_html_content(html_content, lines.append, parser, cache)
+    finally:
+        if cache is not None:
+            cache.flush()
+    if output_html is None or output_html == html_content:
+        lines.append(f"No JSON attributes needed fixing in '{filepath}'.")
+        return filepath, 'unchanged', lines
+    if check:
+        lines.append(f"Would update JSON in '{filepath}'.")
+        return filepath, 'updated', lines
+
+    try:
+        write_atomically(filepath, output_html)
+    except Exception as e:
+        lines.append(f"Error writing updated file '{filepath}': {e}")
+        return filepath, 'error', lines
+    lines.append(f"Successfully updated JSON in '{filepath}'.")
+    return filepath, 'updated', lines
+
+
+def fix_html_file(filepath, check=False, use_cache=True):
+    """Parses HTML, finds target attributes, cleans & validates JSON, updates file."""
+    cache = NormalizationCache() if use_cache else None
+    try:
+        _, status, lines = process_html_file(filepath, check=check, cache=cache)
+    finally:
+        if cache is not None:
+            cache.close()
+    for line in lines:
+        print(line)
+    if cache is not None:
+        print(cache_summary(cache.hits, cache.misses))
+        instrumentation.count('json_cache_hits', cache.hits)
+        instrumentation.count('json_cache_misses', cache.misses)
+    if status == 'error' or (check and status == 'updated'):
         sys.exit(1)
 
-    html_filepath = sys.argv[1]
-    fix_html_file(html_filepath)
\ No newline at end of file
+
+def expand_html_paths(paths):
+    """Files as given; directories expand to every *.html file below them."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in sorted(names)
+                             if name.endswith('.html'))
+        else:
+            files.append(path)
+    return files
+
+
+# One NormalizationCache per worker process, opened on its first file.
+_worker_caches = {}
+
+
+def _process_in_worker(filepath, parser, check, cache_path):
+    """Worker: process_html_file plus the cache hits and misses and the
+    instrumentation counters it caused."""
+    if cache_path is None:
+        return process_html_file(filepath, parser, check), 0, 0, instrumentation.take_counters()
+    cache = _worker_caches.get(cache_path)
+    if cache is None:
+        cache = _worker_caches[cache_path] = NormalizationCache(cache_path)
+    hits, misses = cache.hits, cache.misses
+    result = process_html_file(filepath, parser, check, cache)
+    return result, cache.hits - hits, cache.misses - misses, instrumentation.take_counters()
+
+
+def fix_html_files(filepaths, workers=None, check=False, use_cache=True):
+    """Fixes many files in a process pool; returns {status: count}.
+
+    Each worker handles whole files and sends its log back, so the output is
+    printed per file, in the order the files were given. Workers share the
+    on-disk NormalizationCache unless use_cache is False.
+    """
+    parser = html_parser_name()
+    cache = NormalizationCache() if use_cache else None
+    counts = {'updated': 0, 'unchanged': 0, 'skipped': 0, 'error': 0}
+    hits = misses = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(_process_in_worker, filepaths, [parser] * len(filepaths),
+                               [check] * len(filepaths),
+                               [cache and cache.path] * len(filepaths),
+                               chunksize=max(1, len(filepaths) // (4 * (workers or os.cpu_count() or 1))))
+            for (_, status, lines), file_hits, file_misses, counters in results:
+                for line in lines:
+                    print(line)
+                counts[status] += 1
+                hits += file_hits
+                misses += file_misses
+                instrumentation.merge_counters(counters)
+    finally:
+        if cache is not None:
+            cache.close()
+    print(f"Done: {counts['updated']} {'would change' if check else 'updated'}, "
+          f"{counts['unchanged']} unchanged, {counts['skipped']} skipped (no target tags), "
+          f"{counts['error']} errors.")
+    if cache is not None:
+        print(cache_summary(hits, misses))
+        instrumentation.count('json_cache_hits', hits)
+        instrumentation.count('json_cache_misses', misses)
+    for status, files in counts.items():
+        instrumentation.count(f'files_{status}', files)
+    return counts
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Clean and compact JSON stored in custom-element attributes.")
+    arg_parser.add_argument('paths', nargs='+', metavar='path',
+                            help="HTML file(s) or directories of *.html files")
+    arg_parser.add_argument('--workers', type=int, default=None,
+                            help="worker processes for batch mode (default: one per CPU)")
+    arg_parser.add_argument('--check', action='store_true',
+                            help="report what would change without writing; "
+                                 "exit 1 if any file would change (for CI)")
+    arg_parser.add_argument('--no-cache', action='store_true',
+                            help="re-parse every attribute value instead of using the "
+                                 "normalization cache (FIX_JSON_CACHE)")
+    args = arg_parser.parse_args()
+
+    html_filepaths = expand_html_paths(args.paths)
+    if len(html_filepaths) == 1 and not os.path.isdir(args.paths[0]):
+        fix_html_file(html_filepaths[0], check=args.check, use_cache=not args.no_cache)
+    else:
+        counts = fix_html_files(html_filepaths, args.workers, check=args.check,
+                                use_cache=not args.no_cache)
+        sys.exit(1 if counts['error'] or (args.check and counts['updated']) else 0)
@@ -0,0 +1,27 @@
+#!/usr/bin/env node
+
+/**
+ * Room Entity Mapping Export
+ *
+ * Purpose: Write `roomEntityMapping` as plain JSON so the Python tooling
+ * (src/data/scripts/room_resolver.py) resolves rooms with the same rules as
+ * `resolveRoomMeta`. Re-run after editing roomEntityMapping.js.
+ *
+ * Usage: node scripts/export-room-mapping.mjs
+ *
+ * Outputs:
+ * - src/data/mappings/roomEntityMapping.json
+ */
+
+import fs from 'fs';
+import path from 'path';
+import { fileURLToPath } from 'url';
+
+import { roomEntityMapping } from '../src/data/mappings/roomEntityMapping.js';
+
+const __dirname = path.dirname(fileURLToPath(import.meta.url));
+const rootDir = path.resolve(__dirname, '..');
+const outputPath = path.join(rootDir, 'src/data/mappings/roomEntityMapping.json');
+
+fs.writeFileSync(outputPath, `${JSON.stringify(roomEntityMapping, null, 2)}\n`);
+console.log(`Wrote ${roomEntityMapping.length} room mappings to ${path.relative(rootDir, outputPath)}`);
@@ -1,358 +1,481 @@
-# Extract relevant device status info using regex for different key indicators
-device_states = re.findall(r'entity_id\s*:\s*"([^"]+)"\s*,\s*state\s*:\s*"([^"]+)"', js_content)
-
-# Filter to only device-related categories
-device_related_prefixes = ['sensor', 'binary_sensor', 'light', 'device_tracker']
-filtered_devices = [(eid, state) for eid, state in device_states if eid.split(".")[0] in device_related_prefixes]
-
-# Count state occurrences per device type
-status_summary = {}
-for eid, state in filtered_devices:
-    device_type = eid.split(".")[0]
-    if device_type not in status_summary:
-        status_summary[device_type] = Counter()
-    status_summary[device_type][state] += 1
-
-# Plotting status for each device type
-figs = []
-for device_type, counts in status_summary.items():
-    labels, values = zip(*counts.items())
-    plt.figure(figsize=(7, 4))
-    plt.bar(labels, values)
-    plt.title(f"{device_type.capitalize()} Device State Distribution")
-    plt.xlabel("State")
-    plt.ylabel("Count")
-    plt.grid(axis='y')
-    plt.tight_layout()
-    plt.show()
-
-# Try broader pattern that handles potential formatting inconsistencies
-entity_ids = re.findall(r'entity_id\s*:\s*"([^"]+)"', js_content)
-
-# Check if any were found and then proceed
-if entity_ids:
-    entity_types = [eid.split(".")[0] for eid in entity_ids]
-    entity_type_counts = Counter(entity_types)
-
-    # Prepare data for plotting
-    labels, counts = zip(*entity_type_counts.items())
-
-    # Plot the distribution of entity types
-    plt.figure(figsize=(10, 6))
-    plt.bar(labels, counts)
-    plt.title("Entity Type Distribution in Home Assistant Environment")
-    plt.xlabel("Entity Type")
-    plt.ylabel("Count")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.grid(axis='y')
-    plt.show()
-else:
-    entity_ids = "No entity_ids were found with current patterns."  # feedback for debugging
-
-entity_ids[:10]  # preview some results if found
-
-# Extract battery-related sensors and values using regex
-battery_data = re.findall(
-    r'entity_id\s*:\s*"([^"]+battery[^"]*)".*?state\s*:\s*"([^"]+)"',
-    js_content,
-    re.DOTALL
-)
-
-# Normalize and convert battery values to numeric if possible
-battery_levels = []
-for eid, state in battery_data:
-    try:
-        # Extract numeric percentage (e.g. "60%" or just "60")
-        battery_pct = int(re.search(r'\d+', state).group())
-        battery_levels.append((eid, battery_pct))
-    except:
-        continue  # Skip entries that can't be converted
-
-# Sort by battery percentage
-battery_levels_sorted = sorted(battery_levels, key=lambda x: x[1])
-
-# Plot battery levels
-device_names, battery_values = zip(*battery_levels_sorted)
-plt.figure(figsize=(12, 6))
-plt.barh(device_names, battery_values)
-plt.xlabel("Battery Level (%)")
-plt.title("Device Battery Levels")
-plt.tight_layout()
-plt.grid(axis='x')
-plt.show()
-
-# Extract room occupancy status from sensors with name "unoccupied_rooms" or similar
-room_occupancy_data = re.findall(
-    r'entity_id\s*:\s*"sensor\.unoccupied_rooms"[^}]*?state\s*:\s*"([^"]*)"',
-    js_content
-)
-
-# Extract person states too for individual presence analysis
-person_states = re.findall(
-    r'entity_id\s*:\s*"person\.([^"]+)"[^}]*?state\s*:\s*"([^"]+)"',
-    js_content
-)
-
-# Prepare data for display
-unoccupied_status = room_occupancy_data[0] if room_occupancy_data else "No data"
-
-# Count known vs unknown person states
-person_state_counts = Counter([state for _, state in person_states])
-
-# Display
-person_state_df = pd.DataFrame(person_state_counts.items(), columns=["State", "Count"])
-import ace_tools as tools; tools.display_dataframe_to_user(name="Person State Summary", dataframe=person_state_df)
-
-# Extract activity sensor entries related to steps, pace, distance, floors ascended/descended
-activity_data = re.findall(
-    r'entity_id\s*:\s*"sensor\.([^"]+)"[^}]*?state\s*:\s*"([^"]+)"[^}]*?friendly_name\s*:\s*"([^"]+)"',
-    js_content
-)
-
-# Filter only relevant activity sensors
-activity_keywords = ["steps", "distance", "pace", "floors_ascended", "floors_descended"]
-filtered_activity = [
-    (eid, state, name) for eid, state, name in activity_data
-    if any(keyword in eid.lower() for keyword in activity_keywords)
-]
-
-# Clean and parse numeric values
-activity_metrics = []
-for eid, state, name in filtered_activity:
-    try:
-        value = int(re.search(r'\d+', state).group())
-        activity_metrics.append((name, value))
-    except:
-        continue
-
-# Sort for display
-activity_metrics_sorted = sorted(activity_metrics, key=lambda x: x[1], reverse=True)
-
-# Plot
-names, values = zip(*activity_metrics_sorted)
-plt.figure(figsize=(10, 5))
-plt.barh(names, values)
-plt.xlabel("Activity Value")
-plt.title("Sensor Activity Metrics")
-plt.tight_layout()
-plt.grid(axis='x')
-plt.show()
-
-# Extract connectivity-related sensor data (SSID, BSSID, Connection Type, State)
-connectivity_data = re.findall(
-    r'entity_id\s*:\s*"sensor\.([^"]*(?:ssid|bssid|connection_type))"[^}]*?state\s*:\s*"([^"]+)"[^}]*?friendly_name\s*:\s*"([^"]+)"',
-    js_content
-)
-
-# Group data by sensor name and connection state
-connectivity_summary = {}
-for sensor, state, name in connectivity_data:
-    base_name = name.split()[0]  # e.g., device name prefix
-    if base_name not in connectivity_summary:
-        connectivity_summary[base_name] = {}
-    connectivity_summary[base_name][sensor] = state
-
-# Convert to DataFrame
-df_conn = pd.DataFrame.from_dict(connectivity_summary, orient="index").fillna("Not Reported")
-df_conn.index.name = "Device"
-import ace_tools as tools; tools.display_dataframe_to_user(name="Device Connectivity Status", dataframe=df_conn)
-
-# Extract audio/visual sensor states
-av_data = re.findall(
-    r'entity_id\s*:\s*"binary_sensor\.([^"]*(?:camera|audio_input|audio_output|focus))"[^}]*?state\s*:\s*"([^"]+)"[^}]*?friendly_name\s*:\s*"([^"]+)"',
-    js_content
-)
-
-# Structure data for display
-av_summary = []
-for sensor, state, name in av_data:
-    device = name.split()[0]
-    av_summary.append((device, sensor, state, name))
-
-# Convert to DataFrame
-df_av = pd.DataFrame(av_summary, columns=["Device", "Sensor", "State", "Friendly Name"])
-import ace_tools as tools; tools.display_dataframe_to_user(name="Audio/Visual Sensor Status", dataframe=df_av)
-
-# Extract GPS coordinate data from entities
-gps_data = re.findall(
-    r'entity_id\s*:\s*"([^"]+)"[^}]*?latitude\s*:\s*([-]?\d+\.\d+)[^}]*?longitude\s*:\s*([-]?\d+\.\d+)',
-    js_content
-)
-
-# Convert to DataFrame
-df_gps = pd.DataFrame(gps_data, columns=["Entity ID", "Latitude", "Longitude"])
-df_gps["Latitude"] = df_gps["Latitude"].astype(float)
-df_gps["Longitude"] = df_gps["Longitude"].astype(float)
-
-# Plot GPS coordinates on a scatter plot
-plt.figure(figsize=(8, 6))
-plt.scatter(df_gps["Longitude"], df_gps["Latitude"], marker='o')
-for i, row in df_gps.iterrows():
-    plt.text(row["Longitude"], row["Latitude"], row["Entity ID"].split(".")[-1], fontsize=8)
-
-plt.title("Geolocation of Entities")
-plt.xlabel("Longitude")
-plt.ylabel("Latitude")
-plt.grid(True)
-plt.tight_layout()
-plt.show()
-
-# Extract entity_id and state for alert-related terms
-alert_data = re.findall(
-    r'entity_id\s*:\s*"([^"]+)"[^}]*?state\s*:\s*"([^"]+)"[^}]*?friendly_name\s*:\s*"([^"]+)"',
-    js_content
-)
-
-# Filter entries for alert-related states (focus, idle, alert, unavailable, etc.)
-alert_keywords = ["focus", "idle", "alert", "attention", "unavailable", "unknown"]
-alert_states = [(" ".join([eid.split(".")[0], name]), state) for eid, state, name in alert_data if any(kw in name.lower() or kw in state.lower() for kw in alert_keywords)]
-
-# Organize into DataFrame
-df_alerts = pd.DataFrame(alert_states, columns=["Entity", "State"])
-alert_state_counts = df_alerts["State"].value_counts()
-
-# Plot
-plt.figure(figsize=(8, 4))
-alert_state_counts.plot(kind="bar")
-plt.title("Alert and Focus State Distribution")
-plt.xlabel("State")
-plt.ylabel("Count")
-plt.xticks(rotation=45)
-plt.tight_layout()
-plt.grid(axis='y')
-plt.show()
-
-# Extract all state values for all entities
-all_states_data = re.findall(
-    r'entity_id\s*:\s*"([^"]+)"[^}]*?state\s*:\s*"([^"]+)"',
-    js_content
-)
-
-# Count state frequencies
-state_counts = Counter(state for _, state in all_states_data)
-
-# Plot
-states, counts = zip(*state_counts.items())
-plt.figure(figsize=(10, 5))
-plt.bar(states, counts)
-plt.title("Entity State Distribution Across All Entities")
-plt.xlabel("State")
-plt.ylabel("Count")
-plt.xticks(rotation=45)
-plt.tight_layout()
-plt.grid(axis='y')
-plt.show()
-
-# Adjust regex to extract from nested 'attributes' object
-# Target 'entity_id', 'state', and 'attributes' including 'friendly_name'
-
-attribute_data = re.findall(
-    r'entity_id\s*:\s*"([^"]+)"[^}]*?state\s*:\s*"([^"]+)"[^}]*?attributes\s*:\s*{[^}]*?friendly_name\s*:\s*"([^"]+)"',
-    js_content,
-    re.DOTALL
-)
-
-# Count entities with complete records (all three fields)
-completeness_stats = {
-    "Total Entities": len(attribute_data),
-    "Complete Records": len(attribute_data),
-    "Missing State": 0,  # All matched entries have state
-    "Missing Friendly Name": 0  # All matched entries have friendly_name
+#!/usr/bin/env python3
+"""Home Assistant entity analytics.
+
+The dump is parsed once (``entity_parser``) into one columnar table
+(``entity_table``); every report is a pure, vectorized function of that table
+and returns a DataFrame. The CLI renders every report to disk in one process
+(CSV tables, Agg PNG charts, the grouped entities YAML and, with
+``--floorplan`` or a room mapping, the annotated floor plan of
+``floorplan_svg``):
+
+    python analysis.py ../static/mockup-Room_entity_data.js --out reports/
+    python analysis.py dump.json --text --report battery --report alerts
+    python analysis.py --history history/ --since 2025-04-01 --until 2025-04-08
+
+With ``--history`` the reports run over a ``history_store`` time window
+instead of a single dump (see ``window_tables``).
+
+pandas is imported when the table is built; matplotlib, yaml and the
+schema validator only by the code paths that need them, so ``--text``
+reports never pay for them. Parsed dumps are cached on disk
+(``entity_cache``) unless ``--no-cache`` is given.
+"""
+import argparse
+import os
+import sys
+from collections import namedtuple
+from functools import lru_cache
+
+from entity_cache import add_cache_arguments, cached_records, open_cache, report as report_cache
+from entity_parser import load_entities
+from entity_table import build_entity_table
+from entity_tags import tagged
+from instrumentation import quiet_broken_pipe, span
+
+DEVICE_RELATED_DOMAINS = ('sensor', 'binary_sensor', 'light', 'device_tracker')
+
+DEFAULT_OUTPUT_DIR = 'analysis_output'
+
+# The GPS chart labels at most one entity per cell of this many x this many.
+GPS_LABEL_GRID = 24
+
+
+def _counts(series, label):
+    counts = series.value_counts(sort=True)
+    counts = counts[counts > 0]
+    return counts.rename_axis(label).reset_index(name='Count')
+
+
+# --- Reports -----------------------------------------------------------------
+#
+# Every report takes the table from ``build_entity_table`` and returns a
+# DataFrame whose columns are the report's headings.
+
+def device_state_distribution(table):
+    """State counts per domain for sensors, binary sensors, lights and trackers."""
+    devices = table[table['domain'].isin(DEVICE_RELATED_DOMAINS) & table['state'].notna()]
+    counts = devices.groupby(['domain', 'state'], observed=True).size()
+    return counts.rename_axis(['Domain', 'State']).reset_index(name='Count')
+
+
+def entity_type_distribution(table):
+    """Number of entities per domain."""
+    return _counts(table['domain'], 'Entity Type')
+
+
+def state_distribution(table):
+    """Number of entities per state."""
+    return _counts(table['state'].dropna(), 'State')
+
+
+def battery_levels(table):
+    """Battery percentage of every ``*battery*`` entity, emptiest first."""
+    batteries = table[tagged(table, 'battery') & table['numeric_state'].notna()]
+    batteries = batteries.sort_values('numeric_state', kind='stable')
+    return batteries.assign(level=batteries['numeric_state'].astype('int64'))[
+        ['entity_id', 'level']].set_axis(['Entity ID', 'Battery Level (%)'], axis=1)
+
+
+def occupancy(table):
+    """Unoccupied-rooms sensor status followed by person state counts."""
+    import pandas as pd
+
+    unoccupied = table.loc[(table['entity_id'] == 'sensor.unoccupied_rooms')
+                           & table['state'].notna(), 'state']
+    status = unoccupied.iloc[0] if len(unoccupied) else 'No data'
+    persons = _counts(table.loc[table['domain'] == 'person', 'state'].dropna(), 'State')
+    persons.insert(0, 'Entity', 'person')
+    head = pd.DataFrame({'Entity': ['sensor.unoccupied_rooms'], 'State': [status], 'Count': [None]})
+    return pd.concat([head, persons], ignore_index=True)
+
+
+def activity_metrics(table):
+    """Steps/distance/pace/floors sensors with a numeric state, highest first."""
+    activity = table[tagged(table, 'activity')
+                     & table['numeric_state'].notna()
+                     & table['friendly_name'].notna()]
+    activity = activity.sort_values('numeric_state', ascending=False, kind='stable')
+    return activity.assign(value=activity['numeric_state'].astype('int64'))[
+        ['friendly_name', 'value']].set_axis(['Friendly Name', 'Activity Value'], axis=1)
+
+
+def connectivity_summary(table):
+    """Device x SSID/BSSID/connection-type sensor matrix of states."""
+    sensors = table[tagged(table, 'connectivity')
+                    & table['state'].notna()
+                    & table['friendly_name'].notna()]
+    long = sensors.assign(Device=sensors['friendly_name'].str.split().str[0],
+                          state=sensors['state'].astype('object'))
+    wide = long.pivot_table(index='Device', columns='object_id', values='state', aggfunc='last')
+    return wide.fillna('Not Reported').rename_axis(columns=None).reset_index()
+
+
+def av_sensors(table):
+    """Camera/audio/focus binary sensors with their device and state."""
+    av = table[tagged(table, 'av')
+               & table['state'].notna()
+               & table['friendly_name'].notna()]
+    return av.assign(Device=av['friendly_name'].str.split().str[0])[
+        ['Device', 'object_id', 'state', 'friendly_name']
+    ].set_axis(['Device', 'Sensor', 'State', 'Friendly Name'], axis=1)
+
+
+def gps_positions(table):
+    """Entities that report both latitude and longitude."""
+    gps = table[tagged(table, 'gps')]
+    return gps[['entity_id', 'lat', 'lon']].set_axis(['Entity ID', 'Latitude', 'Longitude'], axis=1)
+
+
+def alerts(table):
+    """Entities whose name or state mentions focus/idle/alert/unavailable/unknown."""
+    hits = table[tagged(table, 'alert')]
+    return hits.assign(Entity=hits['domain'].astype('object') + ' ' + hits['friendly_name'],
+                       State=hits['state'].astype('object'))[['Entity', 'State']]
+
+
+def _column_values(column):
+    return column.astype('object').where(column.notna(), None).tolist()
+
+
+def sensor_summaries(table):
+    """The sensor-domain rows of ``table`` as ``schema_validator.sensor_readings`` input."""
+    from schema_validator import SENSOR_DOMAINS
+
+    sensors = table[table['domain'].isin(SENSOR_DOMAINS)]
+    columns = {name: _column_values(sensors[name])
+               for name in ('entity_id', 'device_class', 'state', 'unit')}
+    columns['last_changed'] = _column_values(
+        sensors['last_changed'].dt.strftime('%Y-%m-%dT%H:%M:%S.%fZ'))
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+
+def completeness(table):
+    """Counts of complete records, of records missing state / friendly name, and
+    of sensor readings conforming to ``SensorReading`` or missing / invalid per field."""
+    import pandas as pd
+    from schema_validator import ConformanceReport, reading_fields, sensor_readings
+
+    has_state = table['state'].notna()
+    has_name = table['friendly_name'].notna()
+    conformance = ConformanceReport()
+    conformance.add(sensor_readings(sensor_summaries(table)))
+    required = reading_fields(required_only=True)
+    fields = conformance.table(required).set_index('Field')
+    return pd.DataFrame({
+        'Metric': ['Total Entities', 'Complete Records', 'Missing State', 'Missing Friendly Name',
+                   'Sensor Readings', 'Conforming Sensor Readings']
+                  + [f'Readings Missing {field}' for field in required]
+                  + [f'Readings Invalid {field}' for field in required],
+        'Count': [len(table), int((has_state & has_name).sum()),
+                  int((~has_state).sum()), int((~has_name).sum()),
+                  conformance.records, conformance.conforming]
+                 + [int(fields.at[field, 'Missing']) for field in required]
+                 + [int(fields.at[field, 'Invalid']) for field in required],
+    })
+
+
+def naming_audit(table):
+    """Naming issues for every entity with a friendly name."""
+    import pandas as pd
+
+    named = table[table['friendly_name'].notna()]
+    names = named['friendly_name']
+    lower = names.str.strip().str.lower()
+    type_in_name = pd.Series(False, index=named.index)
+    for domain, rows in named.groupby('domain', observed=True).groups.items():
+        type_in_name[rows] = lower[rows].str.contains(domain, regex=False)
+    checks = (
+        ('Contains special characters', names.str.contains('[_-]')),
+        ('Too short', ~names.str.strip().str.contains(r'\s')),
+        ('No letters', ~names.str.contains(r'[^\W\d_]')),
+        ('Type not in name', ~type_in_name),
+    )
+    issues = names.str.slice(0, 0)
+    for label, mask in checks:
+        issues = issues.where(~mask, issues + ', ' + label)
+    issues = issues.str.removeprefix(', ').replace('', 'OK')
+    return named.assign(issues=issues)[['entity_id', 'friendly_name', 'issues']].set_axis(
+        ['Entity ID', 'Friendly Name', 'Naming Issues'], axis=1)
+
+
+@lru_cache(maxsize=None)
+def _room_resolver():
+    from room_resolver import RoomResolver
+
+    return RoomResolver.from_file()
+
+
+def room_summary(table):
+    """Entities and alerting entities per ``roomEntityMapping`` room."""
+    import pandas as pd
+
+    resolver = _room_resolver()
+    rooms = resolver.room_ids(table)
+    counts = pd.DataFrame({'room': rooms, 'alert': tagged(table, 'alert')}).groupby(
+        'room', observed=True).agg(Entities=('alert', 'size'), Alerts=('alert', 'sum'))
+    titles = {mapping['roomId']: mapping.get('title') for mapping in resolver.mappings}
+    counts = counts.reset_index()
+    counts.insert(1, 'Title', counts['room'].astype('object').map(titles))
+    return counts.rename(columns={'room': 'Room'})
+
+
+def grouped_entities(table):
+    """``{domain: [entity_id, ...]}`` for every named entity."""
+    named = table[table['friendly_name'].notna()]
+    return {domain: ids.tolist()
+            for domain, ids in named.groupby('domain', observed=True, sort=False)['entity_id']}
+
+
+# --- Charts and output -------------------------------------------------------
+
+def _bar(plt, path, labels, values, title, xlabel, ylabel, horizontal=False, rotate=False):
+    fig, ax = plt.subplots(figsize=(12, 6) if horizontal else (10, 5))
+    if horizontal:
+        ax.barh(labels, values)
+        ax.grid(axis='x')
+    else:
+        ax.bar(labels, values)
+        ax.grid(axis='y')
+        if rotate:
+            ax.tick_params(axis='x', labelrotation=45)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+    return [path]
+
+
+def _chart_device_states(frame, plt, path):
+    paths = []
+    for domain, counts in frame.groupby('Domain', sort=False):
+        domain_path = path.replace('.png', f'_{domain}.png')
+        paths += _bar(plt, domain_path, counts['State'].astype(str), counts['Count'],
+                      f'{domain.capitalize()} Device State Distribution', 'State', 'Count')
+    return paths
+
+
+def _chart_columns(title, xlabel, ylabel='Count', horizontal=False):
+    def chart(frame, plt, path):
+        if frame.empty:
+            return []
+        labels, values = frame.iloc[:, 0].astype(str), frame.iloc[:, 1]
+        return _bar(plt, path, labels, values, title, xlabel, ylabel,
+                    horizontal=horizontal, rotate=not horizontal)
+    return chart
+
+
+def _chart_alerts(frame, plt, path):
+    if frame.empty:
+        return []
+    counts = frame['State'].value_counts()
+    return _bar(plt, path, counts.index.astype(str), counts.values,
+                'Alert and Focus State Distribution', 'State', 'Count', rotate=True)
+
+
+def _chart_gps(frame, plt, path):
+    import numpy as np
+
+    if frame.empty:
+        return []
+    fig, ax = plt.subplots(figsize=(8, 6))
+    lons = frame['Longitude'].to_numpy(dtype=np.float64)
+    lats = frame['Latitude'].to_numpy(dtype=np.float64)
+    ax.scatter(lons, lats, marker='o')
+    # Label the first entity of each occupied grid cell, so dense clusters
+    # get one readable label instead of thousands of overlapping ones.
+    cells = np.zeros(len(frame), dtype=np.int64)
+    for values in (lons, lats):
+        extent = np.ptp(values) or 1.0
+        cells = cells * GPS_LABEL_GRID + np.minimum(
+            ((values - values.min()) / extent * GPS_LABEL_GRID).astype(np.int64), GPS_LABEL_GRID - 1)
+    _, first = np.unique(cells, return_index=True)
+    labels = frame['Entity ID'].iloc[first].str.rsplit('.', n=1).str[-1]
+    for lon, lat, label in zip(lons[first], lats[first], labels):
+        ax.text(lon, lat, label, fontsize=8)
+    ax.set_title('Geolocation of Entities')
+    ax.set_xlabel('Longitude')
+    ax.set_ylabel('Latitude')
+    ax.grid(True)
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+    return [path]
+
+
+Report = namedtuple('Report', 'compute chart')
+
+REPORTS = {
+    'device_states': Report(device_state_distribution, _chart_device_states),
+    'entity_types': Report(entity_type_distribution,
+                           _chart_columns('Entity Type Distribution in Home Assistant Environment',
+                                          'Entity Type')),
+    'states': Report(state_distribution,
+                     _chart_columns('Entity State Distribution Across All Entities', 'State')),
+    'battery': Report(battery_levels,
+                      _chart_columns('Device Battery Levels', 'Battery Level (%)', '', horizontal=True)),
+    'occupancy': Report(occupancy, None),
+    'activity': Report(activity_metrics,
+                       _chart_columns('Sensor Activity Metrics', 'Activity Value', '', horizontal=True)),
+    'connectivity': Report(connectivity_summary, None),
+    'av': Report(av_sensors, None),
+    'gps': Report(gps_positions, _chart_gps),
+    'alerts': Report(alerts, _chart_alerts),
+    'completeness': Report(completeness, None),
+    'naming': Report(naming_audit, None),
+    'rooms': Report(room_summary, None),
 }
 
-# Derive total entity count from all entity_id mentions
-total_entities = len(re.findall(r'entity_id\s*:\s*"([^"]+)"', js_content))
-completeness_stats["Total Entities"] = total_entities
-completeness_stats["Missing State"] = total_entities - len(attribute_data)
-completeness_stats["Missing Friendly Name"] = total_entities - len(attribute_data)
-
-# Display updated stats
-df_corrected_completeness = pd.DataFrame(list(completeness_stats.items()), columns=["Metric", "Count"])
-import ace_tools as tools; tools.display_dataframe_to_user(name="Corrected Data Completeness Audit", dataframe=df_corrected_completeness)
-
-# Extract all friendly_names and match them to entity types
-entity_metadata = re.findall(
-    r'entity_id\s*:\s*"([^"]+)"[^}]*?attributes\s*:\s*{[^}]*?friendly_name\s*:\s*"([^"]+)"',
-    js_content,
-    re.DOTALL
-)
-
-# Analyze for naming inconsistencies
-naming_audit = []
-for entity_id, name in entity_metadata:
-    entity_type = entity_id.split(".")[0]
-    clean_name = name.strip().lower()
-
-    issues = []
-    if "_" in name or "-" in name:
-        issues.append("Contains special characters")
-    if len(name.split()) < 2:
-        issues.append("Too short")
-    if not any(char.isalpha() for char in name):
-        issues.append("No letters")
-    if entity_type not in clean_name:
-        issues.append("Type not in name")
-
-    naming_audit.append((entity_id, name, ", ".join(issues) if issues else "OK"))
-
-# Create and display DataFrame
-df_naming = pd.DataFrame(naming_audit, columns=["Entity ID", "Friendly Name", "Naming Issues"])
-import ace_tools as tools; tools.display_dataframe_to_user(name="Sensor Naming Audit", dataframe=df_naming)
-
-from collections import defaultdict
-import yaml
-
-# Group entities by type
-grouped_entities = defaultdict(list)
-for entity_id, _ in entity_metadata:
-    entity_type = entity_id.split(".")[0]
-    grouped_entities[entity_type].append(entity_id)
-
-# Format as YAML-style dictionary under 'grouped_entities'
-grouped_yaml_data = {"grouped_entities": dict(grouped_entities)}
-
-# Write to a YAML file
-grouped_yaml_path = "/mnt/data/grouped_entities_by_category.yaml"
-with open(grouped_yaml_path, "w") as file:
-    yaml.dump(grouped_yaml_data, file, default_flow_style=False)
-
-grouped_yaml_path
-
-from xml.dom.minidom import Document
-
-# Simulate SVG generation since actual SVG content isn't editable from JPEG
-# We'll generate a new SVG using matched rooms and sensor data
-doc = Document()
-
-# Create the root SVG element
-svg = doc.createElement('svg')
-svg.setAttribute('xmlns', 'http://www.w3.org/2000/svg')
-svg.setAttribute('width', '2025')
-svg.setAttribute('height', '1627')
-svg.setAttribute('viewBox', '0 0 2025 1627')
-doc.appendChild(svg)
-
-# Annotate each mapped room with sensor labels
-for room, svg_id in sensor_to_svg_mapping.items():
-    sensors = sensor_data[room]
-    group = doc.createElement('g')
-    group.setAttribute('id', f"{svg_id}_annotated")
-
-    # Add a text label for the room
-    text = doc.createElement('text')
-    text.setAttribute('x', '10')
-    text.setAttribute('y', str(100 + len(svg.childNodes) * 60))
-    text.setAttribute('fill', 'black')
-    text.setAttribute('font-size', '14')
-    text.appendChild(doc.createTextNode(f"{room}: " + ", ".join(sensors.keys())))
-    group.appendChild(text)
-
-    svg.appendChild(group)
-
-# Save the generated SVG
-annotated_svg_path = "/mnt/data/annotated_floorplan.svg"
-with open(annotated_svg_path, "w") as file:
-    doc.writexml(file, indent="  ", addindent="  ", newl="\n")
-
-annotated_svg_path
+
+# How a history window is reduced per report (``HistoryStore.window_table``);
+# every other report sees each entity's last reading in the window.
+WINDOW_REDUCTIONS = {'battery': 'min', 'activity': 'max', 'alerts': 'distinct'}
+
+
+def run_report(name, table):
+    """Compute the report called ``name`` (a key of ``REPORTS``) over ``table``."""
+    with span('report', report=name):
+        return REPORTS[name].compute(table)
+
+
+def window_tables(store, names, start=None, end=None):
+    """``{report name: table}`` for the readings of ``store`` in [start, end).
+
+    Battery levels are each entity's lowest reading in the window, activity
+    values its highest, and alerts list every alerting state seen. Tables
+    are built once per reduction and shared between reports.
+    """
+    tables = {}
+    by_reduction = {}
+    for name in names:
+        reduce = WINDOW_REDUCTIONS.get(name, 'last')
+        if reduce not in by_reduction:
+            by_reduction[reduce] = store.window_table(start, end, reduce)
+        tables[name] = by_reduction[reduce]
+    return tables
+
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def format_text(name, frame):
+    return f'== {name} ({len(frame)} rows)\n' + frame.to_string(index=False)
+
+
+def write_reports(table, out_dir, names=None, charts=True):
+    """Render the selected reports into ``out_dir``; returns the written paths.
+
+    ``table`` is one entity table for every report, or a ``{name: table}``
+    dict such as ``window_tables`` returns.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    plt = _pyplot() if charts else None
+    written = []
+    for name in names or REPORTS:
+        report = REPORTS[name]
+        frame = run_report(name, table[name] if isinstance(table, dict) else table)
+
+        csv_path = os.path.join(out_dir, f'{name}.csv')
+        frame.to_csv(csv_path, index=False)
+        written.append(csv_path)
+
+        if plt is not None and report.chart is not None:
+            with span('chart', report=name):
+                written += report.chart(frame, plt, os.path.join(out_dir, f'{name}.png'))
+    return written
+
+
+def write_grouped_entities(table, path):
+    import yaml
+
+    with open(path, 'w', encoding='utf-8') as f:
+        yaml.dump({'grouped_entities': grouped_entities(table)}, f, default_flow_style=False)
+    return path
+
+
+def write_floorplan(table, path, svg_mapping_path=None, room_sensors_path=None):
+    """Write the annotated floor plan; rooms are resolved from ``table`` unless
+    a room -> sensors YAML is given."""
+    from floorplan_svg import FloorplanTemplate, load_room_positions, room_sensors
+
+    if svg_mapping_path or room_sensors_path:
+        import yaml
+
+    svg_ids = None
+    if svg_mapping_path:
+        with open(svg_mapping_path, 'r', encoding='utf-8') as f:
+            svg_ids = yaml.safe_load(f)
+    if room_sensors_path:
+        with open(room_sensors_path, 'r', encoding='utf-8') as f:
+            sensors = yaml.safe_load(f)
+        sensors = sensors.get('entities_by_room', sensors)
+    else:
+        sensors = room_sensors(table, _room_resolver())
+    with open(path, 'w', encoding='utf-8') as f:
+        FloorplanTemplate(load_room_positions(), svg_ids).render(sensors, f)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render Home Assistant entity reports.')
+    parser.add_argument('dump', nargs='?',
+                        help='entity dump (JS object literal or /api/states JSON)')
+    parser.add_argument('--history', metavar='DIR',
+                        help='run over a history_store directory instead of a dump')
+    parser.add_argument('--since', help='with --history: window start (ISO timestamp, inclusive)')
+    parser.add_argument('--until', help='with --history: window end (ISO timestamp, exclusive)')
+    parser.add_argument('--out', default=DEFAULT_OUTPUT_DIR, help='output directory')
+    parser.add_argument('--report', action='append', choices=sorted(REPORTS),
+                        help='only run this report (repeatable; default: all)')
+    parser.add_argument('--text', action='store_true',
+                        help='print the reports to stdout instead of writing files')
+    parser.add_argument('--no-charts', action='store_true', help='skip the PNG charts')
+    parser.add_argument('--floorplan', action='store_true',
+                        help='also write the annotated floor plan (rooms resolved from the dump)')
+    parser.add_argument('--svg-mapping', help='room -> SVG id YAML for the annotated floor plan')
+    parser.add_argument('--room-sensors',
+                        help='room -> sensors YAML for the floor plan instead of resolved rooms')
+    add_cache_arguments(parser)
+    args = parser.parse_args(argv)
+    if (args.dump is None) == (args.history is None):
+        parser.error('give either an entity dump or --history')
+    names = args.report or list(REPORTS)
+
+    if args.history is not None:
+        from history_store import HistoryStore
+
+        tables = window_tables(HistoryStore(args.history), names, args.since, args.until)
+        # Last readings (the grouped entities YAML), when a selected report uses them.
+        table = next((tables[name] for name in names if name not in WINDOW_REDUCTIONS),
+                     tables[names[0]])
+    else:
+        cache = open_cache(args.no_cache, args.rebuild_cache)
+        table = build_entity_table(cached_records(cache, args.dump, 'entities', load_entities))
+        report_cache(cache)
+        tables = {name: table for name in names}
+
+    if args.text:
+        with quiet_broken_pipe():
+            for name in names:
+                print(format_text(name, run_report(name, tables[name])))
+                print()
+        return 0
+
+    written = write_reports(tables, args.out, names, charts=not args.no_charts)
+    if args.report is None:
+        written.append(write_grouped_entities(
+            table, os.path.join(args.out, 'grouped_entities_by_category.yaml')))
+    if args.floorplan or (args.svg_mapping and args.room_sensors):
+        written.append(write_floorplan(table, os.path.join(args.out, 'annotated_floorplan.svg'),
+                                       args.svg_mapping, args.room_sensors))
+    print(f"Wrote {len(written)} files for {len(table)} entities to '{args.out}'.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
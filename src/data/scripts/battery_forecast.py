@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""Battery drain forecasts for every battery entity at once.
+
+Levels are a (devices x samples) matrix on a shared time axis, NaN where a
+device has no reading; ``levels_matrix`` builds it from the hourly
+``history_store`` rollups. ``fit_drain`` fits a least-squares line to every
+row with whole-array NumPy operations (closed-form slope over the masked
+samples, no per-device loop). Only the current discharge is fitted: samples
+before a device's last rise of more than ``RECHARGE_RISE`` points are
+ignored. Rows are handled ``CHUNK_CELLS`` at a time, so the working memory
+does not grow with the number of devices.
+
+``forecast_batteries`` finds the battery entities from the entity_id column
+of the rollup alone and then reads, fits and tabulates ``CHUNK_DEVICES`` of
+them at a time, so its memory follows the chunk size and the window length,
+not the number of devices.
+
+    python battery_forecast.py history/ --since 2025-04-01 --within 7
+"""
+import argparse
+import sys
+from collections import namedtuple
+
+from entity_table import build_entity_table
+from entity_tags import tagged
+from instrumentation import quiet_broken_pipe
+
+# A rise of more than this many points between two readings is a recharge.
+RECHARGE_RISE = 5.0
+# Lines fitted to fewer samples are not forecast.
+MIN_SAMPLES = 3
+# Slower drains (points per hour) count as not draining.
+MIN_DRAIN_PER_HOUR = 1e-3
+# Matrix cells per chunk: bounds the temporaries of one fitting step.
+CHUNK_CELLS = 1 << 22
+# Devices whose rollup is read into one levels matrix by forecast_batteries.
+CHUNK_DEVICES = 1024
+
+Drain = namedtuple('Drain', 'rate level last_time hours_to_empty samples')
+Drain.__doc__ = """Per-device arrays from ``fit_drain``.
+
+rate            fitted change per hour (negative while draining)
+level           fitted level at the device's last reading, clipped to 0-100
+last_time       time of the last reading, in the units of ``times``
+hours_to_empty  level / -rate; inf when not draining, NaN when too few samples
+samples         readings used in the fit
+"""
+
+
+def _fit_chunk(x, levels):
+    import numpy as np
+
+    rows, width = levels.shape
+    columns = np.arange(width, dtype=np.int32)
+    valid = ~np.isnan(levels)
+    # Index of the latest reading at or before each column (-1 if none).
+    seen = np.where(valid, columns, np.int32(-1))
+    np.maximum.accumulate(seen, axis=1, out=seen)
+
+    # A recharge is a rise over the previous reading: the previous column,
+    # or across a gap the last reading before it (looked up for gap ends only).
+    rise = np.zeros((rows, width), dtype=bool)
+    with np.errstate(invalid='ignore'):
+        rise[:, 1:] = levels[:, 1:] - levels[:, :-1] > RECHARGE_RISE
+    gap_rows, gap_columns = np.nonzero(valid[:, 1:] & ~valid[:, :-1])
+    gap_columns += 1
+    before = seen[gap_rows, gap_columns - 1]
+    after_reading = before >= 0
+    gap_rows, gap_columns, before = (gap_rows[after_reading], gap_columns[after_reading],
+                                     before[after_reading])
+    rise[gap_rows, gap_columns] = (levels[gap_rows, gap_columns] - levels[gap_rows, before]
+                                   > RECHARGE_RISE)
+    start = np.where(rise.any(axis=1), width - 1 - np.argmax(rise[:, ::-1], axis=1), 0)
+    used = valid & (columns >= start[:, None])
+
+    # Row sums as matrix-vector products over the used samples.
+    weights = used.astype(np.float64)
+    y = np.where(used, levels, 0.0).astype(np.float64, copy=False)
+    n = weights.sum(axis=1)
+    sum_x = weights @ x
+    sum_xx = weights @ (x * x)
+    sum_y = y.sum(axis=1)
+    sum_xy = y @ x
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rate = (n * sum_xy - sum_x * sum_y) / (n * sum_xx - sum_x * sum_x)
+        level = (sum_y - rate * sum_x) / n + rate * x[np.maximum(seen[:, -1], 0)]
+    return rate, level, seen[:, -1], n.astype(np.int64)
+
+
+def fit_drain(times, levels, chunk_cells=CHUNK_CELLS):
+    """Fit a drain line to every row of ``levels``; returns a ``Drain``.
+
+    ``times`` is the shared time axis of the columns, as increasing hours
+    (floats); ``levels`` a (devices x samples) array of percentages with
+    NaN for missing readings.
+    """
+    import numpy as np
+
+    times = np.asarray(times, dtype=np.float64)
+    # Centring the axis keeps the uncentred sums of _fit_chunk well conditioned.
+    x = times - times.mean() if len(times) else times
+    devices = len(levels)
+    rate = np.empty(devices)
+    level = np.empty(devices)
+    last = np.empty(devices, dtype=np.int64)
+    samples = np.empty(devices, dtype=np.int64)
+    step = max(1, chunk_cells // max(1, len(times)))
+    for begin in range(0, devices, step):
+        chunk = slice(begin, begin + step)
+        rate[chunk], level[chunk], last[chunk], samples[chunk] = _fit_chunk(x, levels[chunk])
+    level = np.clip(level, 0, 100)
+    last_time = times[np.maximum(last, 0)] if len(times) else np.full(devices, np.nan)
+
+    fitted = samples >= MIN_SAMPLES
+    rate[~fitted] = np.nan
+    with np.errstate(invalid='ignore', divide='ignore'):
+        hours_to_empty = np.where(rate < -MIN_DRAIN_PER_HOUR, level / -rate, np.inf)
+    hours_to_empty[~fitted] = np.nan
+    return Drain(rate, level, last_time, hours_to_empty, samples)
+
+
+def forecast_table(entity_ids, times, levels):
+    """Time-to-empty table for ``levels`` rows named ``entity_ids``, soonest first.
+
+    ``times`` are the column timestamps (a pandas DatetimeIndex).
+    """
+    import numpy as np
+    import pandas as pd
+
+    origin = times[0] if len(times) else pd.Timestamp(0, tz='UTC')
+    hours = np.asarray((times - origin) / pd.Timedelta(hours=1), dtype=np.float64)
+    drain = fit_drain(hours, levels)
+    finite = np.isfinite(drain.hours_to_empty)
+    empty_at = pd.Series(pd.NaT, index=range(len(entity_ids)), dtype=times.dtype)
+    empty_at[finite] = origin + pd.to_timedelta(
+        (drain.last_time + drain.hours_to_empty)[finite], unit='h')
+    table = pd.DataFrame({
+        'Entity ID': list(entity_ids),
+        'Battery Level (%)': drain.level.round(1),
+        'Drain (%/day)': (-24 * drain.rate).round(2),
+        'Hours to Empty': drain.hours_to_empty.round(1),
+        'Empty At': empty_at,
+        'Samples': drain.samples,
+    })
+    return _soonest_first(table)
+
+
+def _soonest_first(table):
+    return table.sort_values(['Hours to Empty', 'Entity ID'], kind='stable', ignore_index=True)
+
+
+def battery_entity_ids(store, start=None, end=None, frequency='1h'):
+    """Ids of the battery entities with a numeric reading in the window.
+
+    Rollups only hold numeric readings, so these are the battery-tagged ids
+    of ``HistoryStore.rollup_entity_ids``; no readings are loaded.
+    """
+    table = build_entity_table({'entity_id': entity_id}
+                               for entity_id in store.rollup_entity_ids(frequency, start, end))
+    return table.loc[tagged(table, 'battery'), 'entity_id'].tolist()
+
+
+def levels_matrix(store, entity_ids, start=None, end=None, frequency='1h'):
+    """``(entity_ids, times, levels)`` from the ``frequency`` rollup means."""
+    import numpy as np
+    import pandas as pd
+
+    frame = store.rollup(frequency, start, end, entity_ids)
+    rows, ids = pd.factorize(frame['entity_id'])
+    columns, times = pd.factorize(frame['bucket'], sort=True)
+    levels = np.full((len(ids), len(times)), np.nan)
+    levels[rows, columns] = frame['mean'].to_numpy()
+    return list(ids), pd.DatetimeIndex(times), levels
+
+
+def forecast_batteries(store, start=None, end=None, chunk_devices=CHUNK_DEVICES):
+    """Time-to-empty table for every battery entity of a ``HistoryStore``."""
+    import pandas as pd
+
+    ids = battery_entity_ids(store, start, end)
+    chunks = [ids[begin:begin + chunk_devices] for begin in range(0, len(ids), chunk_devices)]
+    tables = [forecast_table(*levels_matrix(store, chunk, start, end)) for chunk in chunks or [[]]]
+    return _soonest_first(pd.concat(tables, ignore_index=True)) if len(tables) > 1 else tables[0]
+
+
+def main(argv=None):
+    from history_store import HistoryStore
+
+    parser = argparse.ArgumentParser(description='Forecast when batteries run empty.')
+    parser.add_argument('store', help='history_store directory')
+    parser.add_argument('--since', help='fit readings from here on (ISO timestamp)')
+    parser.add_argument('--until', help='fit readings before this (ISO timestamp)')
+    parser.add_argument('--within', type=float, metavar='DAYS',
+                        help='only list batteries expected to run empty within DAYS')
+    parser.add_argument('--csv', action='store_true', help='print CSV instead of a text table')
+    args = parser.parse_args(argv)
+
+    table = forecast_batteries(HistoryStore(args.store), args.since, args.until)
+    if args.within is not None:
+        table = table[table['Hours to Empty'] <= 24 * args.within]
+    with quiet_broken_pipe():
+        if args.csv:
+            table.to_csv(sys.stdout, index=False)
+        else:
+            print(table.to_string(index=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""On-disk cache of parsed entity dumps, shared by the extraction scripts.
+
+Each cached result is an NDJSON stream (gzip level 1) stored next to a small
+SQLite index under the cache directory. An entry belongs to one
+``(path, kind)`` pair and is only served when the parser version and the
+file's size, mtime and content hash still match. ``kind`` keeps different
+views of the same file apart, e.g. full entities for the reports and
+summaries for ``extract_entities``. The size and mtime are checked first:
+while they are unchanged the file is not re-read at all. When only the mtime
+moved (a ``touch`` or a fresh copy), the content is hashed and a matching
+entry is kept. Records are written and read one at a time, so caching never
+holds a whole dump in memory. The least recently used entries are evicted
+once the blobs exceed ``max_bytes``.
+"""
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from entity_parser import PARSER_VERSION
+from instrumentation import count
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'smart-campus-entities',
+)
+DEFAULT_MAX_BYTES = 512 << 20
+
+_HASH_CHUNK = 1 << 20
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    path TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    blob TEXT NOT NULL,
+    nbytes INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (path, kind)
+)
+'''
+
+
+def file_digest(path):
+    """BLAKE2b hex digest of the file's bytes."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_CHUNK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class EntityCache:
+    """Per-file cache of parsed records; see the module docstring.
+
+    ``rebuild=True`` ignores existing entries but still writes fresh ones.
+    ``hits`` and ``misses`` count lookups since the cache was opened.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES, rebuild=False):
+        self.cache_dir = cache_dir or os.environ.get('ENTITY_CACHE_DIR') or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.rebuild = rebuild
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(self.cache_dir, 'index.sqlite'), timeout=30)
+        self._db.execute(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    def summary(self):
+        return f'entity cache: {self.hits} hits, {self.misses} misses'
+
+    def lookup(self, path, kind):
+        """Return the blob path of a valid entry for ``path``, or None."""
+        path = os.path.abspath(path)
+        row = None if self.rebuild else self._db.execute(
+            'SELECT version, size, mtime_ns, digest, blob FROM entries WHERE path = ? AND kind = ?',
+            (path, kind),
+        ).fetchone()
+        if row is None or row[0] != PARSER_VERSION or not os.path.exists(self._blob_path(row[4])):
+            self.misses += 1
+            count('entity_cache_misses')
+            return None
+        version, size, mtime_ns, digest, blob = row
+        stat = os.stat(path)
+        if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+            if stat.st_size != size or file_digest(path) != digest:
+                self.misses += 1
+                count('entity_cache_misses')
+                return None
+        with self._db:
+            self._db.execute(
+                'UPDATE entries SET mtime_ns = ?, last_used = ? WHERE path = ? AND kind = ?',
+                (stat.st_mtime_ns, time.time(), path, kind),
+            )
+        self.hits += 1
+        count('entity_cache_hits')
+        return self._blob_path(blob)
+
+    @staticmethod
+    def read(blob_path):
+        """Yield the records stored in a blob returned by ``lookup``."""
+        with gzip.open(blob_path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+    def store(self, path, kind, records):
+        """Write ``records`` as the entry for ``path``, passing each one through.
+
+        The entry is only committed once ``records`` is exhausted; if the
+        consumer stops early the partial blob is discarded.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        digest = file_digest(path)
+        blob = hashlib.blake2b(f'{path}\0{kind}'.encode(), digest_size=16).hexdigest() + '.ndjson.gz'
+        blob_path = self._blob_path(blob)
+        tmp_path = f'{blob_path}.{os.getpid()}.tmp'
+        try:
+            with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=1) as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False))
+                    f.write('\n')
+                    yield record
+            os.replace(tmp_path, blob_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        with self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (path, kind, PARSER_VERSION, stat.st_size, stat.st_mtime_ns, digest, blob,
+                 os.path.getsize(blob_path), time.time()),
+            )
+        self._evict()
+
+    def records(self, path, kind, produce):
+        """Yield the records for ``path``: from the cache, else from ``produce(path)``."""
+        blob_path = self.lookup(path, kind)
+        if blob_path is not None:
+            return self.read(blob_path)
+        return self.store(path, kind, produce(path))
+
+    def _blob_path(self, blob):
+        return os.path.join(self.cache_dir, blob)
+
+    def _evict(self):
+        rows = self._db.execute(
+            'SELECT path, kind, blob, nbytes FROM entries ORDER BY last_used DESC'
+        ).fetchall()
+        total = 0
+        stale = []
+        for path, kind, blob, nbytes in rows:
+            total += nbytes
+            if total > self.max_bytes:
+                stale.append((path, kind, blob))
+        if not stale:
+            return
+        with self._db:
+            self._db.executemany('DELETE FROM entries WHERE path = ? AND kind = ?',
+                                 [(path, kind) for path, kind, _ in stale])
+        for _, _, blob in stale:
+            try:
+                os.remove(self._blob_path(blob))
+            except FileNotFoundError:
+                pass
+
+
+def add_cache_arguments(parser, inputs='the dump'):
+    """Add the ``--no-cache`` and ``--rebuild-cache`` options to an argparse parser.
+
+    ``inputs`` names what is parsed, for the help texts ("every dump").
+    """
+    parser.add_argument('--no-cache', action='store_true', help=f'always re-parse {inputs}')
+    parser.add_argument('--rebuild-cache', action='store_true',
+                        help=f're-parse {inputs} and refresh its cache entry')
+
+
+def open_cache(no_cache=False, rebuild=False):
+    """The CLI's cache for ``--no-cache`` / ``--rebuild-cache``, or None."""
+    return None if no_cache else EntityCache(rebuild=rebuild)
+
+
+def cached_records(cache, path, kind, produce):
+    """``produce(path)``, through ``cache.records`` when ``cache`` is not None."""
+    if cache is None:
+        return produce(path)
+    return cache.records(path, kind, produce)
+
+
+def report(cache):
+    """Print the hit/miss counters to stderr and close the cache."""
+    if cache is not None:
+        print(cache.summary(), file=sys.stderr)
+        cache.close()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""Single-pass parser for Home Assistant entity dumps.
+
+Reads either the JS object literal we keep in
+``src/data/static/mockup-Room_entity_data.js`` (``export const ROOM_ENTITY_MAP
+= [ {...}, ... ];``) or the JSON written by ``scripts/fetch-ha-entities.mjs``
+(``/api/states``) and yields one dict per entity (``entity_id``, ``state``,
+``attributes``, ``last_changed``, ``context``, ...).
+
+The input is tokenized exactly once with a single compiled pattern. Every
+alternative is bounded by its own delimiter, so there is no cross-entity
+backtracking and the cost is linear in the input size. Entities are yielded as
+soon as their closing brace is seen and are not retained, which keeps memory
+flat when the input is fed in chunks. Entities that are already strict JSON
+are handed to the C decoder in one call instead of being tokenized.
+"""
+import gzip
+import io
+import json
+import sys
+
+import re
+
+from instrumentation import count, span
+
+# One key/value pair (or one bracket) per match; leading whitespace and commas
+# are consumed by the same match. Groups are dispatched on m.lastindex.
+_TOKEN_REGEX = re.compile(r'''
+    [\s,]*
+    (?:(
+        [A-Za-z_$][\w$]*
+      | "[^"\\]*(?:\\.[^"\\]*)*"
+      | '[^'\\]*(?:\\.[^'\\]*)*'
+    )\s*:\s*)?                                      # 1: key of a key/value pair
+    (?:
+        ([{\[])                                     # 2: open
+      | ([}\]])                                     # 3: close
+      | "([^"\\]*(?:\\.[^"\\]*)*)"                  # 4: double-quoted string
+      | '([^'\\]*(?:\\.[^'\\]*)*)'                  # 5: single-quoted string
+      | (-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)    # 6: number
+      | ([A-Za-z_$][\w$]*)                          # 7: identifier
+      | (//[^\n]*|/\*[\s\S]*?\*/|[:=;])             # 8: separators and comments
+    )
+''', re.VERBOSE)
+
+_TRAILING_WS = re.compile(r'[\s,;]*')
+
+_UNESCAPED_DOUBLE_QUOTE = re.compile(r'(?<!\\)((?:\\\\)*)"')
+
+_IDENTIFIER_VALUES = {
+    'true': True,
+    'false': False,
+    'null': None,
+    'undefined': None,
+    'NaN': float('nan'),
+    'Infinity': float('inf'),
+}
+
+# A token ending this close to the end of the buffer may continue in the
+# next chunk: "-2.5e" matches as the number -2.5 before "3" arrives.
+_TOKEN_MARGIN = 2
+
+# A JSON decode error this close to the end of the buffer may just mean the
+# entity continues in the next chunk.
+_TRUNCATION_MARGIN = 16
+
+# Bump whenever the shape of the yielded records changes.
+PARSER_VERSION = 1
+
+CHUNK_SIZE = 1 << 20
+
+_GZIP_MAGIC = b'\x1f\x8b'
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+class EntityParseError(ValueError):
+    """Raised when the dump contains something the tokenizer cannot read."""
+
+
+def _decode_string(raw, quote):
+    if '\\' not in raw:
+        return raw
+    if quote == "'":
+        # Re-quote as a JSON string: unescape \' and escape bare double quotes.
+        raw = _UNESCAPED_DOUBLE_QUOTE.sub(r'\1\\"', raw.replace("\\'", "'"))
+    try:
+        return json.loads(f'"{raw}"')
+    except json.JSONDecodeError:
+        return raw
+
+
+def _iter_chunks(source, chunk_size):
+    if isinstance(source, str):
+        yield source
+        return
+    if hasattr(source, 'read'):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        yield from source
+
+
+def iter_entities(source, chunk_size=CHUNK_SIZE):
+    """Yield entity dicts from ``source`` in a single pass.
+
+    ``source`` may be a string, a text file object or any iterable of text
+    chunks. An object is yielded when it carries a string ``entity_id`` and is
+    not nested inside another entity; everything around the entity list
+    (``export const ... =``, wrapper objects, comments) is ignored.
+    """
+    chunks = _iter_chunks(source, chunk_size)
+    buf = ''
+    pos = 0
+    eof = False
+    match = _TOKEN_REGEX.match
+    raw_decode = json.JSONDecoder().raw_decode
+    json_fast_path = True
+
+    # Enclosing frames as (container, pending_key, is_entity).
+    stack = []
+    container = None
+    key = None
+    is_entity = False
+    open_entities = 0
+
+    while True:
+        m = match(buf, pos)
+        if m is None or (m.end() + _TOKEN_MARGIN >= len(buf) and not eof):
+            if not eof:
+                # Token may be cut at the chunk boundary: refill and retry.
+                chunk = next(chunks, None)
+                if chunk is None:
+                    eof = True
+                else:
+                    buf = buf[pos:] + chunk
+                    pos = 0
+                continue
+            if _TRAILING_WS.match(buf, pos).end() == len(buf):
+                break
+            raise EntityParseError(f'Unexpected input near: {buf[pos:pos + 40]!r}')
+
+        kind = m.lastindex
+        if kind == 2 and json_fast_path and not open_entities and type(container) is list:
+            start = m.end() - 1
+            try:
+                value, end = raw_decode(buf, start)
+            except json.JSONDecodeError as e:
+                if not eof and (e.pos >= len(buf) - _TRUNCATION_MARGIN
+                                or e.msg.startswith('Unterminated string')):
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        eof = True
+                    else:
+                        buf = buf[pos:] + chunk
+                        pos = 0
+                    continue
+                # Not JSON (bare keys, comments...): tokenize from here on.
+                json_fast_path = False
+            else:
+                if type(value) is dict and type(value.get('entity_id')) is str:
+                    pos = end
+                    yield value
+                    continue
+        pos = m.end()
+
+        k = m.group(1)
+        if k is not None:
+            key = k if k[0] != '"' and k[0] != "'" else _decode_string(k[1:-1], k[0])
+
+        if kind == 4:
+            value = m.group(4)
+            if '\\' in value:
+                value = _decode_string(value, '"')
+        elif kind == 2:
+            stack.append((container, key, is_entity))
+            container = {} if m.group(2) == '{' else []
+            key = None
+            is_entity = False
+            continue
+        elif kind == 3:
+            if not stack:
+                raise EntityParseError(f'Unbalanced {m.group(3)!r} in entity dump')
+            value = container
+            finished_entity = is_entity
+            container, key, is_entity = stack.pop()
+            if finished_entity:
+                open_entities -= 1
+                if not open_entities:
+                    key = None
+                    yield value
+                    continue
+        elif kind == 6:
+            text = m.group(6)
+            value = float(text) if '.' in text or 'e' in text or 'E' in text else int(text)
+        elif kind == 7:
+            name = m.group(7)
+            if container is None:
+                # ``export const ROOM_ENTITY_MAP`` and friends.
+                continue
+            if key is None and type(container) is dict:
+                key = name
+                continue
+            if name not in _IDENTIFIER_VALUES:
+                raise EntityParseError(f'Unexpected identifier {name!r} in entity dump')
+            value = _IDENTIFIER_VALUES[name]
+        elif kind == 5:
+            value = _decode_string(m.group(5), "'")
+        else:
+            continue
+
+        if container is None:
+            continue
+        if type(container) is list:
+            container.append(value)
+        elif key is None:
+            key = value
+        else:
+            container[key] = value
+            if key == 'entity_id' and not is_entity and type(value) is str:
+                is_entity = True
+                open_entities += 1
+            key = None
+
+
+def parse_entities(source):
+    """Return every entity in ``source`` as a list (see ``iter_entities``)."""
+    return list(iter_entities(source))
+
+
+def open_dump(path):
+    """Open an entity dump for reading as text, gzip/zstd-compressed or not.
+
+    Compression is detected from the file's magic bytes; zstd needs the
+    optional ``zstandard`` package.
+    """
+    raw = open(path, 'rb')
+    magic = raw.peek(4)[:4] if hasattr(raw, 'peek') else b''
+    if magic.startswith(_GZIP_MAGIC):
+        return io.TextIOWrapper(gzip.GzipFile(fileobj=raw), encoding='utf-8')
+    if magic == _ZSTD_MAGIC:
+        try:
+            import zstandard
+        except ImportError:
+            raw.close()
+            raise RuntimeError(
+                f"'{path}' is zstd-compressed; install it with: pip install zstandard"
+            ) from None
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(reader, encoding='utf-8')
+    return io.TextIOWrapper(raw, encoding='utf-8')
+
+
+def load_entities(path):
+    """Parse the (optionally compressed) entity dump stored at ``path``."""
+    with span('parse'), open_dump(path) as f:
+        entities = parse_entities(f)
+    count('entities_parsed', len(entities))
+    return entities
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else 'mockup-Room_entity_data.js'
+    entities = load_entities(path)
+    print(f"Parsed {len(entities)} entities from '{path}'.")
+
+
+if __name__ == '__main__':
+    main()
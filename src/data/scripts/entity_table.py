@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Columnar view of a parsed entity dump, shared by every analysis report.
+
+``build_entity_table`` walks the entity list once and returns one pandas
+DataFrame with a fixed set of columns; reports are then vectorized
+filters/groupbys over it instead of each building its own list of tuples.
+``domain`` and ``state`` are categoricals, so string work on them (numeric
+parsing, keyword matching) runs once per distinct value, not once per row.
+``tags`` holds the ``entity_tags`` categories of every entity.
+"""
+from entity_tags import tag_entities
+from instrumentation import span
+
+# Home Assistant truncates states to 255 characters; never scan further.
+MAX_STATE_LENGTH = 255
+
+COLUMNS = (
+    'entity_id',
+    'domain',
+    'object_id',
+    'state',
+    'numeric_state',
+    'unit',
+    'friendly_name',
+    'device_class',
+    'last_changed',
+    'lat',
+    'lon',
+    'tags',
+)
+
+# First number in a state: "60", "60 %", "-3.5", "1200 steps".
+NUMERIC_STATE_PATTERN = r'(-?\d+(?:\.\d+)?)'
+
+
+@span('entity_table')
+def build_entity_table(entities):
+    """Return the entities as a DataFrame with the ``COLUMNS`` layout."""
+    import pandas as pd
+
+    entity_ids, domains, object_ids, states = [], [], [], []
+    units, names, device_classes, last_changed, lats, lons = [], [], [], [], [], []
+
+    # This loop is the only per-entity Python work behind every report.
+    for entity in entities:
+        entity_id = entity['entity_id']
+        domain, _, object_id = entity_id.partition('.')
+        attributes = entity.get('attributes')
+        if type(attributes) is not dict:
+            attributes = {}
+        state = entity.get('state')
+        name = attributes.get('friendly_name')
+        unit = attributes.get('unit_of_measurement')
+        device_class = attributes.get('device_class')
+        changed = entity.get('last_changed')
+        lat = attributes.get('latitude')
+        lon = attributes.get('longitude')
+
+        entity_ids.append(entity_id)
+        domains.append(domain)
+        object_ids.append(object_id)
+        states.append(state[:MAX_STATE_LENGTH] if type(state) is str and state else None)
+        units.append(unit if type(unit) is str and unit else None)
+        names.append(name if type(name) is str and name else None)
+        device_classes.append(device_class if type(device_class) is str and device_class else None)
+        last_changed.append(changed if type(changed) is str else None)
+        lats.append(lat if type(lat) is float else None)
+        lons.append(lon if type(lon) is float else None)
+
+    domain_column = pd.Series(domains, dtype='category')
+    # Via object dtype: an all-None column still gets string categories.
+    state_column = pd.Series(states, dtype='object').astype('category')
+    lat_column = pd.Series(lats, dtype='float64')
+    lon_column = pd.Series(lons, dtype='float64')
+    numeric_state = pd.to_numeric(
+        state_column.str.extract(NUMERIC_STATE_PATTERN, expand=False), errors='coerce'
+    ).astype('float64')
+
+    table = pd.DataFrame({
+        'entity_id': pd.Series(entity_ids, dtype='object'),
+        'domain': domain_column,
+        'object_id': pd.Series(object_ids, dtype='object'),
+        'state': state_column,
+        'numeric_state': numeric_state,
+        'unit': pd.Series(units, dtype='category'),
+        'friendly_name': pd.Series(names, dtype='object'),
+        'device_class': pd.Series(device_classes, dtype='category'),
+        'last_changed': pd.to_datetime(pd.Series(last_changed, dtype='object'),
+                                       utc=True, errors='coerce', format='ISO8601'),
+        'lat': lat_column,
+        'lon': lon_column,
+        'tags': tag_entities(object_ids, domain_column, state_column, names,
+                             lat_column, lon_column),
+    }, columns=list(COLUMNS))
+    return table
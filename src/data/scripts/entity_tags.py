@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""One-pass classification of entities into report categories.
+
+Every entity gets a small bit mask of ``TAGS`` when the entity table is
+built, so reports select rows with one integer test instead of re-running
+keyword scans. Classification works on whole columns: the object ids (and
+the friendly names) are joined into one newline-separated buffer
+(``JoinedColumn``), lowered once where a rule is case-insensitive, and each
+keyword is located with ``str.find`` over that buffer. Hit offsets are mapped back to rows with a
+binary search, so the scan runs in C and Python only touches actual hits.
+State keywords are matched once per distinct state (states are
+categorical).
+"""
+ACTIVITY_KEYWORDS = ('steps', 'distance', 'pace', 'floors_ascended', 'floors_descended')
+CONNECTIVITY_SUFFIXES = ('ssid', 'bssid', 'connection_type')
+AV_SUFFIXES = ('camera', 'audio_input', 'audio_output', 'focus')
+ALERT_KEYWORDS = ('focus', 'idle', 'alert', 'attention', 'unavailable', 'unknown')
+
+TAGS = ('battery', 'activity', 'connectivity', 'av', 'alert', 'gps')
+TAG_BITS = {tag: 1 << bit for bit, tag in enumerate(TAGS)}
+
+
+# (tag, keywords, suffix only, case-insensitive, restricted to domain)
+_OBJECT_ID_RULES = (
+    ('battery', ('battery',), False, False, None),
+    ('activity', ACTIVITY_KEYWORDS, False, True, 'sensor'),
+    ('connectivity', CONNECTIVITY_SUFFIXES, True, False, 'sensor'),
+    ('av', AV_SUFFIXES, True, False, 'binary_sensor'),
+)
+
+
+def _find_all(text, word):
+    hits = []
+    find = text.find
+    pos = find(word)
+    while pos != -1:
+        hits.append(pos)
+        pos = find(word, pos + 1)
+    return hits
+
+
+class JoinedColumn:
+    """A list of strings as one buffer, one value per line.
+
+    ``rows`` finds which values contain a word with one ``str.find`` scan of
+    the whole buffer per word, so the cost is C-level and Python only runs
+    per hit.
+    """
+
+    def __init__(self, values):
+        self.values = values
+        self.text, self.starts = self._join(values)
+        self._lower = None
+
+    @staticmethod
+    def _join(values):
+        import numpy as np
+
+        widths = np.fromiter(map(len, values), dtype=np.int64, count=len(values)) + 1
+        # Every value sits between two newlines; row i starts at starts[i].
+        return '\n' + '\n'.join(values) + '\n', np.cumsum(widths) - widths + 1
+
+    def rows(self, words, suffix=False, prefix=False, ignore_case=False):
+        """Sorted row indices whose value contains (starts/ends with) a word."""
+        import numpy as np
+
+        if ignore_case:
+            if self._lower is None:
+                # Lowered per value, with its own offsets: lower() can change
+                # a value's length ('İ' becomes two code points).
+                self._lower = self._join([value.lower() for value in self.values])
+            text, starts = self._lower
+        else:
+            text, starts = self.text, self.starts
+        hits = []
+        for word in words:
+            hits += _find_all(text, ('\n' if prefix else '') + word + ('\n' if suffix else ''))
+        # Hits point at the word (or its leading newline, hence the +1);
+        # side='right' keeps a value containing a newline mapped to its own row.
+        offsets = np.asarray(hits, dtype=np.int64) + (1 if prefix else 0)
+        return np.unique(np.searchsorted(starts, offsets, side='right') - 1)
+
+
+def tag_entities(object_ids, domains, states, friendly_names, lats, lons):
+    """Bit mask of ``TAGS`` per entity, as a uint8 array.
+
+    ``object_ids`` and ``friendly_names`` are lists (names may be None);
+    ``domains`` and ``states`` are categorical Series and ``lats``/``lons``
+    float Series, as in ``entity_table``. ``alert`` needs both a state and a
+    friendly name, one of which mentions an ``ALERT_KEYWORDS`` word; ``gps``
+    needs both coordinates.
+    """
+    import numpy as np
+
+    tags = np.zeros(len(object_ids), dtype=np.uint8)
+
+    column = JoinedColumn(object_ids)
+    for tag, keywords, suffix, ignore_case, domain in _OBJECT_ID_RULES:
+        rows = column.rows(keywords, suffix=suffix, ignore_case=ignore_case)
+        if domain is not None:
+            rows = rows[np.asarray(domains.iloc[rows] == domain)]
+        tags[rows] |= TAG_BITS[tag]
+
+    has_name = np.fromiter((name is not None for name in friendly_names), dtype=bool,
+                           count=len(friendly_names))
+    alert = np.zeros(len(object_ids), dtype=bool)
+    alert[JoinedColumn([name or '' for name in friendly_names]).rows(
+        ALERT_KEYWORDS, ignore_case=True)] = True
+    categories = states.cat.categories
+    lowered = categories.str.lower()
+    alert_states = categories[np.logical_or.reduce(
+        [lowered.str.contains(word, regex=False) for word in ALERT_KEYWORDS])]
+    alert |= np.asarray(states.isin(alert_states))
+    tags[alert & has_name & np.asarray(states.notna())] |= TAG_BITS['alert']
+
+    tags[np.asarray(lats.notna() & lons.notna())] |= TAG_BITS['gps']
+    return tags
+
+
+def tagged(table, tag):
+    """Boolean mask of the table rows carrying ``tag``."""
+    return (table['tags'] & TAG_BITS[tag]) != 0
@@ -1,69 +1,230 @@
 #!/usr/bin/env python3
-import re
+import argparse
+import glob
 import json
+import os
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+
+import instrumentation
+from entity_cache import add_cache_arguments, cached_records, open_cache, report as report_cache
+from entity_parser import iter_entities, open_dump
+from schema_validator import ConformanceReport, reading_fields, sensor_readings, validated
+
+# Flush NDJSON output every this many entities so consumers can start early.
+FLUSH_EVERY = 1000
+
+# What a directory argument expands to in multi-file mode.
+DUMP_PATTERNS = ('*.js', '*.json', '*.js.gz', '*.json.gz', '*.js.zst', '*.json.zst')
+
+
+def summarize(entity):
+    """Reduce a parsed entity to the fields this script reports."""
+    attributes = entity.get('attributes')
+    if type(attributes) is not dict:
+        attributes = {}
+    return {
+        'entity_id': entity['entity_id'],
+        'id': attributes.get('id'),
+        'friendly_name': attributes.get('friendly_name'),
+        'device_class': attributes.get('device_class'),
+        'state': entity.get('state'),
+        'last_changed': entity.get('last_changed'),
+        'last_updated': entity.get('last_updated'),
+    }
+
+
+def iter_extract_entities(path):
+    """Yield one ``summarize``d entity at a time from the dump at ``path``.
+
+    The dump is read with ``entity_parser``'s single-pass scanner, so layout
+    does not matter (pretty-printed, minified or all on one line) and braces
+    or quotes inside string values are handled. Only the entity being read is
+    held in memory. ``path`` may be gzip- or zstd-compressed.
+    """
+    with open_dump(path) as f:
+        for entity in iter_entities(f):
+            yield summarize(entity)
+
 
 def extract_entities(path):
-    entities = []
-    collecting = False
-    in_attrs = False
-    brace_depth = 0
-    entry = {}
-
-    with open(path, 'r', encoding='utf-8') as f:
-        for raw in f:
-            line = raw.strip()
-
-            # Start a new entry when we see entity_id
-            if not collecting and line.startswith('entity_id'):
-                m = re.match(r'entity_id\s*:\s*"([^"]+)"', line)
-                if m:
-                    collecting = True
-                    entry = {
-                        'entity_id': m.group(1),
-                        'id': None,
-                        'friendly_name': None
-                    }
-                continue
-
-            if collecting:
-                # Enter attributes block
-                if not in_attrs and line.startswith('attributes'):
-                    in_attrs = True
-                    # one '{' follows 'attributes'
-                    brace_depth = 1
-                    continue
-
-                if in_attrs:
-                    # Track nested braces
-                    brace_depth += line.count('{') - line.count('}')
-                    # Try to capture `id: "..."` if not yet set
-                    if entry['id'] is None:
-                        m_id = re.match(r'id\s*:\s*"([^"]+)"', line)
-                        if m_id:
-                            entry['id'] = m_id.group(1)
-                    # Capture friendly_name
-                    if entry['friendly_name'] is None:
-                        m_fn = re.match(r'friendly_name\s*:\s*"([^"]+)"', line)
-                        if m_fn:
-                            entry['friendly_name'] = m_fn.group(1)
-                    # Exit attributes block
-                    if brace_depth == 0:
-                        in_attrs = False
-                    continue
-
-                # End of this object
-                if line in ('},', '}'):
-                    entities.append(entry)
-                    collecting = False
-                    entry = {}
-
-    return entities
-
-def main():
-    path = sys.argv[1] if len(sys.argv) > 1 else 'mockup-Room_entity_data.json'
-    result = extract_entities(path)
-    print(json.dumps(result, indent=2, ensure_ascii=False))
+    return list(iter_extract_entities(path))
+
+
+def expand_paths(patterns):
+    """Resolve files, directories and glob patterns to a sorted list of dumps."""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for name in DUMP_PATTERNS:
+                paths.update(glob.glob(os.path.join(pattern, name)))
+        elif glob.has_magic(pattern):
+            paths.update(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+        else:
+            paths.add(pattern)
+    return sorted(paths)
+
+
+def _freshness(entity):
+    # HA writes both timestamps as isoformat() in UTC, so they sort as strings.
+    return entity['last_updated'] or entity['last_changed'] or ''
+
+
+def _newest_per_entity(path):
+    """Worker: ``{entity_id: summary}`` for one file, newest record kept."""
+    newest = {}
+    for entity in iter_extract_entities(path):
+        seen = newest.get(entity['entity_id'])
+        if seen is None or _freshness(entity) >= _freshness(seen):
+            newest[entity['entity_id']] = entity
+    return newest
+
+
+def extract_many(paths, workers=None, cache=None):
+    """Extract every dump in ``paths`` in parallel and merge the results.
+
+    Files are fanned out over ``workers`` processes (default: one per CPU);
+    each worker dedupes its own file before sending it back. The merge keeps,
+    per entity_id, the record with the newest ``last_updated`` (falling back
+    to ``last_changed``); ties go to the file that sorts last. The result is
+    sorted by entity_id, so it does not depend on the worker count or on
+    which worker finishes first.
+
+    With an ``entity_cache.EntityCache``, files it already holds are read
+    from the cache and only the misses are sent to the workers.
+    """
+    paths = sorted(paths)
+    instrumentation.count('dumps_extracted', len(paths))
+    results = {}
+    if cache is not None:
+        for path in paths:
+            blob_path = cache.lookup(path, 'newest')
+            if blob_path is not None:
+                results[path] = {entity['entity_id']: entity for entity in cache.read(blob_path)}
+    misses = [path for path in paths if path not in results]
+
+    with ExitStack() as stack:
+        if workers == 1 or len(misses) <= 1:
+            fresh = map(_newest_per_entity, misses)
+        else:
+            pool = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+            # map() hands results back in submission (path) order.
+            fresh = pool.map(_newest_per_entity, misses)
+        for path, newest in zip(misses, fresh):
+            if cache is not None:
+                deque(cache.store(path, 'newest', newest.values()), maxlen=0)
+            results[path] = newest
+    return _merge(results[path] for path in paths)
+
+
+def _merge(results):
+    merged = {}
+    for newest in results:
+        for entity_id, entity in newest.items():
+            seen = merged.get(entity_id)
+            if seen is None or _freshness(entity) >= _freshness(seen):
+                merged[entity_id] = entity
+    return [merged[entity_id] for entity_id in sorted(merged)]
+
+
+def write_parquet(entities, path):
+    """Write the merged entities to a Parquet file (needs pyarrow or fastparquet)."""
+    import pandas as pd
+
+    frame = pd.DataFrame(entities, columns=list(summarize({'entity_id': ''})))
+    frame.to_parquet(path, index=False)
+    return len(frame)
+
+
+def write_ndjson(entities, out):
+    """Write one compact JSON object per line, flushing as we go."""
+    count = 0
+    for entity in entities:
+        out.write(json.dumps(entity, ensure_ascii=False))
+        out.write('\n')
+        count += 1
+        if count % FLUSH_EVERY == 0:
+            out.flush()
+    out.flush()
+    return count
+
+
+def write_json_array(entities, out):
+    """Stream the same output as ``json.dumps(list, indent=2)``, entity by entity."""
+    count = 0
+    for entity in entities:
+        body = json.dumps(entity, indent=2, ensure_ascii=False).replace('\n', '\n  ')
+        out.write(('[\n  ' if count == 0 else ',\n  ') + body)
+        count += 1
+    out.write('\n]\n' if count else '[]\n')
+    out.flush()
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Extract entity ids, names, states and device classes.')
+    parser.add_argument('paths', nargs='*', default=['mockup-Room_entity_data.json'],
+                        metavar='path',
+                        help='entity dump (optionally .gz/.zst compressed), directory or glob; '
+                             'more than one file switches to merged multi-file mode')
+    parser.add_argument('--ndjson', action='store_true',
+                        help='emit one JSON object per line instead of a JSON array')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='processes for multi-file mode (default: one per CPU)')
+    parser.add_argument('--out', help='write merged multi-file output here; '
+                                      'a .parquet suffix writes Parquet, anything else NDJSON')
+    parser.add_argument('--validate', action='store_true',
+                        help='check sensor entities against the SensorReading schema and '
+                             'print a conformance report to stderr')
+    add_cache_arguments(parser, 'every dump')
+    args = parser.parse_args(argv)
+
+    paths = expand_paths(args.paths)
+    if not paths:
+        parser.error(f'no entity dumps match {" ".join(args.paths)}')
+
+    cache = open_cache(args.no_cache, args.rebuild_cache)
+    conformance = ConformanceReport() if args.validate else None
+    try:
+        with instrumentation.span('extract'):
+            _write_output(args, paths, cache, conformance)
+    finally:
+        report_cache(cache)
+    if conformance is not None:
+        print(conformance.text(reading_fields(required_only=True)), file=sys.stderr)
+
+
+def _write_output(args, paths, cache, conformance=None):
+    if len(paths) == 1 and paths == args.paths and args.out is None:
+        entities = cached_records(cache, paths[0], 'summary', iter_extract_entities)
+        if conformance is not None:
+            # Validated batch by batch as the stream is written.
+            entities = validated(entities, conformance)
+    else:
+        entities = extract_many(paths, args.workers, cache)
+        print(f'Merged {len(paths)} files into {len(entities)} entities', file=sys.stderr)
+        instrumentation.count('entities_extracted', len(entities))
+        if conformance is not None:
+            conformance.add(sensor_readings(entities))
+        if args.out and args.out.endswith('.parquet'):
+            write_parquet(entities, args.out)
+            return
+        if args.out:
+            with open(args.out, 'w', encoding='utf-8') as out:
+                write_ndjson(entities, out)
+            return
+    # The consumer may stop reading early (e.g. `| head`); that is fine for a stream.
+    with instrumentation.quiet_broken_pipe():
+        if args.ndjson:
+            written = write_ndjson(entities, sys.stdout)
+        else:
+            written = write_json_array(entities, sys.stdout)
+        if not isinstance(entities, list):
+            # A streamed single dump is only counted once it is written.
+            instrumentation.count('entities_extracted', written)
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""Annotated SVG floor plans, streamed as text.
+
+A ``FloorplanTemplate`` is built once per floor from the room positions and
+colours of ``room_positions_colors.json`` (and optionally the room -> SVG
+element id mapping): the document header and each positioned room's marker
+and label opening tag are formatted ahead of time. ``render`` then
+only escapes and joins the per-plan sensor labels and writes one string per
+room, to a file or a list, so regenerating a plan per floor and time slice
+costs a few string operations per room instead of building a DOM.
+
+Rooms without a position are listed in a legend column down the left edge.
+
+    python floorplan_svg.py ../static/mockup-Room_entity_data.js -o plan.svg
+"""
+import argparse
+import json
+import os
+import sys
+
+ROOM_POSITIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                   '..', 'static', 'room_positions_colors.json')
+
+# Size of the campus floor plan drawing.
+DEFAULT_WIDTH = 2025
+DEFAULT_HEIGHT = 1627
+# Legend column for rooms without a position.
+LEGEND_X = 10
+LEGEND_TOP = 100
+LEGEND_STEP = 60
+FONT_SIZE = 14
+MARKER_RADIUS = 8
+
+
+def escape(text):
+    """``text`` escaped for SVG character data and attribute values."""
+    # Chained replaces: str.translate with a dict looks up every character.
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+
+
+def _room_key(room):
+    # room_positions_colors.json writes "a1" where the mappings write "a.1".
+    return room.replace('.', '').lower()
+
+
+def load_room_positions(path=ROOM_POSITIONS_PATH):
+    """``{room: (x, y, colour)}`` from ``room_positions_colors.json``."""
+    with open(path, encoding='utf-8') as f:
+        rooms = json.load(f)
+    return {room: (float(entry['position']['x']), float(entry['position']['y']),
+                   entry.get('color', 'black'))
+            for room, entry in rooms.items()}
+
+
+def room_sensors(table, resolver=None):
+    """``{roomId: [sensor name, ...]}`` for every ``roomEntityMapping`` room with entities.
+
+    Sensors are named by their friendly name, or their entity id without one.
+    ``resolver`` is a ``room_resolver.RoomResolver``; by default the mapping
+    file is read.
+    """
+    if resolver is None:
+        from room_resolver import RoomResolver
+
+        resolver = RoomResolver.from_file()
+    rooms = resolver.room_ids(table)
+    names = table['friendly_name'].astype('object').fillna(table['entity_id'].astype('object'))
+    return {room: group.tolist()
+            for room, group in names.groupby(rooms, observed=True, sort=False)}
+
+
+class FloorplanTemplate:
+    """The static parts of one floor's plan; ``render`` fills in the sensors.
+
+    ``positions`` maps room -> ``(x, y, colour)`` (``load_room_positions``),
+    ``svg_ids`` room -> SVG element id; rooms without an id use their own name.
+    Positions match rooms ignoring dots and case (``a1`` places ``a.1``).
+    """
+
+    def __init__(self, positions=None, svg_ids=None, width=DEFAULT_WIDTH, height=DEFAULT_HEIGHT):
+        self.svg_ids = dict(svg_ids or {})
+        self._header = (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'viewBox="0 0 {width} {height}">\n')
+        self._placed = {}
+        for room, (x, y, colour) in (positions or {}).items():
+            self._placed[_room_key(room)] = (
+                f'    <circle cx="{x:g}" cy="{y:g}" r="{MARKER_RADIUS}" fill="{escape(colour)}"/>\n'
+                f'    <text x="{x + 2 * MARKER_RADIUS:g}" y="{y:g}" fill="black" '
+                f'font-size="{FONT_SIZE}">')
+
+    def _svg_id(self, room):
+        return str(self.svg_ids.get(room, room))
+
+    def render(self, room_sensors, out=None):
+        """Write the plan for ``room_sensors`` (room -> sensor names) to ``out``.
+
+        Rooms are those of ``svg_ids`` when given (rooms without sensors get
+        an empty label), else those of ``room_sensors``. ``out`` is anything
+        with a ``write`` method; without one the SVG is returned as a string.
+        """
+        parts = [] if out is None else None
+        write = parts.append if out is None else out.write
+        write(self._header)
+        legend_y = LEGEND_TOP
+        for room in (self.svg_ids or room_sensors):
+            room = str(room)
+            marker = self._placed.get(_room_key(room))
+            if marker is None:
+                marker = (f'    <text x="{LEGEND_X}" y="{legend_y}" fill="black" '
+                          f'font-size="{FONT_SIZE}">')
+                legend_y += LEGEND_STEP
+            label = f'{room}: ' + ', '.join(map(str, room_sensors.get(room) or ()))
+            write(f'  <g id="{escape(self._svg_id(room))}_annotated">\n{marker}'
+                  f'{escape(label)}</text>\n  </g>\n')
+        write('</svg>\n')
+        return ''.join(parts) if parts is not None else None
+
+
+def main(argv=None):
+    from entity_cache import (
+        add_cache_arguments, cached_records, open_cache, report as report_cache,
+    )
+    from entity_parser import load_entities
+    from entity_table import build_entity_table
+    from instrumentation import quiet_broken_pipe
+
+    parser = argparse.ArgumentParser(description='Write a floor plan labelled with room sensors.')
+    parser.add_argument('dump', help='entity dump (JS object literal or /api/states JSON)')
+    parser.add_argument('-o', '--output', help='SVG file to write (default: stdout)')
+    parser.add_argument('--positions', default=ROOM_POSITIONS_PATH,
+                        help='room positions and colours JSON')
+    add_cache_arguments(parser)
+    args = parser.parse_args(argv)
+
+    cache = open_cache(args.no_cache, args.rebuild_cache)
+    table = build_entity_table(cached_records(cache, args.dump, 'entities', load_entities))
+    report_cache(cache)
+
+    template = FloorplanTemplate(load_room_positions(args.positions))
+    if args.output is None:
+        with quiet_broken_pipe():
+            template.render(room_sensors(table), sys.stdout)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            template.render(room_sensors(table), f)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""Spatial index over the GPS entities of a dump.
+
+Positions (the ``lat``/``lon`` columns of ``entity_table``) are projected to
+metres on a local plane around the campus location of ``locationConfig.js``
+and bucketed into a sparse uniform grid: points are sorted by cell key and
+only occupied cells are kept (sorted keys plus an offset array), so every
+grid row of a query box is one contiguous slice found by binary search.
+The cell edge is refined until the average point shares its cell with
+about ``POINTS_PER_CELL`` others, so a dense campus cluster amid stragglers
+across the city still gets small cells. On that grid ``GeoIndex`` answers
+
+* ``within``: entities inside a radius (metres) around a point;
+* ``nearest``: the k closest entities, widening the search box until the
+  k-th distance fits inside it;
+* ``inside``: entities inside a polygon geofence (even-odd rule over the
+  candidates of the polygon's bounding box).
+
+Query points can be coordinates, ``site`` or a room of ``entityLocations.json``
+that carries ``latitude``/``longitude``. The local plane is accurate at
+campus and city scale, which is what the index is for.
+
+    python geo_index.py ../static/mockup-Room_entity_data.js --near site --radius 500
+    python geo_index.py dump.json --near 52.48,13.45 --nearest 5
+    python geo_index.py dump.json --polygon "52.47,13.44 52.49,13.44 52.49,13.46"
+"""
+import argparse
+import json
+import math
+import os
+import re
+import sys
+from collections import namedtuple
+
+from entity_cache import add_cache_arguments, cached_records, open_cache, report as report_cache
+from entity_parser import load_entities
+from entity_table import build_entity_table
+from entity_tags import tagged
+from instrumentation import quiet_broken_pipe
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+LOCATION_CONFIG_PATH = os.path.join(_DATA_DIR, 'geospatial', 'locationConfig.js')
+ENTITY_LOCATIONS_PATH = os.path.join(_DATA_DIR, 'entityLocations.json')
+
+EARTH_RADIUS_METRES = 6_371_008.8
+# Points per occupied grid cell (as seen by the average point) the derived
+# cell size aims for, and how many refinements it gets.
+POINTS_PER_CELL = 8
+CELL_SIZE_ROUNDS = 4
+# Smallest derived cell edge, so co-located trackers do not explode the grid.
+MIN_CELL_METRES = 1.0
+
+Hits = namedtuple('Hits', 'entity_ids distances')
+Hits.__doc__ = """Query result: entity ids and their distances in metres, nearest first."""
+
+
+def site_location(path=LOCATION_CONFIG_PATH):
+    """``(latitude, longitude)`` of the campus, as ``LOCATION_CONFIG`` resolves it.
+
+    ``VITE_SITE_LAT`` / ``VITE_SITE_LNG`` override the defaults written in
+    ``locationConfig.js``, like the ``import.meta.env`` lookups there.
+    """
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    location = []
+    for variable in ('VITE_SITE_LAT', 'VITE_SITE_LNG'):
+        match = re.search(re.escape(variable) + r'\s*\?\?\s*(-?[\d.]+)', source)
+        if match is None:
+            raise ValueError(f'{path}: no {variable} default')
+        location.append(float(os.environ.get(variable, match.group(1))))
+    return tuple(location)
+
+
+def room_locations(path=ENTITY_LOCATIONS_PATH):
+    """``{room id: (latitude, longitude)}`` for the rooms that carry coordinates."""
+    with open(path, encoding='utf-8') as f:
+        rooms = json.load(f)
+    return {room['id']: (float(room['latitude']), float(room['longitude']))
+            for room in rooms
+            if room.get('latitude') is not None and room.get('longitude') is not None}
+
+
+class GeoIndex:
+    """Grid index over ``entity_ids`` at ``lats``/``lons``; see the module docstring.
+
+    Entities without both coordinates are left out. ``origin`` is the
+    ``(latitude, longitude)`` of the projection (default: ``site_location()``).
+    """
+
+    def __init__(self, entity_ids, lats, lons, origin=None, cell_size=None):
+        import numpy as np
+
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        located = ~(np.isnan(lats) | np.isnan(lons))
+        self.origin = tuple(origin) if origin is not None else site_location()
+        self._lat_scale = math.radians(1) * EARTH_RADIUS_METRES
+        self._lon_scale = self._lat_scale * math.cos(math.radians(self.origin[0]))
+        x, y = self.project(lats[located], lons[located])
+
+        count = len(x)
+        self._x0 = x.min() if count else 0.0
+        self._y0 = y.min() if count else 0.0
+        width = (x.max() - self._x0) if count else 0.0
+        height = (y.max() - self._y0) if count else 0.0
+        if cell_size is None:
+            cell_size = self._derive_cell_size(x, y, width, height)
+        self.cell_size = float(cell_size)
+        self._columns = int(width // self.cell_size) + 1
+        self._rows = int(height // self.cell_size) + 1
+
+        keys = self._keys(x, y)
+        order = np.argsort(keys, kind='stable')
+        self._cells, first = np.unique(keys[order], return_index=True)
+        self._offsets = np.append(first, count)
+        self.entity_ids = np.asarray(entity_ids, dtype=object)[located][order]
+        self._x = x[order]
+        self._y = y[order]
+
+    def _keys(self, x, y, cell_size=None):
+        cell_size = cell_size or self.cell_size
+        columns = int((x.max() - self._x0) // cell_size) + 1 if len(x) else 1
+        return (((y - self._y0) // cell_size).astype('int64') * columns
+                + ((x - self._x0) // cell_size).astype('int64'))
+
+    def _derive_cell_size(self, x, y, width, height):
+        import numpy as np
+
+        count = max(len(x), 1)
+        cell_size = max(math.sqrt(max(width * height, width ** 2, height ** 2)
+                                  * POINTS_PER_CELL / count), MIN_CELL_METRES)
+        for _ in range(CELL_SIZE_ROUNDS):
+            if not len(x):
+                break
+            counts = np.unique(self._keys(x, y, cell_size), return_counts=True)[1]
+            crowding = float((counts * counts).sum()) / count
+            if crowding <= 2 * POINTS_PER_CELL or cell_size <= MIN_CELL_METRES:
+                break
+            cell_size = max(cell_size * math.sqrt(POINTS_PER_CELL / crowding), MIN_CELL_METRES)
+        return cell_size
+
+    @classmethod
+    def from_table(cls, table, origin=None, cell_size=None):
+        """Index the ``gps``-tagged entities of an ``entity_table``."""
+        gps = table[tagged(table, 'gps')]
+        return cls(gps['entity_id'].tolist(), gps['lat'].to_numpy(), gps['lon'].to_numpy(),
+                   origin, cell_size)
+
+    def __len__(self):
+        return len(self._x)
+
+    def project(self, lats, lons):
+        """Local plane coordinates (metres east, metres north of ``origin``)."""
+        import numpy as np
+
+        return ((np.asarray(lons, dtype=np.float64) - self.origin[1]) * self._lon_scale,
+                (np.asarray(lats, dtype=np.float64) - self.origin[0]) * self._lat_scale)
+
+    def _candidates(self, x_min, x_max, y_min, y_max):
+        """Sorted positions of the points in the cells overlapping a box."""
+        import numpy as np
+
+        first_column = max(int((x_min - self._x0) // self.cell_size), 0)
+        last_column = min(int((x_max - self._x0) // self.cell_size), self._columns - 1)
+        first_row = max(int((y_min - self._y0) // self.cell_size), 0)
+        last_row = min(int((y_max - self._y0) // self.cell_size), self._rows - 1)
+        if first_column > last_column or first_row > last_row or not len(self):
+            return np.empty(0, dtype=np.int64)
+        rows = np.arange(first_row, last_row + 1) * self._columns
+        starts = self._offsets[np.searchsorted(self._cells, rows + first_column)]
+        stops = self._offsets[np.searchsorted(self._cells, rows + last_column, side='right')]
+        if len(rows) == 1:
+            return np.arange(starts[0], stops[0])
+        lengths = stops - starts
+        # Concatenated aranges: each row's slice, shifted to its start.
+        shifts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return np.arange(lengths.sum()) + shifts
+
+    def _hits(self, positions, distances):
+        import numpy as np
+
+        order = np.argsort(distances, kind='stable')
+        return Hits(self.entity_ids[positions[order]], distances[order])
+
+    def within(self, lat, lon, radius):
+        """Entities at most ``radius`` metres from ``(lat, lon)``."""
+        import numpy as np
+
+        x, y = self.project(lat, lon)
+        positions = self._candidates(x - radius, x + radius, y - radius, y + radius)
+        distances = np.hypot(self._x[positions] - x, self._y[positions] - y)
+        close = distances <= radius
+        return self._hits(positions[close], distances[close])
+
+    def nearest(self, lat, lon, k=1):
+        """The ``k`` entities closest to ``(lat, lon)`` (fewer if the index is smaller)."""
+        import numpy as np
+
+        x, y = self.project(lat, lon)
+        k = min(k, len(self))
+        if k <= 0:
+            return Hits(self.entity_ids[:0], np.empty(0))
+        # Start from the distance to the grid, so far-away points do not
+        # widen the box one doubling at a time from a single cell.
+        reach = max(self._x0 - x, x - self._x0 - self._columns * self.cell_size,
+                    self._y0 - y, y - self._y0 - self._rows * self.cell_size, 0.0)
+        half = reach + self.cell_size
+        while True:
+            positions = self._candidates(x - half, x + half, y - half, y + half)
+            distances = np.hypot(self._x[positions] - x, self._y[positions] - y)
+            if len(positions) >= k:
+                closest = np.argpartition(distances, k - 1)[:k]
+                # Every point within ``half`` of the query lies inside the box.
+                if distances[closest].max() <= half or len(positions) == len(self):
+                    return self._hits(positions[closest], distances[closest])
+            half *= 2
+
+    def inside(self, polygon):
+        """Entities inside ``polygon``, a sequence of ``(lat, lon)`` vertices.
+
+        Distances are to the polygon's first vertex.
+        """
+        import numpy as np
+
+        vertices = np.asarray(polygon, dtype=np.float64)
+        xs, ys = self.project(vertices[:, 0], vertices[:, 1])
+        positions = self._candidates(xs.min(), xs.max(), ys.min(), ys.max())
+        px, py = self._x[positions], self._y[positions]
+        crossings = np.zeros(len(positions), dtype=bool)
+        for x1, y1, x2, y2 in zip(xs, ys, np.roll(xs, -1), np.roll(ys, -1)):
+            if y1 == y2:
+                continue
+            straddles = (y1 > py) != (y2 > py)
+            crossings ^= straddles & (px < x1 + (py - y1) * (x2 - x1) / (y2 - y1))
+        positions = positions[crossings]
+        return self._hits(positions, np.hypot(self._x[positions] - xs[0],
+                                              self._y[positions] - ys[0]))
+
+
+def _parse_point(text):
+    latitude, longitude = text.split(',')
+    return float(latitude), float(longitude)
+
+
+def query_point(text, rooms_path=ENTITY_LOCATIONS_PATH):
+    """``(lat, lon)`` for ``site``, a located room id or ``"lat,lon"``."""
+    if text == 'site':
+        return site_location()
+    rooms = room_locations(rooms_path)
+    if text in rooms:
+        return rooms[text]
+    try:
+        return _parse_point(text)
+    except ValueError:
+        raise ValueError(f'{text!r} is not "site", a located room or "lat,lon"') from None
+
+
+def main(argv=None):
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description='Radius, nearest and geofence GPS queries.')
+    parser.add_argument('dump', help='entity dump (JS object literal or /api/states JSON)')
+    parser.add_argument('--near', default='site',
+                        help='query point: "site", a room id with coordinates or "lat,lon"')
+    query = parser.add_mutually_exclusive_group(required=True)
+    query.add_argument('--radius', type=float, metavar='METRES',
+                       help='entities within METRES of --near')
+    query.add_argument('--nearest', type=int, metavar='K', help='the K entities nearest --near')
+    query.add_argument('--polygon', help='entities inside the "lat,lon lat,lon ..." geofence')
+    add_cache_arguments(parser)
+    args = parser.parse_args(argv)
+
+    try:
+        point = query_point(args.near) if args.polygon is None else None
+        polygon = [_parse_point(vertex) for vertex in args.polygon.split()] if args.polygon else None
+    except ValueError as e:
+        parser.error(str(e))
+    if polygon is not None and len(polygon) < 3:
+        parser.error('a geofence needs at least three vertices')
+
+    cache = open_cache(args.no_cache, args.rebuild_cache)
+    table = build_entity_table(cached_records(cache, args.dump, 'entities', load_entities))
+    report_cache(cache)
+    index = GeoIndex.from_table(table)
+
+    if polygon is not None:
+        hits = index.inside(polygon)
+    elif args.radius is not None:
+        hits = index.within(*point, args.radius)
+    else:
+        hits = index.nearest(*point, args.nearest)
+    with quiet_broken_pipe():
+        print(pd.DataFrame({'Entity ID': hits.entity_ids,
+                            'Distance (m)': hits.distances.round(1)}).to_string(index=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""Append-only history of entity readings, with downsampled rollups.
+
+Readings ``(entity_id, ts, numeric_state, state)`` come from entity dumps
+through ``extract_entities``: ``ts`` is the entity's ``last_updated`` (else
+``last_changed``) and ``numeric_state`` the first number in the state, as in
+``entity_table``. They are stored under one directory::
+
+    log/day=2024-05-01/part-*.parquet          raw readings, one file per append
+    rollup/1min/day=2024-05-01/part-*.parquet  count/sum/min/max per bucket
+    rollup/15min/...   rollup/1h/...
+    entities.parquet                           friendly name, device class, last ts
+
+Appends never touch existing parts; ``compact`` merges a day's parts into
+one file sorted by ``entity_id``, so a range query for one entity reads a
+few row groups per day. Rollup rows of one bucket can be spread over parts
+and are merged when queried. Dumps must be ingested oldest first: a reading
+that is not newer than the last stored one for its entity is skipped, so
+re-ingesting a dump adds nothing. Needs pyarrow.
+
+    python history_store.py ingest history/ 'snapshots/*.json.gz'
+    python history_store.py query history/ --room a.5 --rollup 1h --since 2024-05-01
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+from entity_cache import add_cache_arguments, cached_records, open_cache, report as report_cache
+from entity_table import NUMERIC_STATE_PATTERN, build_entity_table
+from extract_entities import expand_paths, iter_extract_entities
+from instrumentation import quiet_broken_pipe
+
+ROLLUP_FREQUENCIES = ('1min', '15min', '1h')
+
+# Window reductions for ``window_table``.
+REDUCTIONS = ('last', 'min', 'max', 'distinct')
+
+ROW_GROUP_SIZE = 64 * 1024
+
+_TS_DTYPE = 'datetime64[us, UTC]'
+
+
+def _timestamp(value):
+    """``value`` (string, datetime or None) as a UTC pandas Timestamp, or None."""
+    import pandas as pd
+
+    if value is None:
+        return None
+    value = pd.Timestamp(value)
+    return value.tz_localize('UTC') if value.tzinfo is None else value.tz_convert('UTC')
+
+
+def readings_frame(summaries):
+    """Readings from ``extract_entities.summarize`` records, as a DataFrame.
+
+    Columns: entity_id, ts, numeric_state, state, friendly_name, device_class.
+    Records without a parseable timestamp are dropped.
+    """
+    import pandas as pd
+
+    frame = pd.DataFrame(list(summaries), columns=[
+        'entity_id', 'friendly_name', 'device_class', 'state', 'last_changed', 'last_updated'])
+    ts = frame['last_updated'].where(frame['last_updated'].notna(), frame['last_changed'])
+    state = frame['state'].astype('object').where(frame['state'].map(type) == str)
+    frame = pd.DataFrame({
+        'entity_id': frame['entity_id'].astype('object'),
+        'ts': pd.to_datetime(ts, utc=True, errors='coerce', format='ISO8601').astype(_TS_DTYPE),
+        'numeric_state': pd.to_numeric(state.str.extract(NUMERIC_STATE_PATTERN, expand=False),
+                                       errors='coerce').astype('float64'),
+        'state': state,
+        'friendly_name': frame['friendly_name'],
+        'device_class': frame['device_class'],
+    })
+    return frame[frame['ts'].notna()].reset_index(drop=True)
+
+
+class HistoryStore:
+    """The history directory at ``root``; see the module docstring."""
+
+    def __init__(self, root):
+        self.root = root
+        self._resolver = None
+
+    # --- Writing ---------------------------------------------------------
+
+    def append(self, readings):
+        """Append a ``readings_frame``; returns the number of new readings."""
+        import pandas as pd
+
+        entities = self.entities()
+        last_ts = entities.set_index('entity_id')['last_ts'].reindex(readings['entity_id'])
+        last_ts = last_ts.set_axis(readings.index)
+        fresh = readings[last_ts.isna() | (readings['ts'] > last_ts)]
+        fresh = fresh.drop_duplicates(['entity_id', 'ts'], keep='last')
+        if fresh.empty:
+            return 0
+
+        for day, rows in fresh.groupby(fresh['ts'].dt.floor('D'), sort=True):
+            day_dir = f'day={day:%Y-%m-%d}'
+            rows = rows.sort_values(['entity_id', 'ts'], kind='stable')
+            self._write_part(os.path.join('log', day_dir),
+                             rows[['entity_id', 'ts', 'numeric_state', 'state']])
+            numeric = rows[rows['numeric_state'].notna()]
+            for frequency in ROLLUP_FREQUENCIES:
+                rollup = numeric.groupby(
+                    ['entity_id', numeric['ts'].dt.floor(frequency).rename('bucket')],
+                    sort=True)['numeric_state'].agg(['count', 'sum', 'min', 'max'])
+                self._write_part(os.path.join('rollup', frequency, day_dir),
+                                 rollup.reset_index())
+
+        latest = fresh.drop_duplicates('entity_id', keep='last').rename(columns={'ts': 'last_ts'})
+        latest = latest[['entity_id', 'friendly_name', 'device_class', 'last_ts']]
+        entities = pd.concat([entities[~entities['entity_id'].isin(latest['entity_id'])], latest],
+                             ignore_index=True).sort_values('entity_id', ignore_index=True)
+        self._write_file(entities, os.path.join(self.root, 'entities.parquet'))
+        return len(fresh)
+
+    def append_dump(self, path, cache=None):
+        """Append the readings of one entity dump (optionally via an ``EntityCache``)."""
+        summaries = cached_records(cache, path, 'summary', iter_extract_entities)
+        return self.append(readings_frame(summaries))
+
+    def compact(self):
+        """Merge every day's parts into one sorted file; returns the days merged."""
+        import pandas as pd
+
+        merged = 0
+        for directory in self._part_dirs():
+            parts = sorted(glob.glob(os.path.join(directory, 'part-*.parquet')))
+            if len(parts) < 2:
+                continue
+            frame = pd.concat([pd.read_parquet(part) for part in parts], ignore_index=True)
+            keys = ['entity_id', 'bucket' if 'bucket' in frame else 'ts']
+            if 'bucket' in frame:
+                frame = frame.groupby(keys, sort=False).agg(
+                    count=('count', 'sum'), sum=('sum', 'sum'), min=('min', 'min'),
+                    max=('max', 'max')).reset_index()
+            self._write_part(os.path.relpath(directory, self.root),
+                             frame.sort_values(keys, kind='stable'))
+            for part in parts:
+                os.remove(part)
+            merged += 1
+        return merged
+
+    def _part_dirs(self):
+        return sorted(glob.glob(os.path.join(self.root, 'log', 'day=*'))
+                      + glob.glob(os.path.join(self.root, 'rollup', '*', 'day=*')))
+
+    def _write_part(self, directory, frame):
+        directory = os.path.join(self.root, directory)
+        os.makedirs(directory, exist_ok=True)
+        # Parts sort in append order, so the latest reading wins on compaction.
+        name = f'part-{time.time_ns():020d}-{os.getpid()}.parquet'
+        self._write_file(frame, os.path.join(directory, name))
+
+    @staticmethod
+    def _write_file(frame, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), tmp_path,
+                       row_group_size=ROW_GROUP_SIZE, compression='zstd')
+        os.replace(tmp_path, path)
+
+    # --- Reading ---------------------------------------------------------
+
+    def entities(self):
+        """entity_id, friendly_name, device_class and last_ts of every known entity."""
+        import pandas as pd
+
+        path = os.path.join(self.root, 'entities.parquet')
+        if os.path.exists(path):
+            entities = pd.read_parquet(path)
+            # Missing names as None, as in entity_table.
+            for column in ('entity_id', 'friendly_name', 'device_class'):
+                values = entities[column].astype('object')
+                entities[column] = values.where(values.notna(), None)
+            return entities
+        return pd.DataFrame({
+            'entity_id': pd.Series(dtype='object'), 'friendly_name': pd.Series(dtype='object'),
+            'device_class': pd.Series(dtype='object'), 'last_ts': pd.Series(dtype=_TS_DTYPE)})
+
+    def room_entity_ids(self, room):
+        """Entity ids that ``room_resolver`` places in ``room`` (a ``roomId``)."""
+        if self._resolver is None:
+            from room_resolver import RoomResolver
+
+            self._resolver = RoomResolver.from_file()
+        entities = self.entities()
+        return entities.loc[(self._resolver.room_ids(entities) == room).to_numpy(),
+                            'entity_id'].tolist()
+
+    def readings(self, start=None, end=None, entity_ids=None, room=None):
+        """Raw readings with ``start <= ts < end``, sorted by entity_id and ts."""
+        return self._query('log', 'ts', start, end, entity_ids, room)
+
+    def rollup(self, frequency, start=None, end=None, entity_ids=None, room=None):
+        """``frequency`` buckets overlapping [start, end): count, min, max, mean per entity."""
+        if frequency not in ROLLUP_FREQUENCIES:
+            raise ValueError(f'unknown rollup {frequency!r}; '
+                             f'expected one of {", ".join(ROLLUP_FREQUENCIES)}')
+        frame = self._query(os.path.join('rollup', frequency), 'bucket',
+                            _floor(start, frequency), end, entity_ids, room)
+        frame = frame.groupby(['entity_id', 'bucket'], sort=True).agg(
+            count=('count', 'sum'), sum=('sum', 'sum'), min=('min', 'min'),
+            max=('max', 'max')).reset_index()
+        frame['mean'] = frame.pop('sum') / frame['count']
+        return frame
+
+    def rollup_entity_ids(self, frequency, start=None, end=None):
+        """Sorted ids of the entities with a ``frequency`` bucket overlapping [start, end).
+
+        Only the entity_id column is read (the bucket column just for the
+        filter), so this stays cheap over long windows.
+        """
+        import pyarrow.compute as pc
+
+        if frequency not in ROLLUP_FREQUENCIES:
+            raise ValueError(f'unknown rollup {frequency!r}; '
+                             f'expected one of {", ".join(ROLLUP_FREQUENCIES)}')
+        table = self._scan(os.path.join('rollup', frequency), 'bucket',
+                           _floor(start, frequency), end, None, None, columns=['entity_id'])
+        if table is None:
+            return []
+        return sorted(pc.unique(table['entity_id']).to_pylist())
+
+    def _query(self, kind, column, start, end, entity_ids, room):
+        table = self._scan(kind, column, start, end, entity_ids, room)
+        if table is None:
+            return self._empty(kind)
+        frame = table.to_pandas()
+        return frame.sort_values(['entity_id', column], kind='stable', ignore_index=True)
+
+    def _scan(self, kind, column, start, end, entity_ids, room, columns=None):
+        """Arrow table of the ``kind`` rows with ``start <= column < end``; None without parts."""
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        start, end = _timestamp(start), _timestamp(end)
+        if room is not None:
+            entity_ids = list(entity_ids or ()) + self.room_entity_ids(room)
+        # Day directories sort as dates, so the range prunes whole days.
+        first = 'day=' if start is None else f'day={start:%Y-%m-%d}'
+        last = 'day=~' if end is None else f'day={end:%Y-%m-%d}'
+        parts = [part
+                 for directory in sorted(glob.glob(os.path.join(self.root, kind, 'day=*')))
+                 if first <= os.path.basename(directory) <= last
+                 for part in sorted(glob.glob(os.path.join(directory, 'part-*.parquet')))]
+        if not parts:
+            return None
+
+        condition = ds.scalar(True)
+        if entity_ids is not None:
+            condition &= ds.field('entity_id').isin(entity_ids)
+        if start is not None:
+            condition &= ds.field(column) >= pa.scalar(start)
+        if end is not None:
+            condition &= ds.field(column) < pa.scalar(end)
+        return ds.dataset(parts, format='parquet').to_table(columns=columns, filter=condition)
+
+    @staticmethod
+    def _empty(kind):
+        import pandas as pd
+
+        if kind == 'log':
+            return pd.DataFrame({'entity_id': pd.Series(dtype='object'),
+                                 'ts': pd.Series(dtype=_TS_DTYPE),
+                                 'numeric_state': pd.Series(dtype='float64'),
+                                 'state': pd.Series(dtype='object')})
+        return pd.DataFrame({'entity_id': pd.Series(dtype='object'),
+                             'bucket': pd.Series(dtype=_TS_DTYPE),
+                             **{name: pd.Series(dtype='float64')
+                                for name in ('count', 'sum', 'min', 'max')}})
+
+    def window_table(self, start=None, end=None, reduce='last'):
+        """An ``entity_table`` of the readings in [start, end), one row per entity.
+
+        ``reduce`` picks the row: ``last`` is the latest reading, ``min`` /
+        ``max`` the reading with the lowest / highest numeric state (the
+        latest for non-numeric entities), and ``distinct`` keeps the latest
+        reading of every distinct state (one row per entity and state).
+        """
+        import pandas as pd
+
+        if reduce not in REDUCTIONS:
+            raise ValueError(f'unknown reduction {reduce!r}; expected one of {", ".join(REDUCTIONS)}')
+        frame = self.readings(start, end)
+        if reduce == 'distinct':
+            picked = frame.drop_duplicates(['entity_id', 'state'], keep='last')
+        else:
+            picked = frame.drop_duplicates('entity_id', keep='last')
+            if reduce != 'last':
+                numeric = frame[frame['numeric_state'].notna()]
+                grouped = numeric.groupby('entity_id', sort=False)['numeric_state']
+                extreme = numeric.loc[grouped.idxmin() if reduce == 'min' else grouped.idxmax()]
+                picked = pd.concat([picked[~picked['entity_id'].isin(extreme['entity_id'])], extreme])
+            picked = picked.sort_values('entity_id', kind='stable')
+        names = self.entities().set_index('entity_id')
+        picked = picked.join(names[['friendly_name', 'device_class']], on='entity_id')
+
+        def attributes(name, device_class):
+            return {key: value for key, value in (('friendly_name', name),
+                                                   ('device_class', device_class))
+                    if isinstance(value, str)}
+
+        return build_entity_table(
+            {'entity_id': entity_id, 'state': state, 'last_changed': ts.isoformat(),
+             'attributes': attributes(name, device_class)}
+            for entity_id, state, ts, name, device_class in zip(
+                picked['entity_id'], picked['state'], picked['ts'], picked['friendly_name'],
+                picked['device_class']))
+
+
+def _floor(value, frequency):
+    value = _timestamp(value)
+    return None if value is None else value.floor(frequency)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Entity history store.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', help='append entity dumps, oldest first')
+    ingest.add_argument('store', help='history directory')
+    ingest.add_argument('paths', nargs='+', metavar='path',
+                        help='entity dumps, directories or globs (sorted by name)')
+    ingest.add_argument('--compact', action='store_true', help='compact the store afterwards')
+    add_cache_arguments(ingest, 'every dump')
+
+    compact = commands.add_parser('compact', help="merge each day's parts into one file")
+    compact.add_argument('store', help='history directory')
+
+    query = commands.add_parser('query', help='print readings or rollups as CSV')
+    query.add_argument('store', help='history directory')
+    query.add_argument('--entity', action='append', dest='entity_ids', metavar='ENTITY_ID',
+                       help='only this entity (repeatable)')
+    query.add_argument('--room', help='only entities of this roomId')
+    query.add_argument('--since', help='start of the range (ISO timestamp, inclusive)')
+    query.add_argument('--until', help='end of the range (ISO timestamp, exclusive)')
+    query.add_argument('--rollup', choices=ROLLUP_FREQUENCIES,
+                       help='print this rollup instead of raw readings')
+    args = parser.parse_args(argv)
+
+    store = HistoryStore(args.store)
+    if args.command == 'ingest':
+        cache = open_cache(args.no_cache, args.rebuild_cache)
+        try:
+            for path in expand_paths(args.paths):
+                print(f'{path}: {store.append_dump(path, cache)} new readings', file=sys.stderr)
+        finally:
+            report_cache(cache)
+        if args.compact:
+            store.compact()
+    elif args.command == 'compact':
+        print(f'Compacted {store.compact()} partitions', file=sys.stderr)
+    else:
+        if args.rollup:
+            frame = store.rollup(args.rollup, args.since, args.until, args.entity_ids, args.room)
+        else:
+            frame = store.readings(args.since, args.until, args.entity_ids, args.room)
+        with quiet_broken_pipe():
+            frame.to_csv(sys.stdout, index=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,250 @@
+"""Spans, counters and peak RSS for the data scripts.
+
+Off unless an output is configured, either through the environment (read
+once at import, so cron jobs need no code or flag changes):
+
+    METRICS_LOG=/var/log/campus/metrics.jsonl        JSON lines, appended
+    METRICS_TEXTFILE_DIR=/var/lib/node_exporter      <script>.prom, replaced
+
+or by calling ``configure``. While off, ``span`` blocks cost one object and
+two method calls and ``count`` one global check, so instrumented code can
+stay instrumented; count in bulk (``count('entities_parsed', len(batch))``)
+rather than per item.
+
+* ``with span('report', name='battery'):`` or ``@span('parse')`` times a
+  block or function; keep labels few-valued, they become Prometheus labels.
+  Each finished span appends a JSON line (name, labels, seconds, peak RSS,
+  the exception type if it raised) and adds to the span's total.
+* ``count(name, value)`` adds to a counter.
+* ``with quiet_broken_pipe():`` around a CLI's stdout writes lets the
+  reader stop early (``| head``) without a traceback.
+
+At exit the main process appends a ``run`` line with the counters and the
+peak RSS and rewrites the Prometheus textfile (atomically, for the
+node_exporter textfile collector) with counters as ``*_total``, span
+``*_seconds_sum``/``*_seconds_count`` and the peak RSS. Worker processes do
+not run exit handlers: they hand ``take_counters()`` back to the parent,
+which ``merge_counters`` them (their spans reach the JSON log only).
+"""
+import atexit
+import contextlib
+import functools
+import json
+import os
+import re
+import resource
+import sys
+import tempfile
+import time
+
+METRICS_PREFIX = 'smart_campus_data'
+
+_LABEL_ESCAPES = str.maketrans({'\\': '\\\\', '"': '\\"', '\n': '\\n'})
+
+_recorder = None
+
+
+def peak_rss_mib():
+    """Peak resident set size of this process, in MiB."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, KiB elsewhere.
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+def _metric_name(name):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{_metric_name(key)}="{str(value).translate(_LABEL_ESCAPES)}"'
+                          for key, value in labels) + '}'
+
+
+class _Recorder:
+    def __init__(self, log_path, textfile_dir, script):
+        self.log_path = log_path
+        self.textfile_dir = textfile_dir
+        self.script = script
+        self.main_pid = os.getpid()
+        self.started = time.time()
+        self.counters = {}
+        self.spans = {}
+        self._log = None
+
+    def forked(self):
+        # A forked worker starts from zero and opens its own log handle.
+        self.counters = {}
+        self.spans = {}
+        self._log = None
+
+    def write(self, record):
+        if self.log_path is None:
+            return
+        if self._log is None:
+            # Line-buffered O_APPEND writes keep lines from workers whole.
+            self._log = open(self.log_path, 'a', encoding='utf-8', buffering=1)
+        self._log.write(json.dumps({'ts': round(time.time(), 3), 'script': self.script,
+                                    'pid': os.getpid(), **record}) + '\n')
+
+    def finish(self, name, labels, seconds, error):
+        key = (name, tuple(sorted(labels.items())))
+        total = self.spans.get(key)
+        self.spans[key] = (seconds, 1) if total is None else (total[0] + seconds, total[1] + 1)
+        record = {'event': 'span', 'span': name, 'seconds': round(seconds, 6),
+                  'peak_rss_mib': round(peak_rss_mib(), 1)}
+        if labels:
+            record['labels'] = labels
+        if error is not None:
+            record['error'] = error.__name__
+        self.write(record)
+
+    def textfile(self):
+        lines = []
+        script = (('script', self.script),)
+        for name, value in sorted(self.counters.items()):
+            metric = f'{METRICS_PREFIX}_{_metric_name(name)}_total'
+            lines += [f'# TYPE {metric} counter', f'{metric}{_labels(script)} {value}']
+        metric = f'{METRICS_PREFIX}_span_seconds'
+        if self.spans:
+            lines.append(f'# TYPE {metric} summary')
+        for (name, labels), (seconds, calls) in sorted(self.spans.items()):
+            label_text = _labels(script + (('span', name),) + labels)
+            lines += [f'{metric}_sum{label_text} {seconds:.6f}', f'{metric}_count{label_text} {calls}']
+        for name, kind, value in (
+                ('peak_rss_bytes', 'gauge', int(peak_rss_mib() * (1 << 20))),
+                ('run_seconds', 'gauge', f'{time.time() - self.started:.3f}'),
+                ('last_run_timestamp_seconds', 'gauge', f'{time.time():.0f}')):
+            lines += [f'# TYPE {METRICS_PREFIX}_{name} {kind}',
+                      f'{METRICS_PREFIX}_{name}{_labels(script)} {value}']
+        return '\n'.join(lines) + '\n'
+
+    def close(self):
+        if self.main_pid != os.getpid():
+            return
+        self.write({'event': 'run', 'seconds': round(time.time() - self.started, 3),
+                    'counters': self.counters, 'peak_rss_mib': round(peak_rss_mib(), 1)})
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        if self.textfile_dir is not None:
+            os.makedirs(self.textfile_dir, exist_ok=True)
+            path = os.path.join(self.textfile_dir, f'{self.script}.prom')
+            fd, tmp_path = tempfile.mkstemp(dir=self.textfile_dir, prefix=f'.{self.script}',
+                                            suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(self.textfile())
+            os.replace(tmp_path, path)
+
+
+def _default_script():
+    name = os.path.splitext(os.path.basename(sys.argv[0] if sys.argv and sys.argv[0] else ''))[0]
+    return _metric_name(name) or 'python'
+
+
+def configure(log_path=None, textfile_dir=None, script=None):
+    """Switch instrumentation on for the given outputs, or off without any.
+
+    A previous configuration is closed (flushed) first. ``script`` labels
+    every record; it defaults to the running script's name.
+    """
+    global _recorder
+    if _recorder is not None:
+        _recorder.close()
+    _recorder = None
+    if log_path or textfile_dir:
+        _recorder = _Recorder(log_path or None, textfile_dir or None, script or _default_script())
+
+
+def enabled():
+    """Whether spans and counters are being recorded."""
+    return _recorder is not None
+
+
+class span:
+    """Time a ``with`` block, or every call of a decorated function, as ``name``.
+
+    Keyword arguments are labels (JSON fields and Prometheus labels).
+    """
+
+    __slots__ = ('name', 'labels', '_start')
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+        self._start = None
+
+    def __enter__(self):
+        if _recorder is not None:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if self._start is not None and _recorder is not None:
+            _recorder.finish(self.name, self.labels, time.perf_counter() - self._start, exc_type)
+
+    def __call__(self, function):
+        name, labels = self.name, self.labels
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            if _recorder is None:
+                return function(*args, **kwargs)
+            with span(name, **labels):
+                return function(*args, **kwargs)
+        return timed
+
+
+def count(name, value=1):
+    """Add ``value`` to the counter ``name``."""
+    if _recorder is not None:
+        _recorder.counters[name] = _recorder.counters.get(name, 0) + value
+
+
+def take_counters():
+    """This process's counters, reset; for a worker to hand to its parent."""
+    if _recorder is None:
+        return {}
+    counters, _recorder.counters = _recorder.counters, {}
+    return counters
+
+
+def merge_counters(counters):
+    """Add counters taken in a worker process."""
+    for name, value in counters.items():
+        count(name, value)
+
+
+@contextlib.contextmanager
+def quiet_broken_pipe():
+    """End a CLI's stdout output quietly when the reader has gone away.
+
+    Output still buffered is sent to devnull, so the exit flush stays quiet too.
+    """
+    try:
+        yield
+    except BrokenPipeError:
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+
+def _close():
+    if _recorder is not None:
+        _recorder.close()
+
+
+def _forked():
+    if _recorder is not None:
+        _recorder.forked()
+
+
+configure(os.environ.get('METRICS_LOG'), os.environ.get('METRICS_TEXTFILE_DIR'))
+atexit.register(_close)
+os.register_at_fork(after_in_child=_forked)
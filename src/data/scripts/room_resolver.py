@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Room <-> entity resolution with the rules of ``roomEntityMapping.js``.
+
+``resolveRoomMeta`` walks the room mappings in order and returns the first
+one whose ``entityIds`` contains the entity id, one of whose
+``entityIdPrefixes`` starts the lower-cased id, one of whose
+``friendlyNameIncludes`` occurs in the lower-cased friendly name, or one of
+whose ``aliases`` occurs in either. ``RoomResolver`` returns the same room,
+but per batch instead of per entity:
+
+* exact ids are one dict lookup per entity;
+* prefixes and substrings are each located with one ``str.find`` scan over
+  all ids (or names) joined into a buffer (``entity_tags.JoinedColumn``);
+  a hit lowers the entity's best mapping index, and the lowest index wins,
+  exactly like the JS loop's early return.
+
+Results are memoized per ``(entity_id, friendly_name)``, so re-resolving the
+same entities (every report, the floor plan) is a dict lookup. The mapping is
+read from ``roomEntityMapping.json``, written by
+``scripts/export-room-mapping.mjs``:
+
+    python room_resolver.py ../static/mockup-Room_entity_data.js
+"""
+import json
+import os
+import sys
+
+from entity_tags import JoinedColumn
+
+DEFAULT_MAPPING_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'mappings', 'roomEntityMapping.json')
+
+# Memoized pairs kept before the memo is reset.
+MEMO_LIMIT = 1_000_000
+
+_NO_ROOM = sys.maxsize
+
+
+def load_room_mapping(path=DEFAULT_MAPPING_PATH):
+    """The exported ``roomEntityMapping`` list."""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class RoomResolver:
+    """Resolve entities to rooms; see the module docstring."""
+
+    def __init__(self, mappings):
+        self.mappings = tuple(mappings)
+        self._exact = {}
+        self._prefixes = {}
+        self._id_needles = {}
+        self._name_needles = {}
+        for index, mapping in enumerate(self.mappings):
+            for entity_id in mapping.get('entityIds') or ():
+                self._exact.setdefault(entity_id, index)
+            for prefix in mapping.get('entityIdPrefixes') or ():
+                self._prefixes.setdefault(prefix.lower(), index)
+            for needle in mapping.get('friendlyNameIncludes') or ():
+                self._name_needles.setdefault(needle.lower(), index)
+            for alias in mapping.get('aliases') or ():
+                self._id_needles.setdefault(alias.lower(), index)
+                self._name_needles.setdefault(alias.lower(), index)
+        self._memo = {}
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_MAPPING_PATH):
+        return cls(load_room_mapping(path))
+
+    def _scan(self, entity_ids, friendly_names):
+        import numpy as np
+
+        best = np.fromiter((self._exact.get(entity_id, _NO_ROOM) for entity_id in entity_ids),
+                           dtype=np.int64, count=len(entity_ids))
+        ids = JoinedColumn(entity_ids)
+        names = JoinedColumn(friendly_names)
+        for column, needles, prefix in ((ids, self._prefixes, True),
+                                        (ids, self._id_needles, False),
+                                        (names, self._name_needles, False)):
+            for needle, index in needles.items():
+                rows = column.rows((needle,), prefix=prefix, ignore_case=True)
+                best[rows] = np.minimum(best[rows], index)
+        return best.tolist()
+
+    def resolve_indices(self, entity_ids, friendly_names=None):
+        """Mapping index (or None) per entity; names may be None or missing."""
+        if friendly_names is None:
+            friendly_names = [None] * len(entity_ids)
+        keys = list(zip(entity_ids, friendly_names))
+        memo = self._memo
+        fresh = [key for key in dict.fromkeys(keys) if key not in memo]
+        if fresh:
+            if len(memo) + len(fresh) > MEMO_LIMIT:
+                memo.clear()
+            indices = self._scan([entity_id or '' for entity_id, _ in fresh],
+                                 [name or '' for _, name in fresh])
+            for key, index in zip(fresh, indices):
+                memo[key] = None if index == _NO_ROOM or not (key[0] or key[1]) else index
+        return [memo[key] for key in keys]
+
+    def resolve(self, entity_id, friendly_name=None):
+        """The mapping dict ``resolveRoomMeta`` would return, or None."""
+        index = self.resolve_indices([entity_id], [friendly_name])[0]
+        return None if index is None else self.mappings[index]
+
+    def room_ids(self, table):
+        """``roomId`` per row of an entity table, as a categorical Series."""
+        import pandas as pd
+
+        room_ids = [mapping['roomId'] for mapping in self.mappings]
+        indices = self.resolve_indices(table['entity_id'].tolist(),
+                                       table['friendly_name'].tolist())
+        codes = [-1 if index is None else index for index in indices]
+        return pd.Series(pd.Categorical.from_codes(codes, categories=room_ids),
+                         index=table.index, name='room')
+
+    def entities_by_room(self, table):
+        """``{roomId: [entity_id, ...]}`` for every room with entities."""
+        rooms = self.room_ids(table)
+        return {room: ids.tolist()
+                for room, ids in table['entity_id'].groupby(rooms, observed=True, sort=False)}
+
+
+def main():
+    from entity_parser import load_entities
+    from entity_table import build_entity_table
+
+    path = sys.argv[1] if len(sys.argv) > 1 else 'mockup-Room_entity_data.js'
+    table = build_entity_table(load_entities(path))
+    for room, entity_ids in RoomResolver.from_file().entities_by_room(table).items():
+        print(f'{room}: {len(entity_ids)} entities')
+
+
+if __name__ == '__main__':
+    main()
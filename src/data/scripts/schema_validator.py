@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""Compiled validators for the JSON schemas in ``src/data/schemas``.
+
+``compile_validator`` turns a schema into the source of one Python function
+(in the style of fastjsonschema's generated code) and ``exec``s it once:
+properties, ``required``, ``type``, ``enum``, ``format: date-time`` and
+``minimum``/``maximum`` become inline checks, ``$ref``/``items``/``oneOf``/
+``anyOf`` calls of further generated functions. A valid record returns an
+empty tuple without allocating; an invalid one returns its problems as
+``(field path, kind)`` pairs, kind one of ``missing``, ``type``, ``enum``,
+``format``, ``range`` or ``oneOf``. Keywords outside that subset are ignored.
+
+``sensor_readings`` maps extracted entities (``extract_entities.summarize``
+records or raw dump entities) of the sensor domains to ``SensorReading``
+records, and ``ConformanceReport`` counts, per field, the records missing
+it or holding an invalid value, batch by batch, so it can run inline in
+the extractor (``extract_entities.py --validate``):
+
+    python schema_validator.py ../static/mockup-Room_entity_data.js
+"""
+import json
+import os
+import re
+import sys
+from collections import Counter
+from functools import lru_cache
+
+from instrumentation import count, quiet_broken_pipe, span
+
+SCHEMA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'schemas')
+
+# RFC 3339 date-time, as JSON schema's ``date-time`` format defines it.
+DATE_TIME_REGEX = re.compile(
+    r'\d{4}-\d{2}-\d{2}[Tt ]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:[Zz]|[+-]\d{2}:\d{2})')
+
+# Entity domains whose entities are sensor readings.
+SENSOR_DOMAINS = ('sensor', 'binary_sensor')
+# Home Assistant device classes under their SensorReading ``sensor_type`` name;
+# other device classes are passed through (and fail the enum).
+SENSOR_TYPES = {
+    'carbon_dioxide': 'co2',
+    'illuminance': 'illumination',
+    'aqi': 'air_quality',
+    'volatile_organic_compounds': 'voc',
+    'volatile_organic_compounds_parts': 'voc',
+    'sound_pressure': 'noise',
+    'atmospheric_pressure': 'pressure',
+}
+# Entities validated at a time by ``validated``.
+VALIDATE_BATCH = 1000
+# States Home Assistant reports instead of a value.
+NO_VALUE_STATES = frozenset(('unavailable', 'unknown', ''))
+
+_TYPE_CHECKS = {
+    'string': 'type({v}) is str',
+    'number': '(type({v}) is int or type({v}) is float)',
+    'integer': '(type({v}) is int or (type({v}) is float and {v}.is_integer()))',
+    'boolean': 'type({v}) is bool',
+    'object': 'type({v}) is dict',
+    'array': 'type({v}) is list',
+    'null': '{v} is None',
+}
+_NO_PROBLEMS = ()
+_MISSING = object()
+
+
+class _Compiler:
+    def __init__(self, root):
+        self.root = root
+        self.sources = []
+        self._refs = {}
+        self.namespace = {'DATE_TIME': DATE_TIME_REGEX.fullmatch, 'MISSING': _MISSING,
+                          'NO_PROBLEMS': _NO_PROBLEMS}
+        self._names = 0
+
+    def constant(self, value):
+        self._names += 1
+        name = f'C{self._names}'
+        self.namespace[name] = value
+        return name
+
+    def function(self, schema, key=None):
+        """Name of a generated ``f(value, path, problems)`` checking ``schema``."""
+        if key is not None and key in self._refs:
+            return self._refs[key]
+        self._names += 1
+        name = f'check_{self._names}'
+        if key is not None:
+            # Registered before its body is generated, for recursive $refs.
+            self._refs[key] = name
+        lines = [f'def {name}(value, path, problems):']
+        self.checks(schema, 'value', 'path', lines, 1)
+        lines.append('    return problems')
+        self.sources.append('\n'.join(lines))
+        return name
+
+    def resolve(self, reference):
+        if not reference.startswith('#/'):
+            raise ValueError(f'only local $refs are supported, not {reference!r}')
+        schema = self.root
+        for part in reference[2:].split('/'):
+            schema = schema[part]
+        return schema
+
+    def checks(self, schema, value, path, lines, depth):
+        """Append statements checking ``value`` (an expression) against ``schema``.
+
+        ``path`` is an expression for the field path; problems are appended
+        to ``problems``, a list bound in the generated function.
+        """
+        pad = '    ' * depth
+        if '$ref' in schema:
+            function = self.function(self.resolve(schema['$ref']), schema['$ref'])
+            lines.append(f'{pad}{function}({value}, {path}, problems)')
+            return
+        types = schema.get('type')
+        if types is not None:
+            types = [types] if isinstance(types, str) else types
+            check = ' or '.join(_TYPE_CHECKS[t].format(v=value) for t in types)
+            lines.append(f'{pad}if not ({check}):')
+            lines.append(f'{pad}    problems.append(({path}, "type"))')
+            lines.append(f'{pad}else:')
+            pad, depth = pad + '    ', depth + 1
+            lines.append(f'{pad}pass')
+        if 'enum' in schema:
+            try:
+                options = self.constant(frozenset(schema['enum']))
+            except TypeError:
+                options = self.constant(list(schema['enum']))
+            lines.append(f'{pad}if {value} not in {options}:')
+            lines.append(f'{pad}    problems.append(({path}, "enum"))')
+        if schema.get('format') == 'date-time':
+            lines.append(f'{pad}if type({value}) is str and DATE_TIME({value}) is None:')
+            lines.append(f'{pad}    problems.append(({path}, "format"))')
+        for keyword, operator in (('minimum', '<'), ('maximum', '>')):
+            if keyword in schema:
+                lines.append(f'{pad}if type({value}) in (int, float) and '
+                             f'{value} {operator} {schema[keyword]!r}:')
+                lines.append(f'{pad}    problems.append(({path}, "range"))')
+        for keyword in ('oneOf', 'anyOf'):
+            if keyword in schema:
+                self.alternatives(keyword, schema[keyword], value, path, lines, depth)
+        if 'items' in schema:
+            function = self.function(schema['items'])
+            lines.append(f'{pad}if type({value}) is list:')
+            lines.append(f'{pad}    for item in {value}:')
+            lines.append(f'{pad}        {function}(item, {path} + "[]", problems)')
+        self.properties(schema, value, path, lines, depth, types == ['object'])
+
+    def alternatives(self, keyword, branches, value, path, lines, depth):
+        pad = '    ' * depth
+        types = [branch.get('type') for branch in branches]
+        if (all(set(branch) <= {'type', 'description'} and isinstance(t, str)
+                for branch, t in zip(branches, types))
+                and len(set(types)) == len(types) and not {'number', 'integer'} <= set(types)):
+            # Distinct plain types never overlap, so "exactly one" is "any".
+            check = ' or '.join(_TYPE_CHECKS[t].format(v=value) for t in types)
+            lines.append(f'{pad}if not ({check}):')
+            lines.append(f'{pad}    problems.append(({path}, "{keyword}"))')
+            return
+        functions = [self.function(branch) for branch in branches]
+        matches = ' + '.join(f'(not {function}({value}, {path}, []))' for function in functions)
+        wanted = '== 1' if keyword == 'oneOf' else '>= 1'
+        lines.append(f'{pad}if not ({matches}) {wanted}:')
+        lines.append(f'{pad}    problems.append(({path}, "{keyword}"))')
+
+    def properties(self, schema, value, path, lines, depth, is_dict=False):
+        properties = schema.get('properties') or {}
+        required = schema.get('required') or ()
+        if not properties and not required:
+            return
+        if is_dict:
+            depth -= 1
+        else:
+            lines.append(f'{"    " * depth}if type({value}) is dict:')
+        pad = '    ' * depth
+        for name in dict.fromkeys([*required, *properties]):
+            self._names += 1
+            field = f'v{self._names}'
+            field_path = (repr(name) if path == "''" else
+                          f'({path} + {("." + name)!r} if {path} else {name!r})')
+            lines.append(f'{pad}    {field} = {value}.get({name!r}, MISSING)')
+            if name in required:
+                lines.append(f'{pad}    if {field} is MISSING:')
+                lines.append(f'{pad}        problems.append(({field_path}, "missing"))')
+                lines.append(f'{pad}    else:')
+            else:
+                lines.append(f'{pad}    if {field} is not MISSING:')
+            lines.append(f'{pad}        pass')
+            self.checks(properties.get(name, {}), field, field_path, lines, depth + 2)
+
+
+def _tidy(source):
+    # Drop the placeholder ``pass`` of blocks that got statements after all.
+    lines = source.split('\n')
+    return '\n'.join(line for line, following in zip(lines, lines[1:] + [''])
+                     if line.strip() != 'pass' or
+                     len(following) - len(following.lstrip()) != len(line) - len(line.lstrip()))
+
+
+def compile_validator(schema, root=None):
+    """A function ``validate(record)`` returning its problems (empty tuple if none).
+
+    ``root`` is the document ``$ref``s resolve against (default ``schema``).
+    The generated source is kept as ``validate.source``.
+    """
+    compiler = _Compiler(root if root is not None else schema)
+    lines = ['def validate(value):', '    problems = []']
+    compiler.checks(schema, 'value', "''", lines, 1)
+    lines.append('    return problems or NO_PROBLEMS')
+    source = '\n\n'.join(map(_tidy, compiler.sources + ['\n'.join(lines)])) + '\n'
+    exec(compile(source, '<schema validator>', 'exec'), compiler.namespace)
+    validate = compiler.namespace['validate']
+    validate.source = source
+    return validate
+
+
+def load_schema(name):
+    """The schema document ``<name>.schema.json`` of ``SCHEMA_DIR``."""
+    with open(os.path.join(SCHEMA_DIR, f'{name}.schema.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=None)
+def definition_validator(name, definition):
+    """Compiled validator of ``definitions/<definition>`` in schema ``name`` (once per process)."""
+    schema = load_schema(name)
+    return compile_validator(schema['definitions'][definition], schema)
+
+
+def sensor_reading_validator():
+    """The compiled ``SensorAnalytics`` ``SensorReading`` validator."""
+    return definition_validator('SensorAnalytics', 'SensorReading')
+
+
+def _reading_value(state):
+    if type(state) is not str:
+        return state
+    if state in NO_VALUE_STATES:
+        return _MISSING
+    try:
+        return float(state)
+    except ValueError:
+        return state
+
+
+def sensor_readings(entities):
+    """Yield a ``SensorReading`` dict per sensor-domain entity (others are skipped).
+
+    ``entities`` are ``extract_entities.summarize`` records or raw dump
+    entities; fields with no value are left out, so they count as missing.
+    """
+    sensor_types = SENSOR_TYPES
+    for entity in entities:
+        entity_id = entity.get('entity_id')
+        if type(entity_id) is not str or entity_id.partition('.')[0] not in SENSOR_DOMAINS:
+            continue
+        attributes = entity.get('attributes')
+        if type(attributes) is dict:
+            device_class = attributes.get('device_class')
+            unit = attributes.get('unit_of_measurement')
+        else:
+            device_class = entity.get('device_class')
+            unit = entity.get('unit')
+        reading = {'sensor_id': entity_id}
+        if device_class is not None:
+            reading['sensor_type'] = sensor_types.get(device_class, device_class)
+        value = _reading_value(entity.get('state'))
+        if value is not _MISSING and value is not None:
+            reading['value'] = value
+        if unit is not None:
+            reading['unit'] = unit
+        timestamp = entity.get('last_updated') or entity.get('last_changed')
+        if timestamp is not None:
+            reading['timestamp'] = timestamp
+        yield reading
+
+
+class ConformanceReport:
+    """Per-field counts of records validated against one compiled validator.
+
+    Top-level fields are counted missing whenever a record lacks them,
+    required or not; nested fields when the schema requires them.
+    """
+
+    def __init__(self, validate=None):
+        self.validate = validate or sensor_reading_validator()
+        self.records = 0
+        self.conforming = 0
+        self.present = Counter()
+        self.problems = Counter()
+
+    def add(self, records):
+        """Validate a batch of records; returns how many conformed."""
+        validate = self.validate
+        present = self.present
+        problems = self.problems
+        total = conforming = 0
+        with span('validate'):
+            for record in records:
+                total += 1
+                if type(record) is dict:
+                    present.update(record.keys())
+                found = validate(record)
+                if found:
+                    problems.update(found)
+                else:
+                    conforming += 1
+        self.records += total
+        self.conforming += conforming
+        count('records_validated', total)
+        count('records_nonconforming', total - conforming)
+        return conforming
+
+    def table(self, fields=()):
+        """DataFrame of Field, Missing, Invalid and Present (%), ``fields`` first."""
+        import pandas as pd
+
+        missing = Counter()
+        invalid = Counter()
+        for (field, kind), found in self.problems.items():
+            (missing if kind == 'missing' else invalid)[field] += found
+        for field in [*fields, *self.present]:
+            missing[field] = self.records - self.present[field]
+        rows = []
+        for field in dict.fromkeys([*fields, *sorted(set(missing) | set(invalid))]):
+            present = 100 * (self.records - missing[field]) / self.records if self.records else 0.0
+            rows.append((field, missing[field], invalid[field], round(present, 1)))
+        return pd.DataFrame(rows, columns=['Field', 'Missing', 'Invalid', 'Present (%)'])
+
+    def summary(self):
+        rate = 100 * self.conforming / self.records if self.records else 0
+        return f'{self.conforming} of {self.records} records conform ({rate:.0f}%).'
+
+    def text(self, fields=()):
+        """``table`` and ``summary`` as printable text."""
+        return f'{self.table(fields).to_string(index=False)}\n{self.summary()}'
+
+
+def validated(entities, report, batch_size=VALIDATE_BATCH):
+    """Pass ``entities`` through, adding their ``sensor_readings`` to ``report`` per batch."""
+    batch = []
+    for entity in entities:
+        batch.append(entity)
+        if len(batch) == batch_size:
+            report.add(sensor_readings(batch))
+            yield from batch
+            batch = []
+    report.add(sensor_readings(batch))
+    yield from batch
+
+
+def reading_fields(required_only=False):
+    """The ``SensorReading`` property names (or just the required ones), in schema order."""
+    schema = load_schema('SensorAnalytics')['definitions']['SensorReading']
+    return list(schema['required'] if required_only else schema['properties'])
+
+
+def main(argv=None):
+    import argparse
+
+    from entity_parser import load_entities
+
+    parser = argparse.ArgumentParser(
+        description='Check the sensor entities of a dump against the SensorReading schema.')
+    parser.add_argument('dump', help='entity dump (JS object literal or /api/states JSON)')
+    parser.add_argument('--source', action='store_true', help='print the generated validator')
+    args = parser.parse_args(argv)
+
+    if args.source:
+        print(sensor_reading_validator().source)
+        return 0
+    report = ConformanceReport()
+    report.add(sensor_readings(load_entities(args.dump)))
+    with quiet_broken_pipe():
+        print(report.text(reading_fields()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""Entity-level deltas between entity dumps.
+
+Each snapshot is indexed once by ``entity_id`` (a dict), so comparing two
+snapshots is one hash join: a lookup per entity and C-level comparisons of
+the ``state`` strings and ``attributes`` dicts. Only ``state`` and
+``attributes`` are compared; timestamps and ``context`` change on every
+write and are carried along, not diffed. Changes come out sorted by
+``entity_id`` as plain dicts with an ``op`` of:
+
+``added``       ``entity`` is the new entity
+``removed``     ``entity`` is the last known entity
+``state``       ``old``/``new`` state plus the new ``last_changed``
+``attributes``  ``changed`` new values, ``old`` previous values, ``removed`` keys
+
+An entity whose state and attributes both changed yields one ``state`` and
+one ``attributes`` record. ``iter_deltas`` walks a sequence of snapshots
+keeping only the previous index in memory, and ``apply_changes`` replays the
+records onto an index, so history can be stored as one dump plus deltas:
+
+    python snapshot_diff.py monday.json tuesday.json
+    python snapshot_diff.py 'snapshots/*.json.gz' --summary
+"""
+import argparse
+import sys
+from collections import Counter
+
+from entity_cache import add_cache_arguments, cached_records, open_cache, report as report_cache
+from entity_parser import load_entities
+from extract_entities import expand_paths, write_ndjson
+from instrumentation import quiet_broken_pipe
+
+OPS = ('added', 'removed', 'state', 'attributes')
+
+_NO_ATTRIBUTES = {}
+
+
+def index_snapshot(entities):
+    """``{entity_id: entity}``; a later duplicate replaces an earlier one."""
+    return {entity['entity_id']: entity for entity in entities}
+
+
+def _attributes(entity):
+    attributes = entity.get('attributes')
+    return attributes if type(attributes) is dict else _NO_ATTRIBUTES
+
+
+def _attribute_change(entity_id, old_attributes, new_attributes):
+    changed = {}
+    old = {}
+    for key, value in new_attributes.items():
+        if key not in old_attributes:
+            changed[key] = value
+        elif old_attributes[key] != value:
+            changed[key] = value
+            old[key] = old_attributes[key]
+    removed = [key for key in old_attributes if key not in new_attributes]
+    for key in removed:
+        old[key] = old_attributes[key]
+    return {'op': 'attributes', 'entity_id': entity_id, 'changed': changed, 'old': old,
+            'removed': removed}
+
+
+def diff_snapshots(old, new):
+    """Changes that turn index ``old`` into index ``new`` (see the module docstring)."""
+    changes = []
+    for entity_id, entity in new.items():
+        previous = old.get(entity_id)
+        if previous is None:
+            changes.append({'op': 'added', 'entity_id': entity_id, 'entity': entity})
+            continue
+        if previous is entity:
+            continue
+        state = entity.get('state')
+        if previous.get('state') != state:
+            changes.append({'op': 'state', 'entity_id': entity_id, 'old': previous.get('state'),
+                            'new': state, 'last_changed': entity.get('last_changed')})
+        attributes = _attributes(entity)
+        previous_attributes = _attributes(previous)
+        if previous_attributes != attributes:
+            changes.append(_attribute_change(entity_id, previous_attributes, attributes))
+    if len(old) + sum(change['op'] == 'added' for change in changes) != len(new):
+        for entity_id, entity in old.items():
+            if entity_id not in new:
+                changes.append({'op': 'removed', 'entity_id': entity_id, 'entity': entity})
+    # Stable sort keeps the state record ahead of the attributes record.
+    changes.sort(key=lambda change: change['entity_id'])
+    return changes
+
+
+def apply_changes(index, changes):
+    """Replay ``changes`` onto ``index`` in place and return it.
+
+    Replaying ``diff_snapshots(a, b)`` onto a copy of ``a`` reproduces the
+    state and attributes of every entity in ``b``.
+    """
+    for change in changes:
+        op = change['op']
+        entity_id = change['entity_id']
+        if op == 'added':
+            index[entity_id] = change['entity']
+        elif op == 'removed':
+            index.pop(entity_id, None)
+        elif op == 'state':
+            entity = index[entity_id] = dict(index[entity_id])
+            entity['state'] = change['new']
+            entity['last_changed'] = change['last_changed']
+        else:
+            entity = index[entity_id] = dict(index[entity_id])
+            attributes = dict(_attributes(entity))
+            attributes.update(change['changed'])
+            for key in change['removed']:
+                attributes.pop(key, None)
+            entity['attributes'] = attributes
+    return index
+
+
+def iter_deltas(snapshots):
+    """Yield ``(label, changes)`` for each consecutive pair of ``(label, entities)``.
+
+    The first snapshot is diffed against an empty index, so its changes are
+    all ``added``; after that only what changed is emitted. Only the
+    previous snapshot's index is held in memory.
+    """
+    previous = {}
+    for label, entities in snapshots:
+        current = index_snapshot(entities)
+        yield label, diff_snapshots(previous, current)
+        previous = current
+
+
+def load_snapshots(paths, cache=None):
+    """``(path, entities)`` per dump, parsed lazily (and cached when ``cache`` is given)."""
+    for path in paths:
+        yield path, cached_records(cache, path, 'entities', load_entities)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Diff entity snapshots.')
+    parser.add_argument('paths', nargs='+', metavar='path',
+                        help='two or more entity dumps, directories or globs, oldest first')
+    parser.add_argument('--summary', action='store_true',
+                        help='print change counts per snapshot instead of NDJSON changes')
+    add_cache_arguments(parser, 'every dump')
+    args = parser.parse_args(argv)
+
+    # Keep the order given on the command line; only expand each argument.
+    paths = [path for pattern in args.paths for path in expand_paths([pattern])]
+    if len(paths) < 2:
+        parser.error('need at least two snapshots to diff')
+
+    cache = open_cache(args.no_cache, args.rebuild_cache)
+    try:
+        with quiet_broken_pipe():
+            deltas = iter_deltas(load_snapshots(paths, cache))
+            next(deltas)  # the first snapshot is the baseline, not a change
+            for path, changes in deltas:
+                if args.summary:
+                    counts = Counter(change['op'] for change in changes)
+                    print(f'{path}: ' + ', '.join(f'{counts[op]} {op}' for op in OPS))
+                else:
+                    write_ndjson(({'snapshot': path, **change} for change in changes), sys.stdout)
+    finally:
+        report_cache(cache)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""Stage measurements for the pipeline benchmark suite.
+
+``StageRecorder.stage(name, size)`` wraps one pipeline stage run over
+``size`` items and records its wall time, throughput and how far its peak
+RSS rose above the RSS it started at, so memory kept by earlier stages (or
+earlier tests in the same process) is not charged to it. The peak is the
+kernel's high-water mark, reset through ``/proc/self/clear_refs``; where
+that reset does not take, RSS is polled from a thread during the stage.
+Without ``/proc`` the growth of the process-wide peak is reported.
+
+With a ``profile`` of ``cprofile`` or ``pyinstrument`` every stage also runs
+under that profiler and leaves ``<stage>-<size>.prof`` (pstats) or
+``.html`` in ``profile_dir``. pyinstrument is only imported when asked for.
+
+Baselines are JSON files of ``{stage: {size: {"seconds": s, "rss_growth_mib": m}}}``
+written by ``save_baseline``; ``regressions`` lists the measurements that
+exceed their baseline by more than a tolerance factor. Values under
+``MIN_GATED`` are never regressions: at a few milliseconds or megabytes
+the ratio is mostly noise.
+"""
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from instrumentation import peak_rss_mib
+
+Measurement = namedtuple('Measurement', 'stage size seconds throughput rss_growth_mib')
+
+PROFILERS = ('cprofile', 'pyinstrument')
+# Below these a measurement is not compared with its baseline.
+MIN_GATED = {'seconds': 0.05, 'rss_growth_mib': 16}
+# How often the fallback sampler reads RSS, in seconds.
+RSS_POLL_INTERVAL = 0.002
+
+
+def _status_mib(field):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss():
+    """Reset the high-water mark to the current RSS; whether that took."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        return False
+    peak, rss = _status_mib('VmHWM:'), _status_mib('VmRSS:')
+    return peak is not None and rss is not None and peak <= rss + 1
+
+
+class _RssSampler(threading.Thread):
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak = 0.0
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(RSS_POLL_INTERVAL):
+            self.peak = max(self.peak, _status_mib('VmRSS:') or 0.0)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        return max(self.peak, _status_mib('VmRSS:') or 0.0)
+
+
+class StageRecorder:
+    """Collects a ``Measurement`` per ``stage`` block; see the module docstring."""
+
+    def __init__(self, profile=None, profile_dir=None):
+        if profile is not None and profile not in PROFILERS:
+            raise ValueError(f'unknown profiler {profile!r}; use one of {", ".join(PROFILERS)}')
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self.measurements = []
+
+    @contextmanager
+    def stage(self, name, size):
+        profiler = self._start_profiler()
+        start_rss = _status_mib('VmRSS:')
+        sampler = None
+        if start_rss is None:
+            start_rss = peak_rss_mib()
+        elif not _reset_peak_rss():
+            sampler = _RssSampler()
+            sampler.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = sampler.stop() if sampler is not None else peak_rss_mib()
+            if profiler is not None:
+                self._stop_profiler(profiler, f'{name}-{size}')
+        self.measurements.append(Measurement(name, size, seconds, size / seconds if seconds
+                                             else float('inf'), max(peak - start_rss, 0.0)))
+
+    def _start_profiler(self):
+        if self.profile == 'cprofile':
+            import cProfile
+
+            profiler = cProfile.Profile()
+            profiler.enable()
+            return profiler
+        if self.profile == 'pyinstrument':
+            import pyinstrument
+
+            profiler = pyinstrument.Profiler()
+            profiler.start()
+            return profiler
+        return None
+
+    def _stop_profiler(self, profiler, label):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        if self.profile == 'cprofile':
+            profiler.disable()
+            profiler.dump_stats(os.path.join(self.profile_dir, f'{label}.prof'))
+        else:
+            profiler.stop()
+            with open(os.path.join(self.profile_dir, f'{label}.html'), 'w', encoding='utf-8') as f:
+                f.write(profiler.output_html())
+
+
+def load_baseline(path):
+    """The baseline at ``path``, or ``{}`` if there is none yet."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, measurements, baseline=None):
+    """Write ``measurements`` over ``baseline`` (other stages and sizes are kept)."""
+    baseline = json.loads(json.dumps(baseline or {}))
+    for m in measurements:
+        baseline.setdefault(m.stage, {})[str(m.size)] = {
+            'seconds': round(m.seconds, 4), 'rss_growth_mib': round(m.rss_growth_mib, 1)}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def regressions(measurements, baseline, tolerance):
+    """Lines describing measurements over ``tolerance`` x their baseline."""
+    found = []
+    for m in measurements:
+        expected = baseline.get(m.stage, {}).get(str(m.size))
+        if expected is None:
+            continue
+        for field, unit in (('seconds', 's'), ('rss_growth_mib', ' MiB')):
+            value, limit = getattr(m, field), expected[field] * tolerance
+            if value > limit and value > MIN_GATED[field]:
+                found.append(f'{m.stage} @ {m.size}: {value:.3f}{unit} > '
+                             f'{tolerance:g} x baseline {expected[field]}{unit}')
+    return found
+
+
+def format_table(measurements, baseline=None):
+    """Text table of ``measurements``, with the baseline time ratio when known."""
+    lines = [f'{"stage":<10} {"size":>9} {"seconds":>9} {"items/s":>11} {"+RSS MiB":>9} '
+             f'{"vs base":>8}']
+    for m in measurements:
+        expected = (baseline or {}).get(m.stage, {}).get(str(m.size))
+        ratio = f'{m.seconds / expected["seconds"]:.2f}x' if expected else '-'
+        lines.append(f'{m.stage:<10} {m.size:>9} {m.seconds:>9.3f} {m.throughput:>11.0f} '
+                     f'{m.rss_growth_mib:>9.1f} {ratio:>8}')
+    return '\n'.join(lines)
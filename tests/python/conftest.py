@@ -0,0 +1,33 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+for script_dir in (REPO_ROOT / 'src' / 'data' / 'scripts', REPO_ROOT / 'poster-test',
+                   Path(__file__).parent):
+    if str(script_dir) not in sys.path:
+        sys.path.insert(0, str(script_dir))
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'benchmark: slow benchmark, only runs with RUN_BENCH=1')
+
+
+def pytest_collection_modifyitems(config, items):
+    if os.environ.get('RUN_BENCH') == '1':
+        return
+    skip = pytest.mark.skip(reason='benchmark: set RUN_BENCH=1 to run')
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(autouse=True)
+def _isolated_entity_cache(tmp_path_factory, monkeypatch):
+    # Keep CLI runs (and their subprocesses) out of the user's ~/.cache.
+    monkeypatch.setenv('ENTITY_CACHE_DIR', str(tmp_path_factory.mktemp('entity-cache')))
+    monkeypatch.setenv('FIX_JSON_CACHE',
+                       str(tmp_path_factory.mktemp('json-cache') / 'json-attributes.sqlite'))
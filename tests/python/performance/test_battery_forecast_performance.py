@@ -0,0 +1,39 @@
+"""Drain fits for a fleet of battery devices.
+
+``BENCH_BATTERY_DEVICES`` rows of ``BENCH_BATTERY_SAMPLES`` float32 levels
+(5% missing) are fitted in one ``fit_drain`` call, which works through the
+matrix ``CHUNK_CELLS`` at a time. At the default 10k x 10k this must take a
+few seconds; the fitted rates must match the generating ones.
+"""
+import os
+import time
+
+import pytest
+
+from battery_forecast import fit_drain
+
+BENCH_BATTERY_DEVICES = int(os.environ.get('BENCH_BATTERY_DEVICES', '10000'))
+BENCH_BATTERY_SAMPLES = int(os.environ.get('BENCH_BATTERY_SAMPLES', '10000'))
+
+
+@pytest.mark.benchmark
+def test_fleet_fit_takes_seconds():
+    import numpy as np
+
+    rng = np.random.default_rng(17)
+    hours = np.arange(BENCH_BATTERY_SAMPLES, dtype=np.float64)
+    rates = rng.uniform(0.001, 0.01, size=BENCH_BATTERY_DEVICES)
+    levels = np.empty((BENCH_BATTERY_DEVICES, BENCH_BATTERY_SAMPLES), dtype=np.float32)
+    for begin in range(0, BENCH_BATTERY_DEVICES, 500):
+        block = slice(begin, begin + 500)
+        levels[block] = 100 - rates[block, None] * hours + rng.normal(0, 0.5, levels[block].shape)
+    levels[rng.random(levels.shape, dtype=np.float32) < 0.05] = np.nan
+
+    start = time.perf_counter()
+    drain = fit_drain(hours, levels)
+    seconds = time.perf_counter() - start
+
+    print(f'\n{BENCH_BATTERY_DEVICES} devices x {BENCH_BATTERY_SAMPLES} samples '
+          f'fitted in {seconds:.2f}s')
+    assert np.allclose(-drain.rate, rates, atol=1e-4)
+    assert seconds < 10
@@ -0,0 +1,58 @@
+"""String-aware comment stripping vs. the old block-comment regex.
+
+Two blobs of about ``BENCH_BLOB_KB`` KiB: pretty-printed node lists with
+URLs, without and with a block comment per node (plus a trailing comma).
+A third, 64 times smaller, is a run of unterminated ``/*`` openers: the
+old ``/\\*.*?\\*/`` regex rescans to the end of the value from every opener
+(quadratic), the tokenizer stays linear. The commented blob must also
+parse after cleaning.
+"""
+import json
+import os
+import re
+import time
+
+import pytest
+
+pytest.importorskip('bs4')
+
+from fix_json_attributes import clean_json_string  # noqa: E402
+
+BENCH_BLOB_KB = int(os.environ.get('BENCH_BLOB_KB', '1024'))
+OLD_BLOCK_COMMENT_REGEX = re.compile(r'/\*.*?\*/', re.DOTALL)
+
+
+def _blobs():
+    nodes = []
+    while sum(map(len, nodes)) < BENCH_BLOB_KB * 1024:
+        i = len(nodes)
+        nodes.append(json.dumps({'id': f'n{i}', 'href': f'https://campus/rooms/{i}',
+                                 'edges': [i - 1, i + 1]}, indent=2))
+    plain = '[\n' + ',\n'.join(nodes) + '\n]'
+    commented = '[\n' + ',\n'.join(f'/* node {i} */ {node}' for i, node in enumerate(nodes)) + ',\n]'
+    unterminated = '/* ' * (BENCH_BLOB_KB * 1024 // 3 // 64)
+    return {'plain': plain, 'commented': commented, 'unterminated': unterminated}
+
+
+def _time(function, value):
+    start = time.perf_counter()
+    result = function(value)
+    return time.perf_counter() - start, result
+
+
+@pytest.mark.benchmark
+def test_tokenizer_is_linear_and_string_aware():
+    report = []
+    timings = {}
+    blobs = _blobs()
+    for name, blob in blobs.items():
+        old_time, _ = _time(lambda value: OLD_BLOCK_COMMENT_REGEX.sub('', value).strip(), blob)
+        new_time, cleaned = _time(clean_json_string, blob)
+        timings[name] = old_time, new_time
+        report.append(f'{name} ({len(blob) >> 10} KiB): regex {old_time:.3f}s, '
+                      f'tokenizer {new_time:.3f}s')
+        if name == 'commented':
+            assert json.loads(cleaned) == json.loads(blobs['plain'])
+    print('\n' + '\n'.join(report))
+    old_time, new_time = timings['unterminated']
+    assert new_time < old_time
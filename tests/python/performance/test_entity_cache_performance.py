@@ -0,0 +1,39 @@
+"""Cached vs. fresh extraction of one synthetic dump.
+
+A warm cache must serve the summaries of an unchanged dump several times
+faster than parsing it again. ``BENCH_ENTITIES`` sets the dump size.
+"""
+import os
+import time
+
+import pytest
+
+from entity_cache import EntityCache
+from extract_entities import iter_extract_entities
+from synthetic import write_js_dump
+
+BENCH_ENTITIES = int(os.environ.get('BENCH_ENTITIES', '100000'))
+
+
+@pytest.mark.benchmark
+def test_warm_cache_beats_reparse(tmp_path):
+    dump = write_js_dump(tmp_path / 'dump.js', BENCH_ENTITIES)
+
+    with EntityCache(tmp_path / 'cache') as cache:
+        start = time.perf_counter()
+        cold = list(cache.records(dump, 'summary', iter_extract_entities))
+        cold_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        warm = list(cache.records(dump, 'summary', iter_extract_entities))
+        warm_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cache.lookup(dump, 'summary')
+        lookup_time = time.perf_counter() - start
+
+    print(f'\n{BENCH_ENTITIES} entities: parse + store {cold_time:.2f}s, '
+          f'cached read {warm_time:.2f}s, lookup {lookup_time * 1000:.1f}ms')
+    assert warm == cold
+    assert warm_time * 3 < cold_time
+    assert lookup_time < 0.05
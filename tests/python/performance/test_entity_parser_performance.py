@@ -0,0 +1,86 @@
+"""Single-pass entity parser vs. the per-section regex scans analysis.py used.
+
+On the JS object literal the single pass is *slower* than the legacy scans
+(about 0.7x at 30k entities): it builds every entity dict and pays one Python
+match per token, while the scans only pull tuples out in C. It wins on the
+JSON exports, which the scans cannot read at all, through the C decoder.
+
+Run with ``RUN_BENCH=1 python -m pytest -s tests/python/performance``;
+``BENCH_ENTITIES`` scales the synthetic dump (default 100k entities).
+"""
+import json
+import os
+import re
+import time
+
+import pytest
+
+from entity_parser import parse_entities
+from synthetic import js_dump, synthetic_entities
+
+BENCH_ENTITIES = int(os.environ.get('BENCH_ENTITIES', '100000'))
+
+# The findall calls analysis.py made over js_content, one per report section.
+LEGACY_PATTERNS = [
+    (r'entity_id\s*:\s*"([^"]+)"\s*,\s*state\s*:\s*"([^"]+)"', 0),
+    (r'entity_id\s*:\s*"([^"]+)"', 0),
+    (r'entity_id\s*:\s*"([^"]+battery[^"]*)".*?state\s*:\s*"([^"]+)"', re.DOTALL),
+    (r'entity_id\s*:\s*"sensor\.unoccupied_rooms"[^}]*?state\s*:\s*"([^"]*)"', 0),
+    (r'entity_id\s*:\s*"person\.([^"]+)"[^}]*?state\s*:\s*"([^"]+)"', 0),
+    (r'entity_id\s*:\s*"sensor\.([^"]+)"[^}]*?state\s*:\s*"([^"]+)"[^}]*?friendly_name\s*:\s*"([^"]+)"', 0),
+    (r'entity_id\s*:\s*"sensor\.([^"]*(?:ssid|bssid|connection_type))"[^}]*?state\s*:\s*"([^"]+)"'
+     r'[^}]*?friendly_name\s*:\s*"([^"]+)"', 0),
+    (r'entity_id\s*:\s*"binary_sensor\.([^"]*(?:camera|audio_input|audio_output|focus))"[^}]*?state\s*:\s*"([^"]+)"'
+     r'[^}]*?friendly_name\s*:\s*"([^"]+)"', 0),
+    (r'entity_id\s*:\s*"([^"]+)"[^}]*?latitude\s*:\s*([-]?\d+\.\d+)[^}]*?longitude\s*:\s*([-]?\d+\.\d+)', 0),
+    (r'entity_id\s*:\s*"([^"]+)"[^}]*?state\s*:\s*"([^"]+)"[^}]*?friendly_name\s*:\s*"([^"]+)"', 0),
+    (r'entity_id\s*:\s*"([^"]+)"[^}]*?state\s*:\s*"([^"]+)"', 0),
+    (r'entity_id\s*:\s*"([^"]+)"[^}]*?state\s*:\s*"([^"]+)"[^}]*?attributes\s*:\s*{[^}]*?friendly_name\s*:\s*"([^"]+)"',
+     re.DOTALL),
+    (r'entity_id\s*:\s*"([^"]+)"', 0),
+    (r'entity_id\s*:\s*"([^"]+)"[^}]*?attributes\s*:\s*{[^}]*?friendly_name\s*:\s*"([^"]+)"', re.DOTALL),
+]
+
+
+def legacy_regex_path(js_content):
+    return [re.findall(pattern, js_content, flags) for pattern, flags in LEGACY_PATTERNS]
+
+
+def _best_of(fn, arg, runs=3):
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+@pytest.fixture(scope='module')
+def dumps():
+    entities = list(synthetic_entities(BENCH_ENTITIES))
+    return js_dump(entities), json.dumps(entities, indent=2)
+
+
+@pytest.mark.benchmark
+def test_single_pass_vs_legacy_regex_scans(dumps):
+    js_text, json_text = dumps
+
+    legacy_s, _ = _best_of(legacy_regex_path, js_text)
+    js_s, from_js = _best_of(parse_entities, js_text)
+    json_s, from_json = _best_of(parse_entities, json_text)
+
+    assert len(from_js) == BENCH_ENTITIES
+    assert from_json == from_js
+
+    mb = len(js_text) / 1e6
+    print(f'\n{BENCH_ENTITIES} entities, {mb:.1f} MB JS literal')
+    print(f'  legacy regex path ({len(LEGACY_PATTERNS)} scans): {legacy_s:.3f}s')
+    print(f'  single pass, JS literal:   {js_s:.3f}s ({legacy_s / js_s:.2f}x)')
+    print(f'  single pass, JSON export:  {json_s:.3f}s ({legacy_s / json_s:.2f}x)')
+
+    # The regex path cannot read the JSON exports at all; on those the
+    # single pass must also be clearly faster than the regex scans.
+    assert json_s < legacy_s
+    # The JS literal is the known slow case (see above); keep it from
+    # drifting further behind the scans.
+    assert js_s < 2 * legacy_s
@@ -0,0 +1,42 @@
+"""Speedup of multi-file ``extract_many`` at 1/2/4/8/16 workers.
+
+Runs against a directory of synthetic daily snapshots. The speedup table is
+printed; every worker count must produce identical output, and on a box
+with at least 4 CPUs the run at min(cpus, 16) workers must reach at least
+half of linear speedup. ``BENCH_FILES`` and
+``BENCH_ENTITIES`` (per file) size the corpus.
+"""
+import os
+import time
+
+import pytest
+
+from extract_entities import extract_many
+from synthetic import write_js_dump
+
+BENCH_FILES = int(os.environ.get('BENCH_FILES', '32'))
+BENCH_ENTITIES = int(os.environ.get('BENCH_ENTITIES', '5000'))
+WORKER_COUNTS = (1, 2, 4, 8, 16)
+
+
+@pytest.mark.benchmark
+def test_parallel_speedup(tmp_path):
+    paths = [write_js_dump(tmp_path / f'day{day:03d}.js', BENCH_ENTITIES, seed=day)
+             for day in range(BENCH_FILES)]
+
+    timings = {}
+    results = {}
+    for workers in WORKER_COUNTS:
+        start = time.perf_counter()
+        results[workers] = extract_many(paths, workers=workers)
+        timings[workers] = time.perf_counter() - start
+
+    print(f'\n{BENCH_FILES} files x {BENCH_ENTITIES} entities, {os.cpu_count()} CPUs')
+    for workers in WORKER_COUNTS:
+        print(f'  {workers:2} workers: {timings[workers]:6.2f}s  '
+              f'speedup {timings[1] / timings[workers]:4.1f}x')
+
+    assert all(result == results[1] for result in results.values())
+    usable = min(os.cpu_count() or 1, max(WORKER_COUNTS))
+    if usable >= 4:
+        assert timings[1] / timings[usable] > usable * 0.5
@@ -0,0 +1,57 @@
+"""Throughput and peak RSS of ``extract_entities.py --ndjson``.
+
+Each run happens in a fresh interpreter so ru_maxrss belongs to that run
+only. Peak RSS must stay flat when the dump grows 5x, i.e. memory does not
+scale with the number of entities. ``BENCH_ENTITIES`` sets the large size.
+"""
+import gzip
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from synthetic import REPO_ROOT, write_js_dump
+
+BENCH_ENTITIES = int(os.environ.get('BENCH_ENTITIES', '100000'))
+SCRIPTS_DIR = REPO_ROOT / 'src' / 'data' / 'scripts'
+
+_RUNNER = '''
+import json, os, resource, sys, time
+import extract_entities
+start = time.perf_counter()
+with open(os.devnull, 'w') as out:
+    count = extract_entities.write_ndjson(extract_entities.iter_extract_entities(sys.argv[1]), out)
+elapsed = time.perf_counter() - start
+print(json.dumps({'count': count, 'seconds': elapsed,
+                  'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+'''
+
+
+def _run(path):
+    out = subprocess.run([sys.executable, '-c', _RUNNER, str(path)], cwd=SCRIPTS_DIR,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out)
+
+
+@pytest.mark.benchmark
+def test_ndjson_throughput_and_flat_memory(tmp_path):
+    small_path = write_js_dump(tmp_path / 'small.js', BENCH_ENTITIES // 5)
+    large_path = write_js_dump(tmp_path / 'large.js', BENCH_ENTITIES)
+    gz_path = tmp_path / 'large.js.gz'
+    with open(large_path, 'rb') as src, gzip.open(gz_path, 'wb', compresslevel=1) as dst:
+        dst.write(src.read())
+
+    small = _run(small_path)
+    large = _run(large_path)
+    gz = _run(gz_path)
+
+    mb = large_path.stat().st_size / 1e6
+    print(f'\n{large["count"]} entities ({mb:.0f} MB)')
+    for label, run in (('small', small), ('plain', large), ('gzip', gz)):
+        print(f'  {label:5}: {run["count"] / run["seconds"]:,.0f} entities/s, '
+              f'peak RSS {run["peak_rss_mb"]:.1f} MB')
+
+    assert gz['count'] == large['count']
+    assert large['peak_rss_mb'] < small['peak_rss_mb'] + 10
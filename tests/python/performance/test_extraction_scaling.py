@@ -0,0 +1,44 @@
+"""Regression guard: battery/activity/connectivity extraction stays linear.
+
+Times text -> parse -> entity table -> battery/activity/connectivity reports
+at 10k and 100k entities and fails if the 10x larger dump costs noticeably
+more than 10x the time.
+"""
+import time
+
+import pytest
+
+from analysis import activity_metrics, battery_levels, connectivity_summary
+from entity_parser import parse_entities
+from entity_table import build_entity_table
+from synthetic import js_dump, synthetic_entities
+
+# Allowed slack over a perfect 10x before we call it superlinear.
+MAX_GROWTH = 10 * 1.6
+
+
+def _extract(text):
+    table = build_entity_table(parse_entities(text))
+    return battery_levels(table), activity_metrics(table), connectivity_summary(table)
+
+
+def _best_of(text, runs=3):
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        _extract(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@pytest.mark.benchmark
+def test_extraction_grows_linearly():
+    small = js_dump(synthetic_entities(10_000))
+    large = js_dump(synthetic_entities(100_000))
+
+    small_s = _best_of(small)
+    large_s = _best_of(large)
+    growth = large_s / small_s
+
+    print(f'\n10k: {small_s:.3f}s  100k: {large_s:.3f}s  growth: {growth:.1f}x')
+    assert growth < MAX_GROWTH
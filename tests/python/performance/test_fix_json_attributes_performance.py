@@ -0,0 +1,54 @@
+"""Batch poster fixing vs. the old one-file-at-a-time html.parser flow.
+
+The corpus mixes copies of the design-system poster (which has target tags)
+with plain pages (which the pre-scan skips). The legacy run parses every
+file with ``html.parser`` and walks the tree once per target tag, as the
+script did before batch mode. ``BENCH_PAGES`` sets the corpus size.
+"""
+import os
+import shutil
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+import pytest
+
+bs4 = pytest.importorskip('bs4')
+
+from fix_json_attributes import TARGET_ATTRIBUTES, fix_html_files  # noqa: E402
+from synthetic import REPO_ROOT  # noqa: E402
+
+BENCH_PAGES = int(os.environ.get('BENCH_PAGES', '200'))
+POSTER = REPO_ROOT / 'poster-test' / 'design-system-poster.html'
+PLAIN_PAGE = REPO_ROOT / 'poster-test' / 'index.html'
+
+
+def _legacy(paths):
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            soup = bs4.BeautifulSoup(f.read(), 'html.parser')
+        for tag_name in TARGET_ATTRIBUTES:
+            soup.find_all(tag_name)
+
+
+@pytest.mark.benchmark
+def test_batch_beats_legacy(tmp_path):
+    paths = []
+    for index in range(BENCH_PAGES):
+        path = tmp_path / f'page{index:04d}.html'
+        shutil.copy(POSTER if index % 2 else PLAIN_PAGE, path)
+        paths.append(str(path))
+
+    start = time.perf_counter()
+    _legacy(paths)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with redirect_stdout(StringIO()):
+        counts = fix_html_files(paths)
+    batch_time = time.perf_counter() - start
+
+    print(f'\n{BENCH_PAGES} pages on {os.cpu_count()} CPUs: legacy {legacy_time:.2f}s, '
+          f'batch {batch_time:.2f}s ({legacy_time / batch_time:.1f}x), {counts}')
+    assert counts['skipped'] == BENCH_PAGES // 2
+    assert batch_time < legacy_time
@@ -0,0 +1,52 @@
+"""Cold vs. warm JSON normalization through the persistent cache.
+
+The values look like ``tech-diagram`` node lists: pretty-printed JSON with a
+block comment, so every one needs cleaning and re-serializing. A cold run
+pays for the parse plus the cache writes; a warm run (a second invocation
+over unchanged posters) only hashes each value and reads the cache.
+``BENCH_VALUES`` sets the number of distinct values.
+"""
+import json
+import os
+import time
+
+import pytest
+
+pytest.importorskip('bs4')
+
+from fix_json_attributes import NormalizationCache, normalize_json_value  # noqa: E402
+
+BENCH_VALUES = int(os.environ.get('BENCH_VALUES', '20000'))
+
+
+def _values():
+    return [json.dumps([{'id': f'n{i}-{j}', 'label': f'Node {j}', 'x': j * 10, 'y': i}
+                        for j in range(12)], indent=2).replace('[\n', '[ /* nodes */\n', 1)
+            for i in range(BENCH_VALUES)]
+
+
+def _run(path, values):
+    cache = NormalizationCache(path)
+    start = time.perf_counter()
+    cache.prefetch(values)
+    results = [cache.normalize(value) for value in values]
+    cache.close()
+    return time.perf_counter() - start, results, cache
+
+
+@pytest.mark.benchmark
+def test_warm_cache_beats_parsing(tmp_path):
+    values = _values()
+    path = str(tmp_path / 'cache.sqlite')
+
+    start = time.perf_counter()
+    expected = [normalize_json_value(value) for value in values]
+    plain_time = time.perf_counter() - start
+    cold_time, cold, _ = _run(path, values)
+    warm_time, warm, cache = _run(path, values)
+
+    print(f'\n{BENCH_VALUES} values: uncached {plain_time:.2f}s, cold {cold_time:.2f}s, '
+          f'warm {warm_time:.2f}s ({plain_time / warm_time:.1f}x)')
+    assert cold == warm == expected
+    assert cache.hits == BENCH_VALUES
+    assert warm_time < plain_time / 2
@@ -0,0 +1,67 @@
+"""Regenerating floor plans per floor and time slice.
+
+``BENCH_FLOORPLANS`` plans of ``BENCH_FLOORPLAN_ROOMS`` rooms (a third of
+them positioned) with 20 sensors each are rendered from one template,
+against a minidom build of the same document (the old implementation). The
+template must render hundreds of plans per second and beat minidom.
+"""
+import io
+import os
+import time
+
+import pytest
+
+from floorplan_svg import FloorplanTemplate
+
+BENCH_FLOORPLANS = int(os.environ.get('BENCH_FLOORPLANS', '200'))
+BENCH_FLOORPLAN_ROOMS = int(os.environ.get('BENCH_FLOORPLAN_ROOMS', '60'))
+
+
+def _minidom_svg(room_sensors):
+    from xml.dom.minidom import Document
+
+    doc = Document()
+    svg = doc.createElement('svg')
+    svg.setAttribute('xmlns', 'http://www.w3.org/2000/svg')
+    svg.setAttribute('width', '2025')
+    svg.setAttribute('height', '1627')
+    svg.setAttribute('viewBox', '0 0 2025 1627')
+    doc.appendChild(svg)
+    for room, sensors in room_sensors.items():
+        group = doc.createElement('g')
+        group.setAttribute('id', f'{room}_annotated')
+        text = doc.createElement('text')
+        text.setAttribute('x', '10')
+        text.setAttribute('y', str(100 + len(svg.childNodes) * 60))
+        text.setAttribute('fill', 'black')
+        text.setAttribute('font-size', '14')
+        text.appendChild(doc.createTextNode(f'{room}: ' + ', '.join(sensors)))
+        group.appendChild(text)
+        svg.appendChild(group)
+    return doc.toprettyxml(indent='  ')
+
+
+@pytest.mark.benchmark
+def test_template_renders_hundreds_of_plans_per_second():
+    rooms = [f'r.{index}' for index in range(BENCH_FLOORPLAN_ROOMS)]
+    positions = {room: (index * 30.0, index * 20.0, 'rgba(93, 50, 243, 0.90)')
+                 for index, room in enumerate(rooms[::3])}
+    plans = [{room: [f'{room} sensor {sensor} @ {plan} & co' for sensor in range(20)]
+              for room in rooms} for plan in range(BENCH_FLOORPLANS)]
+
+    start = time.perf_counter()
+    template = FloorplanTemplate(positions)
+    for plan in plans:
+        template.render(plan, io.StringIO())
+    template_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for plan in plans:
+        _minidom_svg(plan)
+    minidom_time = time.perf_counter() - start
+
+    print(f'\n{BENCH_FLOORPLANS} plans x {BENCH_FLOORPLAN_ROOMS} rooms: '
+          f'template {template_time:.3f}s ({BENCH_FLOORPLANS / template_time:.0f}/s), '
+          f'minidom {minidom_time:.3f}s')
+    assert BENCH_FLOORPLANS / template_time > 200
+    assert template_time < minidom_time
@@ -0,0 +1,52 @@
+"""Spatial queries over a city's worth of trackers.
+
+``BENCH_GEO_POINTS`` positions (half clustered on campus, half spread over
+the city) are indexed once; then 1000 radius (100 m), nearest-5 and small
+geofence queries run each at random campus points. Each kind must average
+well under a millisecond, and the index must build in under a second.
+"""
+import os
+import time
+
+import pytest
+
+from geo_index import GeoIndex
+
+BENCH_GEO_POINTS = int(os.environ.get('BENCH_GEO_POINTS', '100000'))
+QUERIES = 1000
+
+
+@pytest.mark.benchmark
+def test_queries_take_microseconds():
+    import numpy as np
+
+    rng = np.random.default_rng(18)
+    half = BENCH_GEO_POINTS // 2
+    lats = np.concatenate([rng.normal(52.467, 0.005, half),
+                           rng.uniform(52.3, 52.7, BENCH_GEO_POINTS - half)])
+    lons = np.concatenate([rng.normal(13.45, 0.008, half),
+                           rng.uniform(13.1, 13.8, BENCH_GEO_POINTS - half)])
+    ids = [f'device_tracker.t{i}' for i in range(BENCH_GEO_POINTS)]
+
+    start = time.perf_counter()
+    index = GeoIndex(ids, lats, lons, origin=(52.467, 13.45))
+    build_time = time.perf_counter() - start
+
+    points = np.column_stack([rng.normal(52.467, 0.002, QUERIES), rng.normal(13.45, 0.003, QUERIES)])
+    queries = {
+        'radius 100 m': lambda lat, lon: index.within(lat, lon, 100),
+        'nearest 5': lambda lat, lon: index.nearest(lat, lon, 5),
+        'geofence': lambda lat, lon: index.inside([(lat, lon), (lat + 0.001, lon),
+                                                   (lat + 0.001, lon + 0.002), (lat, lon + 0.002)]),
+    }
+    timings = {}
+    for label, query in queries.items():
+        start = time.perf_counter()
+        found = sum(len(query(lat, lon).entity_ids) for lat, lon in points)
+        timings[label] = (time.perf_counter() - start) / QUERIES, found / QUERIES
+
+    print(f'\n{BENCH_GEO_POINTS} points indexed in {build_time * 1000:.0f} ms')
+    for label, (seconds, found) in timings.items():
+        print(f'  {label}: {seconds * 1e6:.0f} us/query ({found:.0f} hits)')
+    assert build_time < 1
+    assert all(seconds < 1e-3 for seconds, _ in timings.values())
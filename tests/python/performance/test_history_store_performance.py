@@ -0,0 +1,67 @@
+"""Range queries over months of history.
+
+``BENCH_HISTORY_ENTITIES`` battery sensors report every five minutes for
+``BENCH_HISTORY_DAYS`` days; each day is appended as one batch (as a daily
+ingest would) and the store is compacted. The queries ask for one entity's
+hourly rollup over the whole range, its 15-minute rollup over a week and
+its raw readings over a day; each must answer well under a second.
+"""
+import os
+import time
+
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from history_store import HistoryStore  # noqa: E402
+
+BENCH_HISTORY_ENTITIES = int(os.environ.get('BENCH_HISTORY_ENTITIES', '200'))
+BENCH_HISTORY_DAYS = int(os.environ.get('BENCH_HISTORY_DAYS', '60'))
+
+
+def _day(day, entity_ids):
+    import numpy as np
+    import pandas as pd
+
+    ts = pd.date_range('2025-01-01', periods=288, freq='5min', tz='UTC') + pd.Timedelta(days=day)
+    levels = np.random.default_rng(day).uniform(0, 100, size=len(ts) * len(entity_ids)).round()
+    return pd.DataFrame({
+        'entity_id': np.repeat(np.asarray(entity_ids, dtype=object), len(ts)),
+        'ts': np.tile(ts.astype('datetime64[us, UTC]'), len(entity_ids)),
+        'numeric_state': levels,
+        'state': levels.astype('int64').astype(str).astype(object),
+        'friendly_name': None,
+        'device_class': 'battery',
+    })
+
+
+@pytest.mark.benchmark
+def test_range_queries_take_milliseconds(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    entity_ids = [f'sensor.device_{index}_battery' for index in range(BENCH_HISTORY_ENTITIES)]
+
+    start = time.perf_counter()
+    for day in range(BENCH_HISTORY_DAYS):
+        store.append(_day(day, entity_ids))
+    store.compact()
+    ingest_time = time.perf_counter() - start
+
+    target = [entity_ids[len(entity_ids) // 2]]
+    timings = {}
+    for label, query in (
+            ('1h rollup, all days', lambda: store.rollup('1h', entity_ids=target)),
+            ('15min rollup, 7 days', lambda: store.rollup('15min', '2025-01-10', '2025-01-17',
+                                                          entity_ids=target)),
+            ('raw readings, 1 day', lambda: store.readings('2025-01-20', '2025-01-21',
+                                                           entity_ids=target))):
+        start = time.perf_counter()
+        frame = query()
+        timings[label] = time.perf_counter() - start, len(frame)
+
+    readings = BENCH_HISTORY_ENTITIES * BENCH_HISTORY_DAYS * 288
+    print(f'\n{readings} readings ingested and compacted in {ingest_time:.1f}s')
+    for label, (seconds, rows) in timings.items():
+        print(f'  {label}: {seconds * 1000:.0f} ms ({rows} rows)')
+    assert timings['1h rollup, all days'][1] == BENCH_HISTORY_DAYS * 24
+    assert timings['raw readings, 1 day'][1] == 288
+    assert all(seconds < 1 for seconds, _ in timings.values())
@@ -0,0 +1,62 @@
+"""Cost of leaving instrumentation in the code.
+
+``BENCH_INSTRUMENTATION_CALLS`` ``with span(...)`` blocks, ``count`` calls
+and calls of a ``@span`` function are timed against the bare loop, with
+instrumentation off (the default) and on. Off must cost well under a
+microsecond per call, so it can stay in production code paths.
+"""
+import os
+import time
+
+import pytest
+
+from instrumentation import configure, count, span
+
+BENCH_INSTRUMENTATION_CALLS = int(os.environ.get('BENCH_INSTRUMENTATION_CALLS', '200000'))
+
+
+@span('decorated')
+def _decorated():
+    pass
+
+
+def _undecorated():
+    pass
+
+
+def _per_call():
+    calls = range(BENCH_INSTRUMENTATION_CALLS)
+    timings = {}
+    start = time.perf_counter()
+    for _ in calls:
+        _undecorated()
+    bare = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in calls:
+        with span('block'):
+            pass
+    timings['with span'] = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in calls:
+        count('calls')
+    timings['count'] = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in calls:
+        _decorated()
+    timings['@span'] = time.perf_counter() - start - bare
+    return {label: seconds / BENCH_INSTRUMENTATION_CALLS for label, seconds in timings.items()}
+
+
+@pytest.mark.benchmark
+def test_disabled_instrumentation_is_nearly_free(tmp_path):
+    off = _per_call()
+    configure(textfile_dir=str(tmp_path), script='bench')
+    try:
+        on = _per_call()
+    finally:
+        configure()
+
+    print()
+    for label in off:
+        print(f'  {label}: off {off[label] * 1e9:.0f} ns, on {on[label] * 1e9:.0f} ns per call')
+    assert all(seconds < 1e-6 for seconds in off.values())
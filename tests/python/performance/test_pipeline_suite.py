@@ -0,0 +1,117 @@
+"""Per-stage timings of the Python data pipeline against a stored baseline.
+
+For each size in ``BENCH_SUITE_SIZES`` (entities; default ``1000,10000``,
+the generators scale to ``100000,1000000`` too) a synthetic dump is
+written and run through the pipeline stages:
+
+* ``parse``: ``entity_parser.load_entities`` of the JS dump;
+* ``table``: ``entity_table.build_entity_table``;
+* ``reports``: every ``analysis`` report over the table;
+* ``extract``: ``extract_entities`` summaries straight from the dump;
+* ``poster``: ``fix_json_attributes.fix_html_content`` over a poster page
+  with as many JSON-attribute elements.
+
+Each stage records wall time, items per second and its peak RSS growth
+(``bench``), after an unrecorded warm-up run.
+The run fails when a stage is more than ``BENCH_TOLERANCE`` (default 2) times
+slower or larger than ``pipeline_baseline.json`` (or ``BENCH_BASELINE``),
+ignoring stages that take milliseconds or grow by a few MiB (``bench.MIN_GATED``);
+``BENCH_UPDATE_BASELINE=1`` rewrites the baseline from this run instead.
+``BENCH_PROFILE=cprofile`` (or ``pyinstrument``) profiles every stage into
+``BENCH_PROFILE_DIR``.
+"""
+import os
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('bs4')
+
+import analysis  # noqa: E402
+import bench  # noqa: E402
+from bench import (  # noqa: E402
+    StageRecorder, format_table, load_baseline, regressions, save_baseline,
+)
+from entity_parser import load_entities  # noqa: E402
+from entity_table import build_entity_table  # noqa: E402
+from extract_entities import extract_entities  # noqa: E402
+from fix_json_attributes import fix_html_content  # noqa: E402
+from synthetic import synthetic_poster, write_js_dump  # noqa: E402
+
+BENCH_SUITE_SIZES = [int(size) for size in
+                     os.environ.get('BENCH_SUITE_SIZES', '1000,10000').split(',')]
+BENCH_BASELINE = os.environ.get('BENCH_BASELINE',
+                                str(Path(__file__).with_name('pipeline_baseline.json')))
+BENCH_TOLERANCE = float(os.environ.get('BENCH_TOLERANCE', '2'))
+
+
+def run_pipeline(recorder, size, workdir):
+    """Run every stage over ``size`` synthetic entities / poster elements."""
+    dump = str(write_js_dump(Path(workdir) / f'dump-{size}.js', size))
+    with recorder.stage('parse', size):
+        entities = load_entities(dump)
+    with recorder.stage('table', size):
+        table = build_entity_table(entities)
+    del entities
+    with recorder.stage('reports', size):
+        for name in analysis.REPORTS:
+            analysis.run_report(name, table)
+    del table
+    with recorder.stage('extract', size):
+        extract_entities(dump)
+    os.remove(dump)
+    poster = synthetic_poster(size)
+    with recorder.stage('poster', size):
+        fix_html_content(poster, lambda line: None)
+
+
+def test_pipeline_stages_are_recorded(tmp_path):
+    recorder = StageRecorder(profile='cprofile', profile_dir=str(tmp_path / 'profiles'))
+    run_pipeline(recorder, 50, tmp_path)
+
+    stages = [m.stage for m in recorder.measurements]
+    assert stages == ['parse', 'table', 'reports', 'extract', 'poster']
+    assert all(m.seconds > 0 and m.rss_growth_mib >= 0 for m in recorder.measurements)
+    assert (tmp_path / 'profiles' / 'parse-50.prof').exists()
+
+    baseline_path = tmp_path / 'baseline.json'
+    save_baseline(baseline_path, recorder.measurements[:1], {'other': {'1': {}}})
+    baseline = load_baseline(baseline_path)
+    assert set(baseline) == {'other', 'parse'}
+    assert regressions(recorder.measurements, baseline, 1.5) == []
+    baseline['parse']['50']['seconds'] /= 10
+    # Milliseconds apart is noise, not a regression.
+    assert regressions(recorder.measurements, baseline, 2.0) == []
+    slow = recorder.measurements[0]._replace(seconds=1.0)
+    assert regressions([slow], baseline, 2.0)[0].startswith('parse @ 50: ')
+
+
+def test_rss_growth_is_measured_from_the_stage_start(monkeypatch):
+    held = b'x' * (64 << 20)
+    for reset in (bench._reset_peak_rss, lambda: False):
+        monkeypatch.setattr(bench, '_reset_peak_rss', reset)
+        recorder = StageRecorder()
+        with recorder.stage('allocate', 1):
+            block = b'x' * (48 << 20)
+        del block
+        growth = recorder.measurements[0].rss_growth_mib
+        # The 64 MiB held before the stage are not charged to it.
+        assert 40 < growth < 64
+    del held
+
+
+@pytest.mark.benchmark
+def test_pipeline_against_baseline(tmp_path):
+    recorder = StageRecorder(os.environ.get('BENCH_PROFILE') or None,
+                             os.environ.get('BENCH_PROFILE_DIR', str(tmp_path / 'profiles')))
+    # Imports and memoized lookups are paid here, not by the first stage measured.
+    run_pipeline(StageRecorder(), 10, tmp_path)
+    for size in BENCH_SUITE_SIZES:
+        run_pipeline(recorder, size, tmp_path)
+
+    baseline = load_baseline(BENCH_BASELINE)
+    print('\n' + format_table(recorder.measurements, baseline))
+    if os.environ.get('BENCH_UPDATE_BASELINE') == '1':
+        save_baseline(BENCH_BASELINE, recorder.measurements, baseline)
+        return
+    assert regressions(recorder.measurements, baseline, BENCH_TOLERANCE) == []
@@ -0,0 +1,36 @@
+"""Room resolution throughput over a synthetic entity table.
+
+A cold batch must resolve at least 100k entities/s; the memoized second
+batch must be faster still. ``BENCH_ENTITIES`` sets the table size.
+"""
+import os
+import time
+
+import pytest
+
+from entity_table import build_entity_table
+from room_resolver import RoomResolver
+from synthetic import synthetic_entities
+
+BENCH_ENTITIES = int(os.environ.get('BENCH_ENTITIES', '100000'))
+MIN_ENTITIES_PER_SECOND = 100_000
+
+
+@pytest.mark.benchmark
+def test_resolver_throughput():
+    table = build_entity_table(synthetic_entities(BENCH_ENTITIES))
+    resolver = RoomResolver.from_file()
+
+    start = time.perf_counter()
+    cold = resolver.room_ids(table)
+    cold_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    warm = resolver.room_ids(table)
+    warm_time = time.perf_counter() - start
+
+    print(f'\n{BENCH_ENTITIES} entities: cold {BENCH_ENTITIES / cold_time:,.0f}/s, '
+          f'memoized {BENCH_ENTITIES / warm_time:,.0f}/s, {cold.notna().sum()} placed in a room')
+    assert warm.equals(cold)
+    assert BENCH_ENTITIES / cold_time >= MIN_ENTITIES_PER_SECOND
+    assert warm_time < cold_time
@@ -0,0 +1,41 @@
+"""Validating extracted entities inline in the ingest path.
+
+``BENCH_VALIDATE_ENTITIES`` synthetic entities are extracted once; the
+sensor-domain ones are then mapped to ``SensorReading`` records and run
+through the compiled validator into a ``ConformanceReport``, as
+``extract_entities.py --validate`` does. Mapping plus validation must keep
+over 100k records per second, and validation alone over 200k.
+"""
+import os
+import time
+
+import pytest
+
+from schema_validator import SENSOR_DOMAINS, ConformanceReport, sensor_readings
+from synthetic import synthetic_entities
+
+BENCH_VALIDATE_ENTITIES = int(os.environ.get('BENCH_VALIDATE_ENTITIES', '200000'))
+
+
+@pytest.mark.benchmark
+def test_validation_keeps_ingest_rate():
+    from extract_entities import summarize
+
+    entities = [summarize(entity) for entity in synthetic_entities(BENCH_VALIDATE_ENTITIES)]
+    sensors = [entity for entity in entities
+               if entity['entity_id'].partition('.')[0] in SENSOR_DOMAINS]
+    readings = list(sensor_readings(sensors))
+
+    start = time.perf_counter()
+    ConformanceReport().add(sensor_readings(sensors))
+    inline_rate = len(sensors) / (time.perf_counter() - start)
+
+    report = ConformanceReport()
+    start = time.perf_counter()
+    report.add(readings)
+    validate_rate = len(readings) / (time.perf_counter() - start)
+
+    print(f'\n{len(sensors)} sensor entities: {inline_rate:,.0f} records/s mapped and validated, '
+          f'{validate_rate:,.0f} records/s validated; {report.summary()}')
+    assert inline_rate > 100_000
+    assert validate_rate > 200_000
@@ -0,0 +1,44 @@
+"""Diffing two synthetic 100k-entity snapshots.
+
+About 5% of the entities change state, 5% change attributes, and 1% are
+added and removed. Indexing plus diffing must stay well under a second.
+``BENCH_ENTITIES`` sets the snapshot size.
+"""
+import copy
+import os
+import random
+import time
+
+import pytest
+
+from snapshot_diff import diff_snapshots, index_snapshot
+from synthetic import synthetic_entities
+
+BENCH_ENTITIES = int(os.environ.get('BENCH_ENTITIES', '100000'))
+
+
+@pytest.mark.benchmark
+def test_diff_100k_snapshots():
+    old = list(synthetic_entities(BENCH_ENTITIES))
+    rng = random.Random(1)
+    new = []
+    for entity in old:
+        roll = rng.random()
+        if roll < 0.01:
+            continue
+        if roll < 0.06:
+            entity = dict(entity, state='changed')
+        elif roll < 0.11:
+            entity = copy.deepcopy(entity)
+            entity.setdefault('attributes', {})['friendly_name'] = 'renamed'
+        else:
+            entity = copy.deepcopy(entity)  # equal but not identical: forces a real compare
+        new.append(entity)
+    new.extend({'entity_id': f'sensor.extra_{i}', 'state': '1'} for i in range(BENCH_ENTITIES // 100))
+
+    start = time.perf_counter()
+    changes = diff_snapshots(index_snapshot(old), index_snapshot(new))
+    elapsed = time.perf_counter() - start
+
+    print(f'\n{BENCH_ENTITIES} vs {len(new)} entities: {len(changes)} changes in {elapsed * 1000:.0f}ms')
+    assert elapsed < 0.5
@@ -0,0 +1,101 @@
+"""Synthetic Home Assistant dumps and posters for the Python data-script tests.
+
+The generators scale the real shape of ``mockup-Room_entity_data.js`` by
+cloning its entities with numbered ids (and of ``design-system-poster.html``
+by cloning its JSON-attribute elements), so benchmarks exercise the same
+formatting, nesting and string content the scripts see in production.
+"""
+import json
+import random
+import re
+from pathlib import Path
+
+from entity_parser import load_entities
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+MOCKUP_PATH = REPO_ROOT / 'src' / 'data' / 'static' / 'mockup-Room_entity_data.js'
+POSTER_PATH = REPO_ROOT / 'poster-test' / 'design-system-poster.html'
+
+_BARE_KEY = re.compile(r'^[A-Za-z_$][\w$]*$')
+_POSTER_ELEMENT = re.compile(
+    r'<(timeline-event-card|sticky-note|floor-plan|tech-diagram)\b[^>]*>.*?</\1>', re.DOTALL)
+
+_template_cache = []
+_poster_cache = []
+
+
+def mockup_entities():
+    """Entities parsed from the checked-in mockup dump (cached)."""
+    if not _template_cache:
+        _template_cache.extend(load_entities(MOCKUP_PATH))
+    return _template_cache
+
+
+def _js_value(value, indent):
+    pad = '  ' * indent
+    if isinstance(value, dict):
+        if not value:
+            return '{}'
+        lines = []
+        for key, item in value.items():
+            key_text = key if _BARE_KEY.match(key) else json.dumps(key)
+            lines.append(f'{pad}  {key_text}: {_js_value(item, indent + 1)},')
+        return '{\n' + '\n'.join(lines) + f'\n{pad}}}'
+    if isinstance(value, list):
+        if not value:
+            return '[]'
+        items = ',\n'.join(f'{pad}  {_js_value(item, indent + 1)}' for item in value)
+        return '[\n' + items + f',\n{pad}]'
+    return json.dumps(value, ensure_ascii=False)
+
+
+def synthetic_entities(count, seed=0):
+    """Yield ``count`` entities cloned from the mockup with unique ids."""
+    rng = random.Random(seed)
+    templates = mockup_entities()
+    for index in range(count):
+        entity = json.loads(json.dumps(templates[index % len(templates)]))
+        entity['entity_id'] = f"{entity['entity_id']}_{index}"
+        state = entity.get('state')
+        if isinstance(state, str) and state.isdigit():
+            entity['state'] = str(rng.randint(0, 100))
+        yield entity
+
+
+def js_dump(entities):
+    """Render entities in the ``export const ROOM_ENTITY_MAP = [...]`` format."""
+    parts = ['export const ROOM_ENTITY_MAP = [\n']
+    for entity in entities:
+        parts.append(f'  {_js_value(entity, 1)},\n')
+    parts.append('];\n')
+    return ''.join(parts)
+
+
+def write_js_dump(path, count, seed=0):
+    """Write a synthetic ``count``-entity JS dump to ``path`` and return it."""
+    path = Path(path)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('export const ROOM_ENTITY_MAP = [\n')
+        for entity in synthetic_entities(count, seed):
+            f.write(f'  {_js_value(entity, 1)},\n')
+        f.write('];\n')
+    return path
+
+
+def poster_elements():
+    """The JSON-attribute custom elements of the design-system poster (cached)."""
+    if not _poster_cache:
+        _poster_cache.extend(match.group(0) for match in
+                             _POSTER_ELEMENT.finditer(POSTER_PATH.read_text(encoding='utf-8')))
+    return _poster_cache
+
+
+def synthetic_poster(count):
+    """A page of ``count`` poster elements, each in its own numbered example block."""
+    templates = poster_elements()
+    parts = ['<!DOCTYPE html>\n<html lang="en">\n<body>\n']
+    for index in range(count):
+        parts.append(f'<div class="example-item" id="example-{index}">\n'
+                     f'{templates[index % len(templates)]}\n</div>\n')
+    parts.append('</body>\n</html>\n')
+    return ''.join(parts)
@@ -0,0 +1,115 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import analysis
+from entity_parser import load_entities, parse_entities
+from entity_table import build_entity_table
+from synthetic import MOCKUP_PATH, REPO_ROOT
+
+SCRIPT = REPO_ROOT / 'src' / 'data' / 'scripts' / 'analysis.py'
+
+
+@pytest.fixture(scope='module')
+def table():
+    return build_entity_table(load_entities(MOCKUP_PATH))
+
+
+def test_reports_are_pure_functions_of_the_table(table):
+    stats = dict(analysis.completeness(table).values.tolist())
+    assert stats['Total Entities'] == 437
+    assert stats['Complete Records'] == 435
+    assert stats['Sensor Readings'] == 193
+    assert stats['Conforming Sensor Readings'] == 49
+    assert stats['Readings Missing sensor_type'] == 95
+
+    persons = analysis.occupancy(table).set_index('Entity')
+    assert persons.loc['person', 'Count'] == 6
+    types = analysis.entity_type_distribution(table).set_index('Entity Type')['Count']
+    assert types['sensor'] == 164
+    gps = analysis.gps_positions(table).set_index('Entity ID')
+    assert gps.loc['device_tracker.xxx_xxx_x_x', 'Latitude'] == 52.47961454458583
+    naming = analysis.naming_audit(table).set_index('Entity ID')['Naming Issues']
+    assert naming['person.daniel'] == 'Too short, Type not in name'
+    assert naming['update.piper_update'] == 'OK'
+    rooms = analysis.room_summary(table).set_index('Room')
+    assert rooms.loc['a.5', ['Title', 'Entities']].tolist() == ['MakerSpace', 18]
+
+
+def test_battery_and_activity_are_sorted(table):
+    levels = analysis.battery_levels(table)['Battery Level (%)']
+    assert levels.is_monotonic_increasing
+    activity = analysis.activity_metrics(table).set_index('Friendly Name')['Activity Value']
+    assert activity.is_monotonic_decreasing
+    assert activity['xxx.xxx.x.x Steps'] == 2176
+
+
+def test_battery_state_is_read_from_the_same_entity():
+    # The old DOTALL regex paired a battery entity_id with the next quoted
+    # state it could find, here the one belonging to sensor.next.
+    table = build_entity_table(parse_entities('''[
+      { entity_id: "sensor.phone_battery_level", state: 42 },
+      { entity_id: "sensor.next", state: "99" },
+      { entity_id: "sensor.watch_battery_level", state: "7 %" },
+    ]'''))
+
+    assert analysis.battery_levels(table).values.tolist() == [['sensor.watch_battery_level', 7]]
+
+
+def test_mockup_battery_and_connectivity(table):
+    levels = analysis.battery_levels(table).set_index('Entity ID')['Battery Level (%)']
+    assert levels['sensor.xxx_xxx_x_x_battery_level'] == 50
+    assert 'light.desk' not in levels
+
+    summary = analysis.connectivity_summary(table).set_index('Device')
+    assert summary.loc['MacBook', 'macbook_pro_21_connection_type'] == 'Wi-Fi'
+    assert summary.loc['MacBook', 'daniels_ipad_ssid'] == 'Not Reported'
+
+
+def test_every_report_renders_as_text(table):
+    for name in analysis.REPORTS:
+        text = analysis.format_text(name, analysis.run_report(name, table))
+        assert text.startswith(f'== {name}')
+
+
+def test_text_reports_skip_heavy_imports():
+    loaded = 'print("loaded", sorted(m for m in {} if m in sys.modules)); '
+    code = (
+        'import sys, analysis; '
+        + loaded.format(('pandas', 'numpy', 'schema_validator')) +
+        f'analysis.main([{str(MOCKUP_PATH)!r}, "--text", "--report", "battery"]); '
+        + loaded.format(('schema_validator',)) +
+        f'analysis.main([{str(MOCKUP_PATH)!r}, "--text"]); '
+        + loaded.format(('matplotlib', 'yaml'))
+    )
+    out = subprocess.run([sys.executable, '-c', code], cwd=SCRIPT.parent,
+                         capture_output=True, text=True, check=True).stdout
+    assert [line for line in out.splitlines() if line.startswith('loaded ')] == ['loaded []'] * 3
+
+
+def test_text_to_a_closed_pipe_exits_quietly():
+    # Like `analysis.py --text | head` once head has exited.
+    read_end, write_end = os.pipe()
+    os.close(read_end)
+    try:
+        result = subprocess.run([sys.executable, str(SCRIPT), str(MOCKUP_PATH), '--text'],
+                                stdout=write_end, stderr=subprocess.PIPE, text=True)
+    finally:
+        os.close(write_end)
+    assert result.returncode == 0
+    assert 'BrokenPipeError' not in result.stderr
+
+
+def test_cli_writes_every_report(tmp_path):
+    pytest.importorskip('matplotlib')
+    pytest.importorskip('yaml')
+
+    subprocess.run([sys.executable, str(SCRIPT), str(MOCKUP_PATH), '--out', str(tmp_path)],
+                   check=True, capture_output=True)
+
+    for name in analysis.REPORTS:
+        assert (tmp_path / f'{name}.csv').exists()
+    assert (tmp_path / 'battery.png').exists()
+    assert (tmp_path / 'grouped_entities_by_category.yaml').exists()
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from battery_forecast import MIN_SAMPLES, fit_drain, forecast_table
+
+
+def test_fit_matches_polyfit_per_row():
+    rng = np.random.default_rng(17)
+    times = np.arange(400) * 0.5 + 1e4
+    levels = 90 - rng.uniform(0.01, 0.3, size=(60, 1)) * np.arange(400) + rng.normal(0, 0.3, (60, 400))
+    levels[rng.random(levels.shape) < 0.2] = np.nan
+
+    drain = fit_drain(times, levels, chunk_cells=1000)
+
+    for row, rate in zip(levels, drain.rate):
+        valid = ~np.isnan(row)
+        assert rate == pytest.approx(np.polyfit(times[valid], row[valid], 1)[0], rel=1e-9)
+
+
+def test_only_the_last_discharge_is_fitted():
+    nan = np.nan
+    levels = np.array([
+        [50, 40, 30, 100, 98, 96, 94],      # recharged at column 3
+        [50, 40, nan, nan, 99, 97, 95],     # recharged across a gap
+        [80, 80, 80, 80, nan, 80, 80],      # not draining
+        [nan, nan, nan, nan, nan, 60, 50],  # too few samples
+        [nan] * 7,
+    ])
+    drain = fit_drain(np.arange(7.0), levels)
+
+    assert drain.rate[:2] == pytest.approx([-2, -2])
+    assert drain.samples.tolist() == [4, 3, 6, 2, 0]
+    assert drain.level[:2] == pytest.approx([94, 95])
+    assert drain.hours_to_empty[:3].tolist() == pytest.approx([47, 47.5, np.inf])
+    assert np.isnan(drain.rate[3:]).all() and np.isnan(drain.hours_to_empty[3:]).all()
+    assert drain.samples[3] < MIN_SAMPLES
+
+
+def test_forecast_table_is_sorted_soonest_first():
+    times = pd.date_range('2025-04-01', periods=4, freq='1h', tz='UTC')
+    levels = np.array([[80, 79, 78, 77], [10, 8, 6, 4], [50, 50, 50, 50]], dtype=float)
+
+    table = forecast_table(['sensor.slow', 'sensor.fast', 'sensor.flat'], times, levels)
+
+    assert table['Entity ID'].tolist() == ['sensor.fast', 'sensor.slow', 'sensor.flat']
+    assert table['Drain (%/day)'].tolist() == [48, 24, 0]
+    assert table['Hours to Empty'].tolist()[:2] == [2, 77]
+    assert table['Empty At'][0] == pd.Timestamp('2025-04-01T05:00', tz='UTC')
+    assert pd.isna(table['Empty At'][2])
+
+
+def test_forecast_batteries_from_history(tmp_path, capsys):
+    pytest.importorskip('pyarrow')
+    from battery_forecast import main
+    from history_store import HistoryStore, readings_frame
+
+    summaries = []
+    for hour in range(6):
+        ts = f'2025-04-01T{hour:02d}:30:00+00:00'
+        for entity_id, state in (('sensor.door_battery', 60 - 5 * hour),
+                                 ('sensor.phone_battery', 90 - hour),
+                                 ('sensor.hall_temperature', 20)):
+            summaries.append({'entity_id': entity_id, 'friendly_name': None,
+                              'device_class': None, 'state': str(state),
+                              'last_changed': ts, 'last_updated': ts})
+    HistoryStore(str(tmp_path)).append(readings_frame(summaries))
+
+    assert main([str(tmp_path), '--csv', '--within', '1']) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == 'Entity ID,Battery Level (%),Drain (%/day),Hours to Empty,Empty At,Samples'
+    assert len(lines) == 2 and lines[1].startswith('sensor.door_battery,35.0,120.0,7.0,')
+
+
+def test_chunked_forecast_matches_one_matrix(tmp_path):
+    pytest.importorskip('pyarrow')
+    from battery_forecast import forecast_batteries
+    from history_store import HistoryStore, readings_frame
+
+    summaries = []
+    for hour in range(8):
+        ts = f'2025-04-01T{hour:02d}:30:00+00:00'
+        for device in range(5):
+            # Devices report on different hours, so chunks get different time axes.
+            if hour % (device + 1) == 0:
+                summaries.append({'entity_id': f'sensor.d{device}_battery', 'friendly_name': None,
+                                  'device_class': None, 'state': str(90 - device * hour),
+                                  'last_changed': ts, 'last_updated': ts})
+        summaries.append({'entity_id': 'sensor.hall_temperature', 'friendly_name': None,
+                          'device_class': None, 'state': '20',
+                          'last_changed': ts, 'last_updated': ts})
+    store = HistoryStore(str(tmp_path))
+    store.append(readings_frame(summaries))
+
+    assert store.rollup_entity_ids('1h', '2025-04-01T06:00Z') == [
+        'sensor.d0_battery', 'sensor.d1_battery', 'sensor.d2_battery', 'sensor.hall_temperature']
+    whole = forecast_batteries(store)
+    assert len(whole) == 5
+    pd.testing.assert_frame_equal(forecast_batteries(store, chunk_devices=2), whole)
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+import entity_cache
+from entity_cache import EntityCache
+
+RECORDS = [{'entity_id': 'sensor.a', 'state': '1'}, {'entity_id': 'sensor.b', 'state': '2'}]
+
+
+@pytest.fixture
+def dump(tmp_path):
+    path = tmp_path / 'dump.json'
+    path.write_text('[]')
+    return path
+
+
+@pytest.fixture
+def cache(tmp_path):
+    with EntityCache(tmp_path / 'cache') as cache:
+        yield cache
+
+
+def _produce(path):
+    return iter(RECORDS)
+
+
+def test_second_read_is_a_hit(cache, dump):
+    assert list(cache.records(dump, 'summary', _produce)) == RECORDS
+    assert list(cache.records(dump, 'summary', lambda path: pytest.fail('re-parsed'))) == RECORDS
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_touch_keeps_entry_but_new_content_misses(cache, dump):
+    list(cache.records(dump, 'summary', _produce))
+
+    os.utime(dump, ns=(0, 0))
+    assert cache.lookup(dump, 'summary') is not None
+
+    dump.write_text('[ ]')
+    assert cache.lookup(dump, 'summary') is None
+
+
+def test_parser_version_and_kind_are_part_of_the_key(cache, dump, monkeypatch):
+    list(cache.records(dump, 'summary', _produce))
+
+    assert cache.lookup(dump, 'entities') is None
+    monkeypatch.setattr(entity_cache, 'PARSER_VERSION', entity_cache.PARSER_VERSION + 1)
+    assert cache.lookup(dump, 'summary') is None
+
+
+def test_partial_read_is_not_cached(cache, dump):
+    records = cache.records(dump, 'summary', _produce)
+    next(records)
+    records.close()
+
+    assert cache.lookup(dump, 'summary') is None
+    assert [name for name in os.listdir(cache.cache_dir) if name != 'index.sqlite'] == []
+
+
+def test_rebuild_ignores_existing_entries(tmp_path, dump):
+    with EntityCache(tmp_path / 'cache') as cache:
+        list(cache.records(dump, 'summary', _produce))
+    with EntityCache(tmp_path / 'cache', rebuild=True) as cache:
+        assert cache.lookup(dump, 'summary') is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    paths = []
+    for name in 'abc':
+        path = tmp_path / f'{name}.json'
+        path.write_text('[]')
+        paths.append(path)
+
+    with EntityCache(tmp_path / 'cache') as cache:
+        list(cache.records(paths[0], 'summary', _produce))
+        blob_size = os.path.getsize(cache.lookup(paths[0], 'summary'))
+        cache.max_bytes = 2 * blob_size
+        list(cache.records(paths[1], 'summary', _produce))
+        cache.lookup(paths[0], 'summary')  # a is now more recent than b
+        list(cache.records(paths[2], 'summary', _produce))
+
+        assert cache.lookup(paths[0], 'summary') is not None
+        assert cache.lookup(paths[1], 'summary') is None
+        assert cache.lookup(paths[2], 'summary') is not None
@@ -0,0 +1,71 @@
+import io
+import json
+
+import pytest
+
+from entity_parser import EntityParseError, iter_entities, load_entities, parse_entities
+from synthetic import MOCKUP_PATH, js_dump, synthetic_entities
+
+
+def test_parses_every_entity_in_the_mockup():
+    entities = load_entities(MOCKUP_PATH)
+
+    assert len(entities) == 437
+    assert entities[0]['entity_id'] == 'person.makerspace'
+    assert entities[0]['attributes']['friendly_name'] == 'MakerSpace'
+    assert entities[0]['context']['parent_id'] is None
+    assert entities[-1]['state'] == 'unavailable'
+
+
+def test_js_literal_and_minified_json_agree():
+    entities = list(synthetic_entities(50))
+
+    from_js = parse_entities(js_dump(entities))
+    from_json = parse_entities(json.dumps(entities, separators=(',', ':')))
+
+    assert from_js == entities
+    assert from_json == entities
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 4, 7, 14, 28, 4096])
+def test_tokens_split_across_chunks(chunk_size):
+    text = js_dump(list(synthetic_entities(20)))
+
+    assert list(iter_entities(io.StringIO(text), chunk_size=chunk_size)) == parse_entities(text)
+    # A cut after "e" or "e-" leaves a shorter number that still matches.
+    exponents = '[{entity_id: "a.b", v: -2.5e3, w: 1E-2, x: 12}]'
+    assert list(iter_entities(io.StringIO(exponents), chunk_size=chunk_size)) == [
+        {'entity_id': 'a.b', 'v': -2500.0, 'w': 0.01, 'x': 12}]
+
+
+def test_strings_comments_and_escapes():
+    text = '''
+    // leading comment
+    export const ROOM_ENTITY_MAP = [
+      {
+        entity_id: "sensor.a", /* inline } comment */
+        state: 'it\\'s "on"',
+        attributes: { friendly_name: "Brace } in \\"name\\"", tags: [1, -2.5e3, true, null], },
+      },
+    ];
+    '''
+    (entity,) = parse_entities(text)
+
+    assert entity['state'] == 'it\'s "on"'
+    assert entity['attributes']['friendly_name'] == 'Brace } in "name"'
+    assert entity['attributes']['tags'] == [1, -2500.0, True, None]
+
+
+def test_group_attributes_with_entity_id_lists_stay_nested():
+    text = json.dumps({'states': [
+        {'entity_id': 'group.lights', 'state': 'on', 'attributes': {'entity_id': ['light.a', 'light.b']}},
+    ]})
+
+    (entity,) = parse_entities(text)
+
+    assert entity['attributes']['entity_id'] == ['light.a', 'light.b']
+
+
+def test_unbalanced_input_raises():
+    with pytest.raises(EntityParseError):
+        parse_entities('[{entity_id: "a.b"}]]')
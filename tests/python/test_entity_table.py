@@ -0,0 +1,35 @@
+from entity_parser import parse_entities
+from entity_table import COLUMNS, build_entity_table
+
+
+def test_table_layout_and_dtypes():
+    table = build_entity_table(parse_entities('''[
+      { entity_id: "sensor.phone_battery_level", state: "60 %",
+        attributes: { unit_of_measurement: "%", device_class: "battery", friendly_name: "Phone Battery" },
+        last_changed: "2025-04-05T08:48:19.604560+00:00" },
+      { entity_id: "device_tracker.phone", state: "home",
+        attributes: { latitude: 52.5, longitude: 13.4 } },
+      { entity_id: "light.desk" },
+    ]'''))
+
+    assert tuple(table.columns) == COLUMNS
+    assert table['domain'].dtype == 'category'
+    assert table['state'].dtype == 'category'
+    assert table['numeric_state'].tolist()[0] == 60.0
+    assert table['numeric_state'].isna().tolist() == [False, True, True]
+    assert table.loc[0, 'unit'] == '%'
+    assert table.loc[0, 'device_class'] == 'battery'
+    assert table.loc[0, 'last_changed'].year == 2025
+    assert table.loc[1, ['lat', 'lon']].tolist() == [52.5, 13.4]
+    assert table['object_id'].tolist() == ['phone_battery_level', 'phone', 'desk']
+
+
+def test_numeric_state_handles_units_and_garbage():
+    table = build_entity_table(parse_entities('''[
+      { entity_id: "sensor.a", state: "60%" },
+      { entity_id: "sensor.b", state: "1200 steps" },
+      { entity_id: "sensor.c", state: "unavailable" },
+      { entity_id: "sensor.d" },
+    ]'''))
+
+    assert table['numeric_state'].fillna(-1).tolist() == [60.0, 1200.0, -1, -1]
@@ -0,0 +1,55 @@
+from entity_parser import parse_entities
+from entity_table import build_entity_table
+from entity_tags import TAGS, JoinedColumn, tagged
+
+
+def _tags(source):
+    table = build_entity_table(parse_entities(source))
+    return {entity_id: {tag for tag in TAGS if tagged(table, tag)[row]}
+            for row, entity_id in enumerate(table['entity_id'])}
+
+
+def test_each_tag_follows_its_rule():
+    assert _tags('''[
+      { entity_id: "sensor.phone_battery_level", state: "60" },
+      { entity_id: "sensor.phone_Steps", state: "1200", attributes: { friendly_name: "Phone Steps" } },
+      { entity_id: "sensor.phone_bssid", state: "aa:bb" },
+      { entity_id: "binary_sensor.mac_camera", state: "off" },
+      { entity_id: "binary_sensor.mac_focus", state: "on", attributes: { friendly_name: "Mac Focus" } },
+      { entity_id: "light.desk", state: "unavailable", attributes: { friendly_name: "Desk" } },
+      { entity_id: "device_tracker.phone", state: "home",
+        attributes: { latitude: 52.5, longitude: 13.4 } },
+    ]''') == {
+        'sensor.phone_battery_level': {'battery'},
+        'sensor.phone_Steps': {'activity'},
+        'sensor.phone_bssid': {'connectivity'},
+        'binary_sensor.mac_camera': {'av'},
+        'binary_sensor.mac_focus': {'av', 'alert'},
+        'light.desk': {'alert'},
+        'device_tracker.phone': {'gps'},
+    }
+
+
+def test_rules_respect_domain_suffix_and_required_fields():
+    assert _tags('''[
+      { entity_id: "binary_sensor.phone_steps", state: "on" },
+      { entity_id: "sensor.mac_camera", state: "on" },
+      { entity_id: "sensor.ssid_strength", state: "3" },
+      { entity_id: "light.idle_lamp", state: "idle" },
+      { entity_id: "switch.plain" },
+    ]''') == {
+        'binary_sensor.phone_steps': set(),
+        'sensor.mac_camera': set(),
+        'sensor.ssid_strength': set(),
+        'light.idle_lamp': set(),  # alert needs a friendly name too
+        'switch.plain': set(),
+    }
+
+
+def test_case_insensitive_rows_survive_lowering_that_changes_length():
+    # 'İ'.lower() is two code points, shifting every later value in the buffer.
+    column = JoinedColumn(['İİİİİİİİİİ', 'Lamp b7', 'Other'])
+
+    assert column.rows(('b7',), ignore_case=True).tolist() == [1]
+    assert column.rows(('other',), ignore_case=True).tolist() == [2]
+    assert column.rows(('Lamp',)).tolist() == [1]
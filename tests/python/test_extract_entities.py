@@ -0,0 +1,119 @@
+import gzip
+import io
+import json
+
+import pytest
+
+from extract_entities import (
+    expand_paths, extract_entities, extract_many, iter_extract_entities, main, write_json_array,
+    write_ndjson,
+)
+from synthetic import MOCKUP_PATH, mockup_entities
+
+
+def test_streams_one_entity_at_a_time():
+    entities = iter_extract_entities(MOCKUP_PATH)
+
+    assert next(entities) == {
+        'entity_id': 'person.makerspace',
+        'id': 'makerspace',
+        'friendly_name': 'MakerSpace',
+        'device_class': None,
+        'state': 'unknown',
+        'last_changed': '2025-04-05T08:48:11.664713+00:00',
+        'last_updated': '2025-04-05T08:48:26.899371+00:00',
+    }
+
+
+def test_layout_does_not_matter(tmp_path):
+    pretty = extract_entities(MOCKUP_PATH)
+    minified = tmp_path / 'states.json'
+    minified.write_text(json.dumps(mockup_entities(), separators=(',', ':')))
+
+    assert len(pretty) == len(mockup_entities())
+    assert extract_entities(minified) == pretty
+
+
+def test_braces_and_quotes_inside_strings(tmp_path):
+    dump = tmp_path / 'dump.js'
+    dump.write_text('[{entity_id: "sensor.a", state: "} {", attributes: {friendly_name: "A \\"}\\" b", '
+                    'device_class: "battery"}, last_changed: "t"}, {entity_id: "sensor.b", state: "1"}]')
+
+    assert extract_entities(dump) == [
+        {'entity_id': 'sensor.a', 'id': None, 'friendly_name': 'A "}" b',
+         'device_class': 'battery', 'state': '} {', 'last_changed': 't', 'last_updated': None},
+        {'entity_id': 'sensor.b', 'id': None, 'friendly_name': None,
+         'device_class': None, 'state': '1', 'last_changed': None, 'last_updated': None},
+    ]
+
+
+def test_reads_gzip_input(tmp_path):
+    compressed = tmp_path / 'dump.js.gz'
+    compressed.write_bytes(gzip.compress(MOCKUP_PATH.read_bytes()))
+
+    assert extract_entities(compressed) == extract_entities(MOCKUP_PATH)
+
+
+def test_reads_zstd_input(tmp_path):
+    zstandard = pytest.importorskip('zstandard')
+    compressed = tmp_path / 'dump.js.zst'
+    compressed.write_bytes(zstandard.ZstdCompressor().compress(MOCKUP_PATH.read_bytes()))
+
+    assert extract_entities(compressed) == extract_entities(MOCKUP_PATH)
+
+
+def test_ndjson_and_array_output_match_json_dumps():
+    entities = extract_entities(MOCKUP_PATH)
+
+    ndjson, array = io.StringIO(), io.StringIO()
+    write_ndjson(iter(entities), ndjson)
+    write_json_array(iter(entities), array)
+
+    assert [json.loads(line) for line in ndjson.getvalue().splitlines()] == entities
+    assert array.getvalue() == json.dumps(entities, indent=2, ensure_ascii=False) + '\n'
+
+    empty = io.StringIO()
+    write_json_array(iter([]), empty)
+    assert empty.getvalue() == '[]\n'
+
+
+def _snapshot(path, entities):
+    path.write_text(json.dumps(entities))
+    return path
+
+
+def test_extract_many_keeps_newest_and_sorts(tmp_path):
+    old = {'entity_id': 'sensor.b', 'state': 'old', 'last_updated': '2025-04-05T08:00:00+00:00'}
+    new = {'entity_id': 'sensor.b', 'state': 'new', 'last_updated': '2025-04-06T08:00:00+00:00'}
+    only = {'entity_id': 'sensor.a', 'state': '1', 'last_updated': '2025-04-05T08:00:00+00:00'}
+    # The newer record sits in the file that sorts first, so order alone cannot win.
+    _snapshot(tmp_path / 'day1.json', [new])
+    _snapshot(tmp_path / 'day2.json', [old, only])
+
+    for workers in (1, 2):
+        merged = extract_many(expand_paths([str(tmp_path)]), workers=workers)
+        assert [(e['entity_id'], e['state']) for e in merged] == [('sensor.a', '1'), ('sensor.b', 'new')]
+
+
+def test_expand_paths_accepts_directories_and_globs(tmp_path):
+    for name in ('a.json', 'b.js.gz', 'notes.txt'):
+        (tmp_path / name).write_text('[]')
+
+    assert expand_paths([str(tmp_path)]) == [str(tmp_path / 'a.json'), str(tmp_path / 'b.js.gz')]
+    assert expand_paths([str(tmp_path / '*.json')]) == [str(tmp_path / 'a.json')]
+
+
+def test_cli_writes_merged_ndjson_and_parquet(tmp_path):
+    _snapshot(tmp_path / 'one.json', mockup_entities()[:10])
+    _snapshot(tmp_path / 'two.json', mockup_entities()[5:20])
+    out = tmp_path / 'merged.ndjson'
+
+    main([str(tmp_path / '*.json'), '--workers', '2', '--out', str(out)])
+
+    lines = [json.loads(line) for line in out.read_text().splitlines()]
+    assert [e['entity_id'] for e in lines] == sorted(e['entity_id'] for e in mockup_entities()[:20])
+
+    pd = pytest.importorskip('pandas')
+    pytest.importorskip('pyarrow')
+    main([str(tmp_path / '*.json'), '--out', str(tmp_path / 'merged.parquet')])
+    assert list(pd.read_parquet(tmp_path / 'merged.parquet')['entity_id']) == [e['entity_id'] for e in lines]
@@ -0,0 +1,286 @@
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip('bs4')
+
+import fix_json_attributes  # noqa: E402
+from bs4 import BeautifulSoup  # noqa: E402
+from fix_json_attributes import (  # noqa: E402
+    NormalizationCache, clean_json_string, fix_html_files, has_target_tags,
+    html_parser_name, locate_target_attributes, normalize_json_value, process_html_file,
+)
+from synthetic import REPO_ROOT  # noqa: E402
+
+POSTER = REPO_ROOT / 'poster-test' / 'design-system-poster.html'
+
+BROKEN = '''<!DOCTYPE html>
+<html><body>
+<sticky-note items='[ "a", /* drop me */ "b" ]'></sticky-note>
+<tech-diagram nodes='[{"id": 1}]' connections='[]'></tech-diagram>
+<p class="sticky-note">not a target</p>
+</body></html>
+'''
+
+# The block-comment regex clean_json_string used before it became string-aware.
+OLD_BLOCK_COMMENT_REGEX = re.compile(r'/\*.*?\*/', re.DOTALL)
+
+STRING_PIECES = ('a', ' ', '/', '*', ',', ']', '}', '"', '\\', '/*', '*/', '//', 'http://x', '\n')
+BLOCK_COMMENTS = ('/**/', '/* c */', '/* , ] */', '/* // */', '/*\n*/')
+LINE_COMMENTS = ('// c\n', '// /* ]\n', '//\n')
+
+
+def _random_string(rng, pieces):
+    return ''.join(rng.choice(pieces) for _ in range(rng.randrange(6)))
+
+
+def _random_value(rng, depth=0, pieces=STRING_PIECES):
+    kind = rng.randrange(6 if depth < 3 else 4)
+    if kind == 0:
+        return _random_string(rng, pieces)
+    if kind == 1:
+        return rng.choice([0, -1.5, 10 ** 20, True, None])
+    if kind in (2, 3):
+        return rng.choice(['', 'plain', 'a/b'])
+    if kind == 4:
+        return [_random_value(rng, depth + 1, pieces) for _ in range(rng.randrange(4))]
+    return {_random_string(rng, pieces): _random_value(rng, depth + 1, pieces)
+            for _ in range(rng.randrange(4))}
+
+
+def _noisy_json(value, rng, comments, trailing_commas):
+    """``value`` as JSON with random whitespace, comments and trailing commas."""
+    def gap():
+        return ''.join(rng.choice(('', ' ', '\n') + comments) for _ in range(rng.randrange(3)))
+
+    if isinstance(value, (list, dict)):
+        if isinstance(value, list):
+            items = [_noisy_json(item, rng, comments, trailing_commas) for item in value]
+        else:
+            items = [json.dumps(key) + gap() + ':' + gap() +
+                     _noisy_json(item, rng, comments, trailing_commas) for key, item in value.items()]
+        body = ','.join(gap() + item + gap() for item in items)
+        if items and trailing_commas and rng.random() < 0.5:
+            body += ',' + gap()
+        opening, closing = '[]' if isinstance(value, list) else '{}'
+        return opening + body + closing
+    return json.dumps(value)
+
+
+def test_prescan_only_matches_opening_target_tags():
+    assert has_target_tags('<floor-plan rooms="[]"></floor-plan>')
+    assert has_target_tags('<STICKY-NOTE>')
+    assert not has_target_tags('<div class="sticky-note"></div>')
+    assert not has_target_tags('<sticky-notes></sticky-notes>')
+
+
+@pytest.mark.parametrize('parser', ['html.parser', html_parser_name()])
+def test_fixes_every_target_tag_in_one_pass(tmp_path, parser):
+    page = tmp_path / 'page.html'
+    page.write_text(BROKEN)
+
+    _, status, lines = process_html_file(str(page), parser)
+
+    assert status == 'updated'
+    assert '  Found 1 <sticky-note> elements.' in lines
+    assert '  Found 1 <tech-diagram> elements.' in lines
+    fixed = page.read_text()
+    assert 'items=\'["a","b"]\'' in fixed
+    assert 'nodes=\'[{"id":1}]\'' in fixed
+
+
+def test_batch_mode_reports_per_status(tmp_path, capsys):
+    shutil.copy(POSTER, tmp_path / 'poster.html')
+    (tmp_path / 'broken.html').write_text(BROKEN)
+    (tmp_path / 'plain.html').write_text('<html><body>nothing here</body></html>')
+    paths = [str(tmp_path / name) for name in ('broken.html', 'plain.html', 'poster.html', 'gone.html')]
+
+    counts = fix_html_files(paths, workers=2)
+
+    assert counts == {'updated': 1, 'unchanged': 1, 'skipped': 1, 'error': 1}
+    assert (tmp_path / 'poster.html').read_bytes() == POSTER.read_bytes()
+    out = capsys.readouterr().out
+    assert out.index('broken.html') < out.index('plain.html') < out.index('poster.html')
+
+
+def test_only_changed_values_are_rewritten(tmp_path):
+    original = ('<!doctype html>\r\n<BODY   class=x>\r\n'
+                '<!-- <sticky-note items="[1, /* not a tag */ 2]"> -->\r\n'
+                '<Sticky-Note  data-x = y items = "[ &quot;a&quot; /* c */ ]" ></Sticky-Note>\r\n'
+                '<floor-plan rooms=\'[]\'></floor-plan><br>\r\n')
+    page = tmp_path / 'page.html'
+    page.write_bytes(original.encode())
+
+    _, status, _ = process_html_file(str(page))
+
+    assert status == 'updated'
+    assert page.read_bytes() == original.replace(
+        '"[ &quot;a&quot; /* c */ ]"', '\'["a"]\'').encode()
+    assert [name for name in os.listdir(tmp_path)] == ['page.html']
+
+
+def test_locator_reads_attributes_like_the_tokenizer():
+    html = ('<script><sticky-note items="x"></script>'
+            '<sticky-note ]\'="" data-items=[1] items=\'[2]\'>'
+            '<sticky-note items=[1] items=\'[2]\'>')
+    located = locate_target_attributes(html)
+
+    assert len(located) == 2
+    start, end, quote = located[0][1]['items']
+    assert (html[start:end], quote) == ('[2]', "'")
+    # Parsers disagree on which duplicate wins, so neither span is used.
+    assert located[1][1] == {'items': None}
+
+
+@pytest.mark.parametrize('parser', ['html.parser', html_parser_name()])
+def test_duplicate_attributes_are_fixed_as_the_parser_reads_them(tmp_path, parser):
+    page = tmp_path / 'page.html'
+    page.write_text("<floor-plan rooms='[1, ]' rooms='[2, ]'></floor-plan>")
+
+    _, status, lines = process_html_file(str(page), parser)
+
+    assert status == 'updated'
+    assert any('re-serializing' in line for line in lines)
+    fixed = BeautifulSoup(page.read_text(), parser).find('floor-plan')['rooms']
+    assert normalize_json_value(fixed) == ('same', None)
+
+
+def test_reserializing_keeps_fragments_and_comments_in_place(tmp_path):
+    page = tmp_path / 'page.html'
+    page.write_text('<!-- header -->\n<floor-plan rooms="[1, ]" rooms="[1, ]"></floor-plan>\n<p>x</p>\n')
+
+    assert process_html_file(str(page))[1] == 'updated'
+    assert page.read_text() == '<!-- header -->\n<floor-plan rooms="[1]"></floor-plan>\n<p>x</p>\n'
+
+
+def test_unchanged_files_are_not_rewritten(tmp_path):
+    page = tmp_path / 'poster.html'
+    shutil.copy(POSTER, page)
+    os.utime(page, ns=(0, 0))
+
+    assert process_html_file(str(page))[1] == 'unchanged'
+    assert page.stat().st_mtime_ns == 0
+
+
+def test_falls_back_to_reserializing_when_offsets_disagree(tmp_path, monkeypatch):
+    page = tmp_path / 'page.html'
+    page.write_text(BROKEN)
+    monkeypatch.setattr(fix_json_attributes, 'locate_target_attributes', lambda html: [])
+
+    _, status, lines = process_html_file(str(page), 'html.parser')
+
+    assert status == 'updated'
+    assert any('re-serializing' in line for line in lines)
+    assert 'items=\'["a","b"]\'' in page.read_text()
+
+
+def test_offset_mismatch_without_fixes_leaves_the_file_alone(tmp_path):
+    # html.parser reads the tag inside <title>; the locator skips raw-text elements.
+    html = '<title><floor-plan rooms="[1]"></title>\n<p   class=a>x</p>\n'
+    page = tmp_path / 'page.html'
+    page.write_text(html)
+    os.utime(page, ns=(0, 0))
+
+    _, status, lines = process_html_file(str(page), 'html.parser')
+
+    assert status == 'unchanged'
+    assert not any('re-serializing' in line for line in lines)
+    assert page.read_text() == html
+    assert page.stat().st_mtime_ns == 0
+
+
+def test_check_mode_reports_without_writing(tmp_path):
+    page = tmp_path / 'page.html'
+    page.write_text(BROKEN)
+    script = REPO_ROOT / 'poster-test' / 'fix_json_attributes.py'
+
+    result = subprocess.run([sys.executable, str(script), '--check', str(page)],
+                            capture_output=True, text=True)
+
+    assert result.returncode == 1
+    assert 'Would update JSON' in result.stdout
+    assert page.read_text() == BROKEN
+
+
+def test_normalization_cache_persists_results_and_errors(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    values = ['[ 1, /* c */ 2 ]', '[1,2]', '{bad', '/* only */', '[ 1, /* c */ 2 ]']
+    cache = NormalizationCache(path)
+    first = [cache.normalize(value) for value in values]
+    cache.close()
+
+    assert first == [normalize_json_value(value) for value in values]
+    assert [outcome for outcome, _ in first] == ['fixed', 'same', 'invalid', 'empty', 'fixed']
+    assert (cache.hits, cache.misses) == (1, 4)
+
+    cache = NormalizationCache(path)
+    assert [cache.normalize(value) for value in values] == first
+    assert (cache.hits, cache.misses) == (5, 0)
+    cache.close()
+
+
+def test_normalization_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    path = str(tmp_path / 'cache.sqlite')
+    clock = iter(range(100))
+    monkeypatch.setattr(fix_json_attributes.time, 'time', lambda: next(clock))
+    monkeypatch.setattr(fix_json_attributes, 'CACHE_TOUCH_AFTER', 0)
+    cache = NormalizationCache(path, max_entries=2)
+    for value in ('[1]', '[2]', '[3]'):
+        cache.normalize(value)
+        cache.flush()
+    cache.normalize('[1]')
+    cache.close()
+
+    cache = NormalizationCache(path)
+    evicted = []
+    for value in ('[1]', '[2]', '[3]'):
+        misses = cache.misses
+        cache.normalize(value)
+        evicted.append(cache.misses > misses)
+    assert evicted == [False, True, False]
+    cache.close()
+
+
+def test_batch_mode_reports_cache_hit_rate(tmp_path, capsys):
+    for name in ('a.html', 'b.html'):
+        (tmp_path / name).write_text(BROKEN)
+
+    fix_html_files([str(tmp_path / 'a.html')], workers=1)
+    fix_html_files([str(tmp_path / 'b.html')], workers=1)
+
+    summaries = [line for line in capsys.readouterr().out.splitlines()
+                 if line.startswith('JSON cache:')]
+    assert summaries == ['JSON cache: 0 hits, 3 misses (0% hit rate).',
+                         'JSON cache: 3 hits, 0 misses (100% hit rate).']
+
+
+def test_comment_stripper_keeps_string_contents():
+    assert clean_json_string('{"url": "/*/path", "u": "http://x"} // note') == \
+        '{"url": "/*/path", "u": "http://x"}'
+    assert clean_json_string('[1, // one\n 2, /* two */ ]') == '[1, \n 2  ]'
+    assert clean_json_string('{"a": [1,],\n}') == '{"a": [1]\n}'
+    assert clean_json_string('[1, "x,]", /* open') == '[1, "x,]", /* open'
+
+
+def test_comment_stripper_fuzz():
+    rng = random.Random(15)
+    for _ in range(2000):
+        value = _random_value(rng)
+        noisy = _noisy_json(value, rng, BLOCK_COMMENTS + LINE_COMMENTS, trailing_commas=True)
+        assert json.loads(clean_json_string(noisy)) == value, noisy
+
+
+def test_comment_stripper_matches_old_regex_where_it_was_right():
+    # Block comments only, and no comment markers inside strings.
+    rng = random.Random(16)
+    pieces = tuple(piece for piece in STRING_PIECES if piece not in ('/*', '*/', '//', '/', '*'))
+    for _ in range(2000):
+        noisy = _noisy_json(_random_value(rng, pieces=pieces), rng, BLOCK_COMMENTS,
+                            trailing_commas=False)
+        assert clean_json_string(noisy) == OLD_BLOCK_COMMENT_REGEX.sub('', noisy).strip(), noisy
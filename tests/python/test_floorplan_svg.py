@@ -0,0 +1,54 @@
+import io
+from xml.dom.minidom import parseString
+
+import analysis
+from floorplan_svg import FloorplanTemplate, load_room_positions
+from synthetic import MOCKUP_PATH
+
+
+def _texts(svg):
+    doc = parseString(svg)
+    return {group.getAttribute('id'): group.getElementsByTagName('text')[0]
+            for group in doc.getElementsByTagName('g')}
+
+
+def test_positioned_rooms_are_labelled_in_place():
+    positions = load_room_positions()
+    assert positions['kitchen'][:2] == (851.44, 427.34)
+    template = FloorplanTemplate(positions)
+
+    svg = template.render({'kitchen': ['Fridge <door>', 'Oven & hob'], 'a.5': ['Desk'],
+                           'b.4': []})
+
+    texts = _texts(svg)
+    assert texts['kitchen_annotated'].firstChild.data == 'kitchen: Fridge <door>, Oven & hob'
+    assert texts['kitchen_annotated'].getAttribute('y') == '427.34'
+    assert [texts[room].getAttribute('y') for room in ('a.5_annotated', 'b.4_annotated')] == [
+        '100', '160']
+    assert texts['b.4_annotated'].firstChild.data == 'b.4: '
+
+    stream = io.StringIO()
+    assert template.render({'kitchen': ['Fridge <door>', 'Oven & hob'], 'a.5': ['Desk'],
+                            'b.4': []}, stream) is None
+    assert stream.getvalue() == svg
+
+
+def test_svg_ids_choose_rooms_and_element_ids():
+    # "a.1" finds the "a1" position; "b.9" has no sensors but is still listed.
+    svg = FloorplanTemplate(load_room_positions(), {'a.1': 'room_a1', 'b.9': 'room_b9'}).render(
+        {'a.1': ['Lamp'], 'c.3': ['Ignored']})
+
+    texts = _texts(svg)
+    assert sorted(texts) == ['room_a1_annotated', 'room_b9_annotated']
+    assert texts['room_a1_annotated'].getAttribute('y') == '1035.02'
+    assert texts['room_b9_annotated'].firstChild.data == 'b.9: '
+
+
+def test_analysis_writes_the_resolved_floorplan(tmp_path):
+    out = tmp_path / 'out'
+    assert analysis.main([str(MOCKUP_PATH), '--out', str(out), '--report', 'rooms',
+                          '--floorplan', '--no-cache']) == 0
+
+    texts = _texts((out / 'annotated_floorplan.svg').read_text(encoding='utf-8'))
+    assert 'B.7 Temperature' in texts['b.7_annotated'].firstChild.data
+    assert texts['b.7_annotated'].getAttribute('x') == '10'
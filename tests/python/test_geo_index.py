@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from entity_parser import parse_entities
+from entity_table import build_entity_table
+from geo_index import GeoIndex, main, query_point, site_location
+from synthetic import MOCKUP_PATH
+
+SITE = (52.467, 13.45)
+
+
+def _points(count, seed):
+    rng = np.random.default_rng(seed)
+    # A dense cluster on campus plus stragglers across the city.
+    lats = np.concatenate([rng.normal(SITE[0], 0.001, count // 2),
+                           rng.uniform(52.3, 52.7, count - count // 2)])
+    lons = np.concatenate([rng.normal(SITE[1], 0.002, count // 2),
+                           rng.uniform(13.1, 13.8, count - count // 2)])
+    return [f'device_tracker.t{i}' for i in range(count)], lats, lons
+
+
+def _brute_distances(index, lats, lons, lat, lon):
+    x, y = index.project(lats, lons)
+    px, py = index.project(lat, lon)
+    return np.hypot(x - px, y - py)
+
+
+def test_queries_match_brute_force():
+    ids, lats, lons = _points(5000, 18)
+    lats[:10] = np.nan
+    index = GeoIndex(ids, lats, lons, origin=SITE)
+    assert len(index) == 4990
+    ids = np.asarray(ids, dtype=object)
+
+    for lat, lon, radius in ((52.467, 13.45, 150), (52.5, 13.3, 2000), (53.5, 13.45, 1000)):
+        distances = _brute_distances(index, lats, lons, lat, lon)
+        hits = index.within(lat, lon, radius)
+        assert set(hits.entity_ids) == set(ids[distances <= radius])
+        assert (np.diff(hits.distances) >= 0).all()
+
+        nearest = index.nearest(lat, lon, 7)
+        expected = np.sort(distances[~np.isnan(distances)])[:7]
+        assert nearest.distances == pytest.approx(expected)
+
+    square = [(52.466, 13.448), (52.468, 13.448), (52.468, 13.452), (52.466, 13.452)]
+    inside = set(index.inside(square).entity_ids)
+    expected = (lats > 52.466) & (lats < 52.468) & (lons > 13.448) & (lons < 13.452)
+    assert inside == set(ids[expected])
+    # A concave geofence: the notch of the "U" stays outside.
+    u_shape = [(52.46, 13.44), (52.47, 13.44), (52.47, 13.445), (52.465, 13.445),
+               (52.465, 13.455), (52.47, 13.455), (52.47, 13.46), (52.46, 13.46)]
+    notch = (lats > 52.4655) & (lats < 52.4695) & (lons > 13.4455) & (lons < 13.4545)
+    assert notch.any()
+    assert set(index.inside(u_shape).entity_ids).isdisjoint(ids[notch])
+
+
+def test_small_and_empty_indexes():
+    empty = GeoIndex([], [], [], origin=SITE)
+    assert len(empty.within(*SITE, 1000).entity_ids) == 0
+    assert len(empty.nearest(*SITE, 3).entity_ids) == 0
+
+    one = GeoIndex(['device_tracker.a'], [52.5], [13.4], origin=SITE)
+    assert one.nearest(*SITE, 3).entity_ids.tolist() == ['device_tracker.a']
+    assert one.within(52.5, 13.4, 0).entity_ids.tolist() == ['device_tracker.a']
+
+
+def test_site_location_and_query_points(monkeypatch):
+    assert site_location() == SITE
+    assert query_point('52.5,13.4') == (52.5, 13.4)
+    with pytest.raises(ValueError):
+        query_point('library')
+    monkeypatch.setenv('VITE_SITE_LAT', '40.7128')
+    assert query_point('site') == (40.7128, 13.45)
+
+
+def test_index_from_table_and_cli(capsys):
+    table = build_entity_table(parse_entities(MOCKUP_PATH.read_text(encoding='utf-8')))
+    index = GeoIndex.from_table(table)
+    assert 'device_tracker.xxx_xxx_x_x' in index.entity_ids
+
+    assert main([str(MOCKUP_PATH), '--nearest', '1', '--no-cache']) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split() == ['Entity', 'ID', 'Distance', '(m)']
+    assert lines[1].split()[0] == index.nearest(*SITE, 1).entity_ids[0]
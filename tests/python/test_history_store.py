@@ -0,0 +1,113 @@
+import glob
+import json
+
+import pytest
+
+pytest.importorskip('pyarrow')
+
+import analysis  # noqa: E402
+from history_store import HistoryStore, main, readings_frame  # noqa: E402
+from synthetic import MOCKUP_PATH, mockup_entities  # noqa: E402
+
+
+def _readings(rows):
+    """A readings_frame from ``(entity_id, iso ts, state)`` tuples."""
+    return readings_frame({'entity_id': entity_id, 'friendly_name': entity_id.split('.')[1],
+                           'device_class': None, 'state': state, 'last_changed': ts,
+                           'last_updated': ts} for entity_id, ts, state in rows)
+
+
+def _snapshot(path, minutes, levels):
+    entities = []
+    for entity in mockup_entities():
+        entity = json.loads(json.dumps(entity))
+        if entity['entity_id'] in levels:
+            entity['state'] = levels[entity['entity_id']]
+            entity['last_updated'] = f'2025-04-09T10:{minutes:02d}:00+00:00'
+        entities.append(entity)
+    path.write_text(json.dumps(entities))
+
+
+def test_ingest_is_incremental(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history'))
+    _snapshot(tmp_path / '1.json', 0, {'sensor.ewelink_ms01_battery': '40'})
+    _snapshot(tmp_path / '2.json', 20, {'sensor.ewelink_ms01_battery': '35'})
+
+    assert store.append_dump(str(MOCKUP_PATH)) == len(mockup_entities())
+    assert store.append_dump(str(tmp_path / '1.json')) == 1
+    assert store.append_dump(str(tmp_path / '2.json')) == 1
+    assert store.append_dump(str(tmp_path / '2.json')) == 0
+
+    battery = store.readings(entity_ids=['sensor.ewelink_ms01_battery'])
+    assert battery['state'].tolist()[-2:] == ['40', '35']
+    assert battery['numeric_state'].tolist()[-2:] == [40.0, 35.0]
+    assert store.readings(start='2025-04-09T10:10', end='2025-04-09T10:20').empty
+    assert len(store.readings(start='2025-04-09T10:10')) == 1
+
+
+def test_rollups_merge_parts_and_survive_compaction(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    store.append(_readings([('sensor.a', '2025-01-01T00:00:10Z', '1'),
+                            ('sensor.a', '2025-01-01T00:14:00Z', '5'),
+                            ('sensor.b', '2025-01-01T00:00:00Z', 'on')]))
+    store.append(_readings([('sensor.a', '2025-01-01T00:14:30Z', '3 %'),
+                            ('sensor.a', '2025-01-01T00:15:00Z', '9'),
+                            ('sensor.a', '2025-01-02T23:59:59Z', '7')]))
+
+    def rollups():
+        return {frequency: store.rollup(frequency, entity_ids=['sensor.a'])[
+            ['count', 'min', 'max', 'mean']].values.tolist()
+            for frequency in ('1min', '15min', '1h')}
+
+    expected = {
+        '1min': [[1, 1, 1, 1], [2, 3, 5, 4], [1, 9, 9, 9], [1, 7, 7, 7]],
+        '15min': [[3, 1, 5, 3], [1, 9, 9, 9], [1, 7, 7, 7]],
+        '1h': [[4, 1, 9, 4.5], [1, 7, 7, 7]],
+    }
+    assert rollups() == expected
+    assert store.rollup('1h', start='2025-01-01T00:30', end='2025-01-02')['count'].tolist() == [4]
+
+    store.compact()
+    assert rollups() == expected
+    assert len(glob.glob(str(tmp_path / 'log' / 'day=2025-01-01' / '*.parquet'))) == 1
+    assert store.readings(entity_ids=['sensor.a'])['numeric_state'].tolist() == [1, 5, 3, 9, 7]
+    with pytest.raises(ValueError):
+        store.rollup('5min')
+
+
+def test_window_tables_reduce_per_report(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    store.append(_readings([('sensor.phone_battery', '2025-01-01T08:00:00Z', '80'),
+                            ('sensor.phone_battery', '2025-01-01T12:00:00Z', '20'),
+                            ('sensor.phone_battery', '2025-01-01T18:00:00Z', '90'),
+                            ('sensor.phone_steps', '2025-01-01T12:00:00Z', '5000'),
+                            ('sensor.phone_steps', '2025-01-01T20:00:00Z', '100'),
+                            ('binary_sensor.door', '2025-01-01T09:00:00Z', 'unavailable'),
+                            ('binary_sensor.door', '2025-01-01T10:00:00Z', 'off')]))
+
+    tables = analysis.window_tables(store, ['battery', 'activity', 'alerts', 'states'])
+    assert analysis.battery_levels(tables['battery'])['Battery Level (%)'].tolist() == [20]
+    assert analysis.activity_metrics(tables['activity'])['Activity Value'].tolist() == [5000]
+    assert analysis.alerts(tables['alerts'])['State'].tolist() == ['unavailable']
+    assert sorted(tables['states']['state']) == ['100', '90', 'off']
+
+    morning = analysis.window_tables(store, ['battery'], end='2025-01-01T10:00')
+    assert analysis.battery_levels(morning['battery'])['Battery Level (%)'].tolist() == [80]
+
+
+def test_room_queries_and_cli(tmp_path, capsys):
+    root = str(tmp_path / 'history')
+    main(['ingest', root, str(MOCKUP_PATH), '--compact'])
+    store = HistoryStore(root)
+
+    room_ids = store.room_entity_ids('a.5')
+    assert room_ids and set(store.readings(room='a.5')['entity_id']) <= set(room_ids)
+
+    capsys.readouterr()
+    main(['query', root, '--entity', 'sensor.ewelink_ms01_battery', '--rollup', '1h'])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == 'entity_id,bucket,count,min,max,mean'
+    assert len(lines) == 2 and lines[1].startswith('sensor.ewelink_ms01_battery,')
+
+    assert analysis.main(['--history', root, '--text', '--report', 'battery']) == 0
+    assert 'sensor.ewelink_ms01_battery' in capsys.readouterr().out
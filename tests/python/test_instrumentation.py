@@ -0,0 +1,99 @@
+import json
+import shutil
+from contextlib import redirect_stdout
+from io import StringIO
+
+import pytest
+
+import instrumentation
+from instrumentation import configure, count, span
+from synthetic import REPO_ROOT
+
+
+@pytest.fixture
+def metrics(tmp_path):
+    paths = tmp_path / 'metrics.jsonl', tmp_path / 'textfile'
+    configure(str(paths[0]), str(paths[1]), script='test')
+    yield paths
+    configure()
+
+
+@span('decorated', kind='function')
+def _decorated(value):
+    if value is None:
+        raise ValueError('no value')
+    return value * 2
+
+
+def _lines(path):
+    return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+
+
+def test_disabled_records_nothing(tmp_path):
+    assert not instrumentation.enabled()
+    with span('block') as block:
+        count('things', 5)
+    assert _decorated(2) == 4
+    assert block._start is None
+    assert instrumentation.take_counters() == {}
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spans_and_counters_reach_both_outputs(metrics):
+    log_path, textfile_dir = metrics
+    with span('report', report='battery'):
+        count('entities_parsed', 3)
+    count('entities_parsed', 4)
+    assert _decorated(2) == 4
+    with pytest.raises(ValueError):
+        _decorated(None)
+    configure()
+
+    lines = _lines(log_path)
+    assert [(line['event'], line.get('span')) for line in lines] == [
+        ('span', 'report'), ('span', 'decorated'), ('span', 'decorated'), ('run', None)]
+    assert lines[0]['labels'] == {'report': 'battery'} and lines[0]['script'] == 'test'
+    assert 'error' not in lines[1] and lines[2]['error'] == 'ValueError'
+    assert lines[-1]['counters'] == {'entities_parsed': 7}
+    assert lines[-1]['peak_rss_mib'] > 0
+
+    prom = (textfile_dir / 'test.prom').read_text(encoding='utf-8').splitlines()
+    assert 'smart_campus_data_entities_parsed_total{script="test"} 7' in prom
+    assert ('smart_campus_data_span_seconds_count'
+            '{script="test",span="decorated",kind="function"} 2') in prom
+    assert any(line.startswith('smart_campus_data_peak_rss_bytes{script="test"} ') for line in prom)
+    assert [path.name for path in textfile_dir.iterdir()] == ['test.prom']
+
+
+def test_parse_and_report_spans(metrics):
+    import analysis
+    from entity_table import build_entity_table
+    from synthetic import MOCKUP_PATH
+
+    table = build_entity_table(analysis.load_entities(str(MOCKUP_PATH)))
+    analysis.run_report('battery', table)
+    configure()
+
+    spans = [line.get('span') for line in _lines(metrics[0])]
+    assert spans == ['parse', 'entity_table', 'report', None]
+    assert _lines(metrics[0])[-1]['counters']['entities_parsed'] == len(table)
+
+
+def test_worker_counters_are_merged(metrics, tmp_path):
+    pytest.importorskip('bs4')
+    from fix_json_attributes import fix_html_files
+
+    paths = []
+    for index in range(3):
+        path = tmp_path / f'poster{index}.html'
+        shutil.copy(REPO_ROOT / 'poster-test' / 'design-system-poster.html', path)
+        paths.append(str(path))
+    with redirect_stdout(StringIO()):
+        fix_html_files(paths, workers=2, use_cache=False)
+    configure()
+
+    lines = _lines(metrics[0])
+    counters = lines[-1]['counters']
+    assert counters['files_unchanged'] == 3
+    assert counters['json_attributes_checked'] % 3 == 0 and counters['json_attributes_checked']
+    assert sum(line.get('span') == 'fix_file' for line in lines) == 3
@@ -0,0 +1,81 @@
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from entity_parser import load_entities
+from entity_table import build_entity_table
+from room_resolver import DEFAULT_MAPPING_PATH, RoomResolver
+from synthetic import MOCKUP_PATH, REPO_ROOT
+
+MAPPINGS = [
+    {'roomId': 'one', 'aliases': ['lab'], 'entityIds': ['light.x'],
+     'entityIdPrefixes': ['sensor.one_'], 'friendlyNameIncludes': ['first']},
+    {'roomId': 'two', 'aliases': [], 'entityIds': ['light.lab_lamp'],
+     'entityIdPrefixes': ['Sensor.Two_'], 'friendlyNameIncludes': ['second']},
+]
+
+
+def test_first_matching_mapping_wins():
+    resolver = RoomResolver(MAPPINGS)
+
+    def room(entity_id, name=None):
+        mapping = resolver.resolve(entity_id, name)
+        return mapping and mapping['roomId']
+
+    assert room('light.x') == 'one'
+    assert room('sensor.two_temp') == 'two'  # prefixes are case-insensitive
+    assert room('sensor.one_temp', 'Second Floor') == 'one'
+    assert room('switch.y', 'The SECOND one') == 'two'
+    # An earlier mapping's alias beats a later mapping's exact id, as in the JS loop.
+    assert room('light.lab_lamp') == 'one'
+    assert room('switch.y', 'Nowhere') is None
+    assert room('') is None
+
+
+def test_batches_are_memoized():
+    resolver = RoomResolver(MAPPINGS)
+    ids = ['light.x', 'switch.y', 'light.x']
+
+    assert resolver.resolve_indices(ids) == [0, None, 0]
+    resolver._scan = lambda *args: pytest.fail('memoized entities were rescanned')
+    assert resolver.resolve_indices(ids) == [0, None, 0]
+
+
+def test_non_ascii_names_do_not_shift_later_rows():
+    resolver = RoomResolver(MAPPINGS)
+
+    assert resolver.resolve_indices(['switch.a', 'switch.b', 'switch.c'],
+                                    ['İ' * 20, 'First', 'Second']) == [None, 0, 1]
+
+
+def test_entities_by_room_groups_the_table():
+    table = build_entity_table(load_entities(MOCKUP_PATH))
+    rooms = RoomResolver.from_file().entities_by_room(table)
+
+    assert 'person.makerspace' in rooms['a.5']
+    assert sum(map(len, rooms.values())) == RoomResolver.from_file().room_ids(table).notna().sum()
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='needs node')
+def test_matches_resolve_room_meta():
+    script = f'''
+        import {{ roomEntityMapping, resolveRoomMeta }} from '{REPO_ROOT}/src/data/mappings/roomEntityMapping.js';
+        import {{ ROOM_ENTITY_MAP }} from '{MOCKUP_PATH}';
+        console.log(JSON.stringify({{
+          mapping: roomEntityMapping,
+          rooms: ROOM_ENTITY_MAP.map((e) => resolveRoomMeta({{
+            entityId: e.entity_id, friendlyName: e.attributes?.friendly_name,
+          }})?.roomId ?? null),
+        }}));
+    '''
+    out = subprocess.run(['node', '--input-type=module', '-e', script],
+                         capture_output=True, text=True, check=True).stdout
+    expected = json.loads(out)
+
+    with open(DEFAULT_MAPPING_PATH, encoding='utf-8') as f:
+        assert json.load(f) == expected['mapping'], 'run node scripts/export-room-mapping.mjs'
+    table = build_entity_table(load_entities(MOCKUP_PATH))
+    rooms = RoomResolver.from_file().room_ids(table)
+    assert [None if room != room else room for room in rooms.tolist()] == expected['rooms']
@@ -0,0 +1,95 @@
+from extract_entities import extract_entities, main
+from schema_validator import (
+    ConformanceReport, compile_validator, definition_validator, reading_fields, sensor_readings,
+    validated,
+)
+from synthetic import MOCKUP_PATH
+
+READING = {'sensor_id': 'sensor.a_1_temperature', 'sensor_type': 'temperature', 'value': 21.5,
+           'unit': '°C', 'timestamp': '2025-04-05T08:48:11.664713+00:00'}
+
+
+def test_sensor_reading_problems():
+    validate = definition_validator('SensorAnalytics', 'SensorReading')
+
+    assert validate(READING) == ()
+    assert validate({**READING, 'value': 'on', 'quality': 'good'}) == ()
+    assert validate({'sensor_id': 1, 'sensor_type': 'battery', 'value': [1],
+                     'timestamp': 'yesterday', 'quality': 'fine'}) == [
+        ('sensor_id', 'type'), ('sensor_type', 'enum'), ('value', 'oneOf'),
+        ('timestamp', 'format'), ('quality', 'enum')]
+    assert validate({}) == [('sensor_id', 'missing'), ('sensor_type', 'missing'),
+                            ('value', 'missing'), ('timestamp', 'missing')]
+    assert validate([]) == [('', 'type')]
+
+
+def test_refs_items_and_ranges():
+    validate = definition_validator('SensorAnalytics', 'RoomSensorSnapshot')
+
+    assert validate({'room_id': 'a.5', 'timestamp': '2025-04-05T08:48:11Z', 'readings': [READING],
+                     'comfort_score': {'overall': 80}}) == ()
+    assert validate({'room_id': 'a.5', 'timestamp': '2025-04-05T08:48:11Z',
+                     'readings': [READING, {'sensor_id': 's', 'sensor_type': 'co2',
+                                            'timestamp': '2025-04-05T08:48:11Z'}],
+                     'comfort_score': {'overall': 101}}) == [
+        ('readings[].value', 'missing'), ('comfort_score.overall', 'range')]
+
+
+def test_one_of_counts_matching_branches():
+    validate = compile_validator({'oneOf': [{'type': 'number'}, {'type': 'integer'}]})
+
+    assert validate(1.5) == ()
+    assert validate(1) == [('', 'oneOf')]
+    assert validate('1') == [('', 'oneOf')]
+
+
+def test_entities_map_to_readings():
+    readings = list(sensor_readings([
+        {'entity_id': 'sensor.co2', 'device_class': 'carbon_dioxide', 'state': '415',
+         'last_changed': 't0', 'last_updated': 't1'},
+        {'entity_id': 'binary_sensor.motion', 'attributes': {'device_class': 'occupancy'},
+         'state': 'off', 'last_changed': 't0'},
+        {'entity_id': 'sensor.gone', 'state': 'unavailable'},
+        {'entity_id': 'light.desk', 'state': 'on'},
+    ]))
+
+    assert readings == [
+        {'sensor_id': 'sensor.co2', 'sensor_type': 'co2', 'value': 415.0, 'timestamp': 't1'},
+        {'sensor_id': 'binary_sensor.motion', 'sensor_type': 'occupancy', 'value': 'off',
+         'timestamp': 't0'},
+        {'sensor_id': 'sensor.gone'},
+    ]
+
+
+def test_report_counts_missing_and_invalid_per_field():
+    report = ConformanceReport()
+    batch = [READING, {'sensor_id': 's', 'sensor_type': 'battery', 'value': 1,
+                       'timestamp': 'now'}, {'sensor_id': 's'}]
+    assert report.add(batch) == 1
+    assert report.add([READING]) == 1
+
+    table = report.table(reading_fields()).set_index('Field')
+    assert (report.records, report.conforming) == (4, 2)
+    assert table.loc['sensor_type'].tolist() == [1, 1, 75.0]
+    assert table.loc['timestamp'].tolist() == [1, 1, 75.0]
+    assert table.loc['unit'].tolist() == [2, 0, 50.0]
+    assert table.loc['quality'].tolist() == [4, 0, 0.0]
+
+
+def test_validated_passes_the_stream_through():
+    entities = extract_entities(MOCKUP_PATH)
+    report = ConformanceReport()
+
+    assert list(validated(iter(entities), report, batch_size=50)) == entities
+    reference = ConformanceReport()
+    reference.add(sensor_readings(entities))
+    assert (report.records, report.conforming) == (reference.records, reference.conforming) == (193, 49)
+    assert report.problems == reference.problems
+
+
+def test_extractor_reports_conformance(tmp_path, capsys):
+    main([str(MOCKUP_PATH), '--validate', '--ndjson'])
+    assert '49 of 193 records conform (25%).' in capsys.readouterr().err
+
+    main([str(MOCKUP_PATH), str(MOCKUP_PATH), '--validate', '--out', str(tmp_path / 'out.ndjson')])
+    assert '49 of 193 records conform (25%).' in capsys.readouterr().err
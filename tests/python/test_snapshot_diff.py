@@ -0,0 +1,73 @@
+import copy
+import json
+
+from snapshot_diff import apply_changes, diff_snapshots, index_snapshot, iter_deltas, main
+from synthetic import mockup_entities
+
+
+def _entity(entity_id, state, **attributes):
+    return {'entity_id': entity_id, 'state': state, 'attributes': attributes,
+            'last_changed': 't0'}
+
+
+def test_diff_reports_each_kind_of_change():
+    old = index_snapshot([
+        _entity('sensor.kept', '1', unit='%'),
+        _entity('sensor.gone', '1'),
+        _entity('sensor.both', 'on', icon='a', stale='x'),
+    ])
+    new = index_snapshot([
+        _entity('sensor.kept', '1', unit='%'),
+        _entity('sensor.both', 'off', icon='b', fresh='y'),
+        _entity('sensor.new', '2'),
+    ])
+
+    changes = diff_snapshots(old, new)
+
+    assert [(c['op'], c['entity_id']) for c in changes] == [
+        ('state', 'sensor.both'),
+        ('attributes', 'sensor.both'),
+        ('removed', 'sensor.gone'),
+        ('added', 'sensor.new'),
+    ]
+    assert (changes[0]['old'], changes[0]['new']) == ('on', 'off')
+    assert changes[1]['changed'] == {'icon': 'b', 'fresh': 'y'}
+    assert changes[1]['old'] == {'icon': 'a', 'stale': 'x'}
+    assert changes[1]['removed'] == ['stale']
+
+
+def test_timestamps_alone_are_not_a_change():
+    old = _entity('sensor.a', '1')
+    new = dict(old, last_changed='t1', last_updated='t1', context={'id': 'x'})
+
+    assert diff_snapshots(index_snapshot([old]), index_snapshot([new])) == []
+
+
+def test_replaying_deltas_rebuilds_each_snapshot():
+    first = mockup_entities()
+    second = copy.deepcopy(first[10:]) + [_entity('sensor.extra', '5')]
+    second[0]['state'] = 'changed'
+    second[1]['attributes']['friendly_name'] = 'Renamed'
+    third = second[:-1]
+
+    replayed = {}
+    for label, changes in iter_deltas([('a', first), ('b', second), ('c', third)]):
+        apply_changes(replayed, changes)
+        expected = index_snapshot({'a': first, 'b': second, 'c': third}[label])
+        assert {k: (e['state'], e['attributes']) for k, e in replayed.items()} == \
+            {k: (e['state'], e['attributes']) for k, e in expected.items()}
+
+
+def test_cli_emits_only_deltas(tmp_path, capsys):
+    entities = mockup_entities()
+    changed = copy.deepcopy(entities)
+    changed[0]['state'] = 'home'
+    for name, snapshot in (('day1.json', entities), ('day2.json', entities), ('day3.json', changed)):
+        (tmp_path / name).write_text(json.dumps(snapshot))
+
+    main([str(tmp_path / '*.json'), '--no-cache'])
+
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(line['snapshot'], line['op'], line['entity_id']) for line in lines] == [
+        (str(tmp_path / 'day3.json'), 'state', entities[0]['entity_id']),
+    ]